@@ -0,0 +1,89 @@
+import os
+import sys
+import hashlib
+import tempfile
+import numpy as np
+
+# Bump when the way tiles are cropped or blended changes, so old entries are rebuilt
+ATLAS_CACHE_VERSION = 2  # 2: chroma tiles rounded, key no longer R/B swapped
+
+CACHE_DIR_ENV = "OVERLAYTOOL_CACHE_DIR"
+
+
+def default_cache_dir():
+    """
+    Where atlases are cached: $OVERLAYTOOL_CACHE_DIR if set, otherwise the
+    per-user cache folder (%LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or
+    ~/.cache elsewhere).
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    if sys.platform == "win32" and os.environ.get("LOCALAPPDATA"):
+        base = os.environ["LOCALAPPDATA"]
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "O3_OverlayTool", "atlas")
+
+
+def file_hash(file_path):
+    """sha256 of a file's content, so a font edited in place gets a new cache entry."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _key_hash(key):
+    text = repr((ATLAS_CACHE_VERSION,) + tuple(sorted(key.items())))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_cached_tiles(font_path, key, build_tiles, cache_dir):
+    """
+    Return the tile array for 'font_path' and 'key' (a dict of everything
+    besides the font that the tiles depend on: tile size, columns, alpha or
+    chroma mode). A cached .npy is memory-mapped read-only; otherwise
+    build_tiles() is called and its result saved for the next run.
+
+    Entries for the same font name and key but an older font hash are
+    deleted when the new one is written. Cache errors are reported and the
+    freshly built tiles are used, so a read-only or full disk never stops a
+    render.
+    """
+    font_name = os.path.splitext(os.path.basename(font_path))[0]
+    font_digest = file_hash(font_path)[:16]
+    key_digest = _key_hash(key)[:16]
+    cache_path = os.path.join(cache_dir, f"{font_name}_{font_digest}_{key_digest}.npy")
+
+    if os.path.exists(cache_path):
+        try:
+            return np.load(cache_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable atlas cache {cache_path}: {e}")
+
+    tiles = build_tiles()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write under a temporary name first; parallel workers may race here
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, tiles)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        stale_suffix = f"_{key_digest}.npy"
+        for name in os.listdir(cache_dir):
+            if (name.startswith(font_name + "_") and name.endswith(stale_suffix)
+                    and name != os.path.basename(cache_path)
+                    and len(name) == len(os.path.basename(cache_path))):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass  # still mapped by another process; removed next time
+    except OSError as e:
+        print(f"Could not write atlas cache {cache_path}: {e}")
+    return tiles
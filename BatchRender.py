@@ -0,0 +1,342 @@
+"""
+Headless batch renderer: renders many .osd files without the GUI.
+
+    python BatchRender.py flights/ "more/*.osd" --jobs 4 --summary summary.json
+
+Inputs can be .osd files, folders (every .osd inside) or glob patterns.
+Each file is one job; jobs run in a pool of worker processes. A job is
+skipped when its output is newer than both the .osd file and the font,
+unless --force is given. Transparent output is the default (.mov, or the
+container of --codec, or a folder of images with --image-sequence); pass
+--chroma-key to render .mp4 on a chroma key background instead.
+"""
+import os
+import sys
+import io
+import glob
+import json
+import time
+import argparse
+import contextlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from EncoderBackend import CODECS, DEFAULT_CODEC, find_ffmpeg
+from ImageSequenceWriter import IMAGE_FORMATS, INDEX_NAME
+
+from OsdFileReader import OsdFileReader
+from VideoMaker import VideoMaker
+from TransparentVideoMaker import TransparentVideoMaker
+
+DEFAULT_FONT = "fonts/WS_BFx4_Nexus_Moonlight_2160p.png"
+OUTPUT_SUFFIX = "_OSD"
+
+
+def find_osd_files(inputs, recursive=False):
+    """Expand files, folders and glob patterns into a sorted list of .osd paths."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.osd") if recursive else os.path.join(item, "*.osd")
+            found.update(glob.glob(pattern, recursive=recursive))
+        elif os.path.isfile(item):
+            found.add(item)
+        else:
+            found.update(path for path in glob.glob(item, recursive=recursive) if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in found)
+
+
+def output_path_for(osd_path, output_dir=None, transparent=True, codec=DEFAULT_CODEC, image_format=None):
+    """
+    <name>_OSD.mov (or .mp4, or the codec's container, or a <name>_OSD
+    folder for image sequences) next to the .osd file or in output_dir, like the GUI.
+    """
+    if not transparent:
+        extension = ".mp4"
+    elif image_format is not None:
+        extension = ""
+    else:
+        extension = CODECS[codec].extension
+    base_name = os.path.splitext(os.path.basename(osd_path))[0] + OUTPUT_SUFFIX + extension
+    return os.path.join(output_dir or os.path.dirname(osd_path), base_name)
+
+
+def is_up_to_date(output_path, *source_paths):
+    """
+    True if output_path exists, is not empty and is newer than every source.
+    For an image sequence folder its index file, written last, is checked.
+    """
+    if os.path.isdir(output_path):
+        output_path = os.path.join(output_path, INDEX_NAME)
+    try:
+        output_stat = os.stat(output_path)
+    except OSError:
+        return False
+    if output_stat.st_size == 0:
+        return False
+    return all(output_stat.st_mtime >= os.path.getmtime(path) for path in source_paths)
+
+
+def render_job(osd_path, output_path, font_path, fps, chroma_key_hex, incremental, verbose,
+               start_time=None, end_time=None, sidecar=False, profile=False, codec=DEFAULT_CODEC,
+               encoder_threads=0, ffmpeg_path=None, vfr=False, target_height=None, resumable=False,
+               image_format=None, image_compression=None, link_repeats=True):
+    """
+    Worker entry point: render one .osd file. Returns a summary dict and
+    never raises, so one broken recording doesn't stop the batch.
+    'profile' saves a cProfile of the render next to the output.
+    codec/encoder_threads/ffmpeg_path configure transparent output, and
+    'vfr' writes it with one frame per OSD change. 'target_height' scales
+    the video to that height. 'resumable' renders in checkpointed segments
+    that a later run continues from. image_format/image_compression/
+    link_repeats write transparent output as an image sequence instead.
+    """
+    result = {
+        "input": osd_path,
+        "output": output_path,
+        "status": "rendered",
+        "wall_time": None,
+        "frames": None,
+        "fps": None,
+        "output_bytes": None,
+        "render_stats": None,
+        "encoder_stats": None,
+        "error": None,
+    }
+    job_start = time.perf_counter()
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with log:
+            osd_reader = OsdFileReader(osd_path, sidecar=sidecar)
+            if chroma_key_hex is None:
+                maker = TransparentVideoMaker(osd_reader, font_path, fps=fps, incremental=incremental,
+                                              profile=profile, codec=codec, encoder_threads=encoder_threads,
+                                              ffmpeg_path=ffmpeg_path, vfr=vfr, target_height=target_height,
+                                              resumable=resumable, image_format=image_format,
+                                              image_compression=image_compression, link_repeats=link_repeats)
+            else:
+                maker = VideoMaker(osd_reader, font_path, chroma_key_hex=chroma_key_hex, fps=fps,
+                                   incremental=incremental, profile=profile, target_height=target_height,
+                                   resumable=resumable)
+            maker.create_video(output_path, start_time=start_time, end_time=end_time)
+        # Read inside the try: a render that returned without producing its
+        # output or stats is a failed job, not the end of the batch
+        result["frames"] = maker.total_frames
+        if os.path.isdir(output_path):
+            result["output_bytes"] = maker.encoder_stats["output_bytes"]
+        else:
+            result["output_bytes"] = os.path.getsize(output_path)
+        result["render_stats"] = maker.render_stats.as_dict()
+        result["encoder_stats"] = getattr(maker, "encoder_stats", None)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        if verbose:
+            traceback.print_exc()
+
+    result["wall_time"] = time.perf_counter() - job_start
+    if result["frames"] and result["wall_time"] > 0:
+        result["fps"] = result["frames"] / result["wall_time"]
+    return result
+
+
+def run_batch(osd_paths, font_path, fps=60.0, chroma_key_hex=None, jobs=1, output_dir=None,
+              force=False, incremental=True, verbose=False, start_time=None, end_time=None, sidecar=False,
+              profile=False, codec=DEFAULT_CODEC, encoder_threads=0, ffmpeg_path=None, vfr=False,
+              target_height=None, resumable=False, image_format=None, image_compression=None,
+              link_repeats=True):
+    """
+    Render every file in osd_paths with a pool of 'jobs' processes and
+    return the per-file results in input order. start_time/end_time clip
+    every file to that range (seconds from the start of the recording).
+    'sidecar' reads and writes compact .delta.npz files next to the .osd files.
+    'profile' saves a cProfile (.prof) of each render next to its output.
+    codec/encoder_threads/ffmpeg_path configure transparent output (see EncoderBackend);
+    'vfr' gives it a variable frame rate. 'target_height' renders every
+    video at that height instead of the font's size. 'resumable' keeps
+    finished segments of interrupted renders (see RenderCheckpoint) and
+    continues from them. image_format ("png" or "webp") renders transparent
+    output as image sequences, see ImageSequenceWriter.
+    """
+    transparent = chroma_key_hex is None
+    results = {}
+    pending = []
+    for osd_path in osd_paths:
+        output_path = output_path_for(osd_path, output_dir, transparent, codec, image_format)
+        if not force and is_up_to_date(output_path, osd_path, font_path):
+            results[osd_path] = {
+                "input": osd_path,
+                "output": output_path,
+                "status": "skipped",
+                "wall_time": 0.0,
+                "frames": None,
+                "fps": None,
+                "output_bytes": None if os.path.isdir(output_path) else os.path.getsize(output_path),
+                "render_stats": None,
+                "encoder_stats": None,
+                "error": None,
+            }
+            print(f"[skip] {osd_path} (up to date)")
+        else:
+            pending.append((osd_path, output_path))
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [
+            pool.submit(render_job, osd_path, output_path, font_path, fps, chroma_key_hex, incremental, verbose,
+                        start_time, end_time, sidecar, profile, codec, encoder_threads, ffmpeg_path,
+                        vfr, target_height, resumable, image_format, image_compression, link_repeats)
+            for osd_path, output_path in pending
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[result["input"]] = result
+            if result["status"] == "failed":
+                print(f"[{done}/{len(futures)}] FAILED {result['input']}: {result['error']}")
+            else:
+                print(f"[{done}/{len(futures)}] {result['input']} -> {result['output']} "
+                      f"({result['frames']} frames in {result['wall_time']:.1f}s, {result['fps']:.1f} fps, "
+                      f"bottleneck: {result['render_stats']['bottleneck']})")
+
+    return [results[osd_path] for osd_path in osd_paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help=".osd files, folders or glob patterns")
+    parser.add_argument("--font", default=DEFAULT_FONT, help=f"font image (default: {DEFAULT_FONT})")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--chroma-key", metavar="HEX", help="render .mp4 on this background instead of transparent .mov")
+    parser.add_argument("--codec", choices=list(CODECS), default=DEFAULT_CODEC,
+                        help=f"transparent output codec (default: {DEFAULT_CODEC}); see EncoderBackend.py")
+    parser.add_argument("--encoder-threads", type=int, default=0, help="ffmpeg encoder threads (0 = auto)")
+    parser.add_argument("--ffmpeg", help="ffmpeg binary (default: $OVERLAYTOOL_FFMPEG, bundled, or on PATH)")
+    parser.add_argument("--image-sequence", choices=list(IMAGE_FORMATS), metavar="FORMAT",
+                        help="write a folder of numbered png or webp images instead of a video "
+                             "(transparent output only)")
+    parser.add_argument("--compression", type=int,
+                        help="image sequence compression: png zlib level 0-9, webp effort 0-6 "
+                             "(default: 3 and 4)")
+    parser.add_argument("--no-links", action="store_true",
+                        help="don't hardlink repeated frames of image sequences; index.ffconcat "
+                             "still lists every image with its duration")
+    parser.add_argument("--vfr", action="store_true",
+                        help="variable frame rate: one frame per OSD change instead of a constant --fps "
+                             "(transparent output only)")
+    parser.add_argument("--height", type=int, metavar="PIXELS",
+                        help="render at this output height (e.g. 1080 proxies from a 2160p font)")
+    parser.add_argument("--start", type=float, metavar="SECONDS", help="render from this time on")
+    parser.add_argument("--end", type=float, metavar="SECONDS", help="render up to this time")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="files rendered at the same time")
+    parser.add_argument("--output-dir", help="write videos here instead of next to each .osd file")
+    parser.add_argument("--recursive", action="store_true", help="search folders recursively")
+    parser.add_argument("--force", action="store_true", help="re-render outputs that are up to date")
+    parser.add_argument("--resumable", action="store_true",
+                        help="render in checkpointed one-minute segments, continuing interrupted renders")
+    parser.add_argument("--sidecar", action="store_true",
+                        help="keep compact .delta.npz copies of the .osd files for faster re-renders")
+    parser.add_argument("--full-redraw", action="store_true", help="disable incremental rendering")
+    parser.add_argument("--summary", default="batch_summary.json",
+                        help="JSON summary file, '-' for stdout (default: batch_summary.json)")
+    parser.add_argument("--profile", action="store_true", help="save a cProfile (.prof) of each render")
+    parser.add_argument("--verbose", action="store_true", help="show the renderers' own output")
+    args = parser.parse_args(argv)
+
+    font_path = args.font
+    if not os.path.exists(font_path):
+        # Relative font paths also work from outside the tool's folder
+        bundled = os.path.join(os.path.dirname(os.path.abspath(__file__)), args.font)
+        if os.path.exists(bundled):
+            font_path = bundled
+    font_path = os.path.abspath(font_path)
+    if not os.path.isfile(font_path):
+        parser.error(f"font image not found: {args.font}")
+
+    if args.height is not None and args.height <= 0:
+        parser.error("--height must be positive")
+    if args.vfr and args.chroma_key is not None:
+        parser.error("--vfr needs transparent output, not --chroma-key")
+    if args.image_sequence and args.chroma_key is not None:
+        parser.error("--image-sequence needs transparent output, not --chroma-key")
+    if args.image_sequence and args.vfr:
+        parser.error("--image-sequence already times each image in index.ffconcat; drop --vfr")
+    if args.image_sequence:
+        try:
+            IMAGE_FORMATS[args.image_sequence].options(args.compression)
+        except ValueError as e:
+            parser.error(str(e))
+    # Transparent videos are encoded by ffmpeg and resumable videos join
+    # their segments with it; image sequences and plain chroma-key videos
+    # are written without it, however many files render at a time
+    if not args.image_sequence and (args.chroma_key is None or args.resumable):
+        try:
+            ffmpeg_path = find_ffmpeg(args.ffmpeg)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+    else:
+        ffmpeg_path = args.ffmpeg
+
+    osd_paths = find_osd_files(args.inputs, args.recursive)
+    if not osd_paths:
+        parser.error("no .osd files found")
+    print(f"{len(osd_paths)} .osd files, up to {args.jobs} at a time")
+
+    start_time = time.perf_counter()
+    results = run_batch(
+        osd_paths,
+        font_path,
+        fps=args.fps,
+        chroma_key_hex=args.chroma_key,
+        jobs=args.jobs,
+        output_dir=args.output_dir,
+        force=args.force,
+        incremental=not args.full_redraw,
+        verbose=args.verbose,
+        start_time=args.start,
+        end_time=args.end,
+        sidecar=args.sidecar,
+        profile=args.profile,
+        codec=args.codec,
+        encoder_threads=args.encoder_threads,
+        ffmpeg_path=ffmpeg_path,
+        vfr=args.vfr,
+        target_height=args.height,
+        resumable=args.resumable,
+        image_format=args.image_sequence,
+        image_compression=args.compression,
+        link_repeats=not args.no_links,
+    )
+
+    statuses = [result["status"] for result in results]
+    summary = {
+        "font": font_path,
+        "fps": args.fps,
+        "chroma_key": args.chroma_key,
+        "start": args.start,
+        "end": args.end,
+        "jobs": args.jobs,
+        "wall_time": time.perf_counter() - start_time,
+        "rendered": statuses.count("rendered"),
+        "skipped": statuses.count("skipped"),
+        "failed": statuses.count("failed"),
+        "files": results,
+    }
+    if args.summary == "-":
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.summary, "w", encoding="utf-8") as summary_file:
+            json.dump(summary, summary_file, indent=2)
+        print(f"Summary written to {args.summary}")
+
+    print(f"Rendered {summary['rendered']}, skipped {summary['skipped']}, failed {summary['failed']} "
+          f"in {summary['wall_time']:.1f}s")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
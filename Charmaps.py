@@ -0,0 +1,184 @@
+import os
+import json
+import numpy as np
+
+from TelemetryExtractor import FORMAT_NUMBER, FORMAT_CLOCK
+
+NUM_GLYPHS = 1 << 16
+# Shown for glyphs that have no text equivalent (icons, artificial horizon, ...)
+UNMAPPED_CHAR = "·"
+
+# Betaflight and INAV fonts keep digits, capitals and punctuation at their
+# ASCII positions; the lowercase range holds symbols instead.
+ASCII_GLYPHS = range(0x20, 0x60)
+
+# Unit and label glyphs used to find values on screen, from the firmwares'
+# osd_symbols.h. Custom fonts can be described with load_charmap().
+BETAFLIGHT_SYMBOLS = {
+    "RSSI": 0x01,
+    "THR": 0x04,
+    "VOLT": 0x06,
+    "MAH": 0x07,
+    "M": 0x0C,
+    "F": 0x0D,
+    "C": 0x0E,
+    "FT": 0x0F,
+    "HOMEFLAG": 0x11,
+    "SAT_L": 0x1E,
+    "SAT_R": 0x1F,
+    "SPEED": 0x70,
+    "TEMPERATURE": 0x7A,
+    "LINK_QUALITY": 0x7B,
+    "KM": 0x7D,
+    "MILES": 0x7E,
+    "ALTITUDE": 0x7F,
+    "MAIN_BATT": 0x97,
+    "AMP": 0x9A,
+    "ON_M": 0x9B,
+    "FLY_M": 0x9C,
+    "MPH": 0x9D,
+    "KPH": 0x9E,
+}
+
+INAV_SYMBOLS = {
+    "RSSI": 0x01,
+    "LQ": 0x02,
+    "LAT": 0x03,
+    "LON": 0x04,
+    "SAT_L": 0x08,
+    "SAT_R": 0x09,
+    "HOME": 0x10,
+    "VOLT": 0x1F,
+    "AMP": 0x6A,
+    "WH": 0x6D,
+    "WATT": 0x71,
+    "ALT_M": 0x76,
+    "MAH": 0x99,
+    "KMH": 0xA1,
+    "MPH": 0xA2,
+}
+
+# Text for the unit glyphs in text rows; one character per cell keeps rows aligned
+BETAFLIGHT_TEXT = {"VOLT": "V", "AMP": "A", "M": "M", "FT": "F", "C": "C", "F": "F", "KM": "K"}
+INAV_TEXT = {"VOLT": "V", "AMP": "A", "ALT_M": "M", "WATT": "W"}
+
+# Fields for the values most flights show, as (identifier, coordinates, length,
+# format) for extract_telemetry(); a negative length reads the cells before
+# the identifier, e.g. the digits in front of a unit symbol.
+BETAFLIGHT_FIELDS = {
+    "battery_v": ("VOLT", [-1, -1], -5, FORMAT_NUMBER),
+    "consumed_mah": ("MAH", [-1, -1], -5, FORMAT_NUMBER),
+    "current_a": ("AMP", [-1, -1], -5, FORMAT_NUMBER),
+    "altitude": ("ALTITUDE", [-1, -1], 6, FORMAT_NUMBER),
+    "speed": ("SPEED", [-1, -1], 4, FORMAT_NUMBER),
+    "fly_time_s": ("FLY_M", [-1, -1], 5, FORMAT_CLOCK),
+}
+
+INAV_FIELDS = {
+    "battery_v": ("VOLT", [-1, -1], -5, FORMAT_NUMBER),
+    "consumed_mah": ("MAH", [-1, -1], -5, FORMAT_NUMBER),
+    "current_a": ("AMP", [-1, -1], -5, FORMAT_NUMBER),
+    "altitude": ("ALT_M", [-1, -1], -4, FORMAT_NUMBER),
+    "speed": ("KMH", [-1, -1], -4, FORMAT_NUMBER),
+}
+
+
+class Charmap:
+    """
+    Glyph index -> text lookup for one firmware's font layout.
+
+    'codes' is a (65536,) uint32 table of Unicode code points (0 = no text),
+    so a whole block of frames is converted with one gather. 'symbols' maps
+    symbol names (e.g. "VOLT") to glyph indices for field definitions, and
+    'fields' holds the firmware's default telemetry fields.
+    """
+
+    def __init__(self, name, codes, symbols=None, fields=None):
+        self.name = name
+        self.codes = codes
+        self.symbols = dict(symbols or {})
+        self.fields = dict(fields or {})
+
+    @classmethod
+    def from_tables(cls, name, symbols, symbol_text, fields, glyphs=ASCII_GLYPHS):
+        """
+        Build a charmap: ASCII glyphs map to themselves and named symbols to
+        symbol_text; every other glyph but the blank glyph 0 shows
+        UNMAPPED_CHAR.
+        """
+        codes = np.full(NUM_GLYPHS, ord(UNMAPPED_CHAR), dtype=np.uint32)
+        codes[0] = ord(" ")
+        codes[list(glyphs)] = list(glyphs)
+        for symbol, text in symbol_text.items():
+            codes[symbols[symbol]] = ord(text)
+        return cls(name, codes, symbols, fields)
+
+    def glyph(self, identifier):
+        """Glyph index for a symbol name, or the identifier itself if it already is one."""
+        if isinstance(identifier, str):
+            try:
+                return self.symbols[identifier]
+            except KeyError:
+                raise ValueError(f"Unknown symbol '{identifier}' for the {self.name} charmap")
+        return identifier
+
+    def text_rows(self, frames):
+        """
+        Convert (n, rows, cols) glyph grids to an (n, rows) array of strings,
+        one per screen row. Trailing blanks are kept, so columns line up.
+        """
+        n_frames, num_rows, num_cols = frames.shape
+        codes = np.ascontiguousarray(self.codes[frames])
+        return codes.view(f"<U{num_cols}").reshape(n_frames, num_rows)
+
+
+CHARMAPS = {
+    "betaflight": Charmap.from_tables("betaflight", BETAFLIGHT_SYMBOLS, BETAFLIGHT_TEXT, BETAFLIGHT_FIELDS),
+    "inav": Charmap.from_tables("inav", INAV_SYMBOLS, INAV_TEXT, INAV_FIELDS),
+}
+# Walksnail goggles draw the flight controller's own font layout; its WS_BF*
+# and WS_BTFL* fonts follow Betaflight's
+CHARMAPS["walksnail"] = Charmap(
+    "walksnail", CHARMAPS["betaflight"].codes, BETAFLIGHT_SYMBOLS, BETAFLIGHT_FIELDS
+)
+
+
+def charmap_for_font(font_path):
+    """
+    Pick a charmap from a font file name, following the names in fonts/:
+    *INAV* fonts use INAV's layout, everything else (Betaflight, Walksnail
+    WS_BF*/WS_BTFL*, DJI OG) Betaflight's.
+    """
+    name = os.path.basename(font_path).upper()
+    if "INAV" in name:
+        return CHARMAPS["inav"]
+    if name.startswith("WS_"):
+        return CHARMAPS["walksnail"]
+    return CHARMAPS["betaflight"]
+
+
+def charmap_for_variant(font_variant):
+    """Charmap for the fontVariant of an MSP OSD header ("BTFL", "INAV", ...), or None if unknown."""
+    variant = (font_variant or "").upper()
+    if variant.startswith("INAV"):
+        return CHARMAPS["inav"]
+    if variant.startswith(("BTFL", "BF")):
+        return CHARMAPS["betaflight"]
+    return None
+
+
+def load_charmap(path, base="betaflight"):
+    """
+    Load a custom charmap from JSON: {"name": ..., "chars": {"<glyph>": "<char>"},
+    "symbols": {"<name>": <glyph>}, "fields": {...}}. Entries extend the
+    'base' charmap.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    base_map = CHARMAPS[base]
+    codes = base_map.codes.copy()
+    for glyph, char in spec.get("chars", {}).items():
+        codes[int(glyph, 0)] = ord(char)
+    symbols = {**base_map.symbols, **spec.get("symbols", {})}
+    fields = {name: tuple(field) for name, field in spec.get("fields", {}).items()} or base_map.fields
+    return Charmap(spec.get("name", os.path.splitext(os.path.basename(path))[0]), codes, symbols, fields)
@@ -0,0 +1,303 @@
+import os
+import sys
+import time
+import shutil
+import struct
+import subprocess
+
+# Set to the full path of an ffmpeg binary to override the search
+FFMPEG_ENV = "OVERLAYTOOL_FFMPEG"
+
+
+def resource_path(relative_path):
+    """
+    PyInstaller helper: gets the absolute path of a bundled file.
+    If running from source, it uses this file's directory;
+    if running from .exe, it uses the _MEIPASS temp folder.
+    """
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.join(os.path.dirname(__file__), relative_path)
+
+
+def find_ffmpeg(ffmpeg_path=None):
+    """
+    Locate ffmpeg: an explicit path, then $OVERLAYTOOL_FFMPEG, then the
+    binary bundled in ffmpeg/bin (the Windows release ships ffmpeg.exe
+    there), then ffmpeg on PATH. Raises FileNotFoundError if none exists.
+    """
+    candidates = [ffmpeg_path, os.environ.get(FFMPEG_ENV)]
+    bundled_name = "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg"
+    candidates.append(resource_path(os.path.join("ffmpeg", "bin", bundled_name)))
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    on_path = shutil.which("ffmpeg")
+    if on_path:
+        return on_path
+    if ffmpeg_path:
+        raise FileNotFoundError(f"ffmpeg not found at {ffmpeg_path}")
+    raise FileNotFoundError(
+        f"ffmpeg not found: install it on PATH, put it in ffmpeg/bin or set {FFMPEG_ENV}"
+    )
+
+
+class Codec:
+    """An alpha-capable ffmpeg output format: encoder arguments and the containers it fits in."""
+
+    def __init__(self, name, extensions, args, description):
+        self.name = name
+        self.extensions = extensions  # first one is the default
+        self.args = args
+        self.description = description
+
+    @property
+    def extension(self):
+        return self.extensions[0]
+
+
+# Measured with benchmarks/bench_encoders.py on one CPU core, 2544x1440
+# (53x20 grid, 1440p font), first 10 s of a 60 fps Betaflight flight:
+#
+#   codec        encode fps   MB per minute
+#   qtrle              34.2              66
+#   prores4444          1.9             481
+#   vp9                15.2               3
+#   ffv1               11.5             110
+#   png                10.7             189
+#
+# qtrle only stores the lines that changed since the previous frame, so the
+# many repeated frames of an OSD recording cost it almost nothing. The other
+# lossless codecs compress every frame on its own but scale with threads.
+CODECS = {
+    "qtrle": Codec(
+        "qtrle", (".mov",), ["-c:v", "qtrle", "-pix_fmt", "rgba"],
+        "QuickTime Animation, lossless. Imported by every editor and fast on repeated frames.",
+    ),
+    "prores4444": Codec(
+        "prores4444", (".mov",),
+        ["-c:v", "prores_ks", "-profile:v", "4444", "-pix_fmt", "yuva444p10le", "-vendor", "apl0"],
+        "ProRes 4444, visually lossless 10-bit with alpha. The editing standard and fast to decode, "
+        "but the slowest to encode and the largest files.",
+    ),
+    "vp9": Codec(
+        "vp9", (".webm", ".mkv"),
+        ["-c:v", "libvpx-vp9", "-pix_fmt", "yuva420p", "-crf", "30", "-b:v", "0",
+         "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1"],
+        "VP9 with alpha in WebM, lossy. By far the smallest files; for web players and OBS, "
+        "fewer editors import it.",
+    ),
+    "ffv1": Codec(
+        "ffv1", (".mkv",), ["-c:v", "ffv1", "-level", "3", "-slices", "16", "-pix_fmt", "bgra"],
+        "FFV1 in Matroska, lossless archival codec. Slower than qtrle on one core but scales "
+        "with encoder threads; limited editor support.",
+    ),
+    "png": Codec(
+        "png", (".mov",), ["-c:v", "png", "-pix_fmt", "rgba"],
+        "PNG frames in QuickTime, lossless. Every frame compressed on its own; scales with "
+        "encoder threads.",
+    ),
+}
+DEFAULT_CODEC = "qtrle"
+
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec '{name}', expected one of {', '.join(CODECS)}")
+
+
+def check_container(codec, output_path):
+    """Raise ValueError if the output file extension can't hold the codec."""
+    codec = get_codec(codec) if isinstance(codec, str) else codec
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in codec.extensions:
+        raise ValueError(
+            f"{codec.name} needs a {' or '.join(codec.extensions)} output file, not '{extension or output_path}'"
+        )
+
+
+# Variable-frame-rate input: frames are wrapped in a minimal streaming
+# Matroska container (one uncompressed video track, unknown-size segment and
+# clusters), so every frame reaches ffmpeg with its own timestamp.
+MATROSKA_TIMESTAMP_SCALE = 1000000  # ns per tick: timestamps in milliseconds
+_MATROSKA_UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+# FourCCs ffmpeg maps back to a raw pixel format
+_MATROSKA_FOURCCS = {"rgba": b"RGBA", "bgra": b"BGRA", "bgr24": b"BGR\x18"}
+
+
+def _ebml_size(size):
+    length = 1
+    while size >= (1 << (7 * length)) - 1:
+        length += 1
+    return ((1 << (7 * length)) | size).to_bytes(length, "big")
+
+
+def _ebml_element(element_id, payload):
+    if isinstance(payload, int):
+        payload = payload.to_bytes(max(1, (payload.bit_length() + 7) // 8), "big")
+    elif isinstance(payload, str):
+        payload = payload.encode("ascii")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + _ebml_size(len(payload)) + payload
+
+
+class MatroskaFramePipe:
+    """
+    Writes raw frames with timestamps (in seconds) as a Matroska stream to a
+    binary file object. Timestamps are rounded to milliseconds and kept
+    strictly increasing; a new cluster starts whenever a block's offset
+    would overflow its 16 bits. The last frame lasts 1 / fps.
+
+    Only what ffmpeg needs to read a pipe is written, so the output is a
+    stream, not a finished file:
+    - the segment and clusters have unknown sizes and there are no cues
+      or seek head, so players can't seek in it;
+    - a cluster spans at most 32.767 s (the signed 16-bit block offset);
+      longer gaps between frames just start a new cluster;
+    - blocks carry no duration; each frame lasts until the next one, and
+      the last one for the track's default duration.
+    """
+
+    def __init__(self, file, width, height, fps, pix_fmt="rgba"):
+        self.file = file
+        self.cluster_time = None
+        self.last_time = -1
+        if pix_fmt not in _MATROSKA_FOURCCS:
+            raise ValueError(f"Variable frame rate needs one of {', '.join(_MATROSKA_FOURCCS)} input")
+        header = _ebml_element(0x1A45DFA3, b"".join([
+            _ebml_element(0x4286, 1),  # EBMLVersion
+            _ebml_element(0x42F7, 1),  # EBMLReadVersion
+            _ebml_element(0x42F2, 4),  # EBMLMaxIDLength
+            _ebml_element(0x42F3, 8),  # EBMLMaxSizeLength
+            _ebml_element(0x4282, "matroska"),  # DocType
+            _ebml_element(0x4287, 4),  # DocTypeVersion
+            _ebml_element(0x4285, 2),  # DocTypeReadVersion
+        ]))
+        info = _ebml_element(0x1549A966, b"".join([
+            _ebml_element(0x2AD7B1, MATROSKA_TIMESTAMP_SCALE),
+            _ebml_element(0x4D80, "O3_OverlayTool"),  # MuxingApp
+            _ebml_element(0x5741, "O3_OverlayTool"),  # WritingApp
+        ]))
+        video = _ebml_element(0xE0, b"".join([
+            _ebml_element(0xB0, width),  # PixelWidth
+            _ebml_element(0xBA, height),  # PixelHeight
+            _ebml_element(0x2EB524, _MATROSKA_FOURCCS[pix_fmt]),  # ColourSpace
+        ]))
+        tracks = _ebml_element(0x1654AE6B, _ebml_element(0xAE, b"".join([
+            _ebml_element(0xD7, 1),  # TrackNumber
+            _ebml_element(0x73C5, 1),  # TrackUID
+            _ebml_element(0x83, 1),  # TrackType: video
+            _ebml_element(0x23E383, round(1e9 / fps)),  # DefaultDuration in ns
+            _ebml_element(0x86, "V_UNCOMPRESSED"),  # CodecID
+            video,
+        ])))
+        segment = (0x18538067).to_bytes(4, "big") + _MATROSKA_UNKNOWN_SIZE
+        self.file.write(header + segment + info + tracks)
+
+    def write(self, frame, timestamp):
+        milliseconds = max(round(timestamp * 1000), self.last_time + 1)
+        self.last_time = milliseconds
+        if self.cluster_time is None or milliseconds - self.cluster_time > 0x7FFF:
+            self.cluster_time = milliseconds
+            self.file.write((0x1F43B675).to_bytes(4, "big") + _MATROSKA_UNKNOWN_SIZE
+                            + _ebml_element(0xE7, milliseconds))
+        # SimpleBlock: track 1, offset from the cluster timestamp, keyframe flag
+        block_header = b"\x81" + struct.pack(">hB", milliseconds - self.cluster_time, 0x80)
+        self.file.write(b"\xA3" + _ebml_size(len(block_header) + frame.nbytes) + block_header)
+        self.file.write(memoryview(frame))
+
+
+class FfmpegEncoder:
+    """
+    Pipes raw RGBA frames into an ffmpeg process encoding with one of
+    CODECS. 'threads' is passed to the encoder (0 lets ffmpeg decide).
+    Keeps throughput counters: time spent in write() is the time the pipe
+    blocked, i.e. how long the renderer waited on ffmpeg.
+
+    With vfr=True every write() gives the frame's timestamp in seconds and
+    the output keeps those timestamps (variable frame rate): each frame
+    lasts until the next one and the last one for 1 / fps.
+    """
+
+    def __init__(self, output_path, width, height, fps, codec=DEFAULT_CODEC, threads=0, ffmpeg_path=None,
+                 input_pix_fmt="rgba", vfr=False):
+        self.codec = get_codec(codec)
+        check_container(self.codec, output_path)
+        self.output_path = output_path
+        self.ffmpeg_path = find_ffmpeg(ffmpeg_path)
+        self.vfr = vfr
+        if vfr:
+            input_args = ["-f", "matroska", "-i", "-"]
+            output_args = ["-fps_mode", "passthrough", "-enc_time_base", "-1"]
+        else:
+            input_args = [
+                "-f", "rawvideo",
+                "-vcodec", "rawvideo",
+                "-pix_fmt", input_pix_fmt,
+                "-s", f"{width}x{height}",
+                "-r", str(fps),
+                "-i", "-",
+            ]
+            output_args = []
+        self.command = [
+            self.ffmpeg_path,
+            "-y",
+            *input_args,
+            *self.codec.args,
+            *output_args,
+            "-threads", str(threads),
+            output_path
+        ]
+        self.frames = 0
+        self.bytes_in = 0
+        self.write_seconds = 0.0
+        self.start_time = time.perf_counter()
+        self.wall_seconds = None
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE)
+        self.pipe = MatroskaFramePipe(self.process.stdin, width, height, fps, input_pix_fmt) if vfr else None
+
+    def write(self, frame, timestamp=None):
+        start = time.perf_counter()
+        if self.pipe is not None:
+            if timestamp is None:
+                raise ValueError("Variable-frame-rate encoding needs a timestamp for every frame")
+            self.pipe.write(frame, timestamp)
+        else:
+            self.process.stdin.write(memoryview(frame))
+        self.write_seconds += time.perf_counter() - start
+        self.frames += 1
+        self.bytes_in += frame.nbytes
+
+    def close(self):
+        """Finish the file; raises RuntimeError if ffmpeg failed."""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass  # ffmpeg already exited; its return code tells why
+        returncode = self.process.wait()
+        self.wall_seconds = time.perf_counter() - self.start_time
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg ({self.codec.name}) exited with code {returncode}")
+
+    def stats(self):
+        """Frames, input bytes, output size and throughput of the encode so far."""
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self.start_time
+        output_bytes = os.path.getsize(self.output_path) if os.path.exists(self.output_path) else 0
+        return {
+            "codec": self.codec.name,
+            "vfr": self.vfr,
+            "frames": self.frames,
+            "input_bytes": self.bytes_in,
+            "output_bytes": output_bytes,
+            "wall_seconds": wall,
+            "write_seconds": self.write_seconds,
+            "fps": self.frames / wall if wall else 0.0,
+            "input_mb_per_second": self.bytes_in / 2**20 / wall if wall else 0.0,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"Encoder {stats['codec']}: {stats['frames']} frames in {stats['wall_seconds']:.1f}s "
+                f"({stats['fps']:.1f} fps, {stats['input_mb_per_second']:.0f} MB/s in), "
+                f"{stats['output_bytes'] / 2**20:.1f} MB out")
@@ -0,0 +1,173 @@
+import sys
+import time
+import queue
+import threading
+import numpy as np
+
+# Frames in flight between the renderer and the writer thread
+DEFAULT_NUM_BUFFERS = 4
+
+
+def peak_memory_bytes():
+    """
+    Peak resident memory of this process so far (the OS high-water mark),
+    or None if the platform doesn't report it.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class FrameWriter:
+    """
+    Writes rendered frames on a background thread, so rendering the next
+    frame overlaps with encoding the previous one (cv2 and pipe writes both
+    release the GIL).
+
+    Frames live in a small ring of preallocated buffers that are reused for
+    the whole video; nothing is allocated per frame. The renderer takes a
+    free buffer with acquire(), renders into it in place and passes it to
+    submit(), which may be called repeatedly for a frame that is shown
+    several times. Once the renderer has called release() and every
+    submission has been written, the buffer goes back to the ring. Memory is
+    capped at num_buffers frames and the renderer blocks when the writer
+    falls behind. With a RenderStats, the time spent writing, waiting for
+    frames and waiting for buffers is recorded in it. A timestamp given to
+    submit() is passed on as write_frame(buffer, timestamp), for encoders
+    that take variable-frame-rate input.
+    """
+
+    _STOP = object()
+
+    def __init__(self, write_frame, frame_shape, num_buffers=DEFAULT_NUM_BUFFERS, stats=None):
+        self.write_frame = write_frame
+        self.stats = stats
+        self.free_buffers = queue.Queue()
+        for _ in range(num_buffers):
+            # Fill now so the pages are committed here rather than mid-render
+            buffer = np.empty(frame_shape, dtype=np.uint8)
+            buffer.fill(0)
+            self.free_buffers.put(buffer)
+        self.num_buffers = num_buffers
+        self.buffer_bytes = int(np.prod(frame_shape))
+        self.peak_buffers_in_use = 0
+
+        self.pending = queue.Queue(maxsize=num_buffers)
+        self.refcounts = {}
+        self.lock = threading.Lock()
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run, name="FrameWriter", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        stats = self.stats
+        while True:
+            start = time.perf_counter()
+            item = self.pending.get()
+            if item is self._STOP:
+                return
+            buffer, timestamp = item
+            if self.error is None:
+                written = time.perf_counter()
+                try:
+                    if timestamp is None:
+                        self.write_frame(buffer)
+                    else:
+                        self.write_frame(buffer, timestamp)
+                except Exception as e:  # surfaced to the renderer by _check_error()
+                    self.error = e
+                if stats is not None:
+                    stats.add("writer_idle", written - start)
+                    stats.add("write", time.perf_counter() - written)
+                    stats.frames_written += 1
+                    stats.bytes_written += buffer.nbytes
+            self._unref(buffer)
+
+    def _unref(self, buffer):
+        with self.lock:
+            self.refcounts[id(buffer)] -= 1
+            if self.refcounts[id(buffer)] == 0:
+                del self.refcounts[id(buffer)]
+                self.free_buffers.put(buffer)
+
+    def _check_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"Writing frames failed: {self.error}") from self.error
+
+    def _wait(self, operation):
+        # Block on the queues in short steps so a writer error is not missed
+        while True:
+            self._check_error()
+            try:
+                return operation()
+            except (queue.Empty, queue.Full):
+                continue
+
+    def acquire(self):
+        """Take a free frame buffer. Its contents are whatever was last written to it."""
+        start = time.perf_counter()
+        buffer = self._wait(lambda: self.free_buffers.get(timeout=0.5))
+        if self.stats is not None:
+            self.stats.add("buffer_wait", time.perf_counter() - start)
+        with self.lock:
+            self.refcounts[id(buffer)] = 1
+            self.peak_buffers_in_use = max(self.peak_buffers_in_use, len(self.refcounts))
+        return buffer
+
+    def submit(self, buffer, timestamp=None):
+        """Queue a buffer for writing; the renderer must not modify it until released."""
+        with self.lock:
+            self.refcounts[id(buffer)] += 1
+        start = time.perf_counter()
+        self._wait(lambda: self.pending.put((buffer, timestamp), timeout=0.5))
+        if self.stats is not None:
+            self.stats.add("submit_wait", time.perf_counter() - start)
+
+    def release(self, buffer):
+        """Give up the renderer's hold on a buffer from acquire()."""
+        self._unref(buffer)
+
+    def close(self):
+        """Wait for every queued frame to be written and stop the writer thread."""
+        self.pending.put(self._STOP)
+        self.thread.join()
+        self._check_error()
+
+    def memory_stats(self):
+        """Frame buffer usage and the process memory high-water mark."""
+        return {
+            "num_buffers": self.num_buffers,
+            "buffer_bytes": self.buffer_bytes,
+            "peak_buffers_in_use": self.peak_buffers_in_use,
+            "peak_memory_bytes": peak_memory_bytes(),
+        }
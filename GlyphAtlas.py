@@ -0,0 +1,238 @@
+import cv2
+import numpy as np
+
+GLYPHS_PER_COLUMN = 256
+
+
+class GlyphAtlas:
+    """
+    Every glyph of a font sheet as one (n_glyphs, tile_h, tile_w, C) array,
+    ordered like the sheet (glyph = column * 256 + row), plus one background
+    tile at the end for cells without a glyph. A whole OSD frame is rendered
+    with a single gather from this array instead of one paste per cell.
+    """
+
+    def __init__(self, tiles, num_columns, tile_width, tile_height, grid_cols, grid_rows, background):
+        """
+        'tiles' comes from pack_tiles(): the glyphs of the first num_columns
+        sheet columns followed by the background tile. It may be a read-only
+        memmap of a cached atlas. tile_width/tile_height are the (possibly
+        fractional) tile pitch used to place cells; the tiles themselves are
+        int(pitch) pixels big.
+        """
+        self.num_columns = num_columns
+        self.grid_cols = grid_cols
+        self.grid_rows = grid_rows
+        self.tile_h, self.tile_w, self.channels = tiles.shape[1:]
+        self.background = np.asarray(background, dtype=np.uint8)
+
+        self.tiles = tiles
+        self.blank_index = len(tiles) - 1
+
+        self.resolution = (int(grid_cols * tile_width), int(grid_rows * tile_height))
+
+        # Top-left pixel of each cell, truncated like the per-tile renderer did
+        x = (np.arange(grid_cols) * tile_width).astype(np.intp)
+        y = (np.arange(grid_rows) * tile_height).astype(np.intp)
+        self.contiguous = (
+            np.array_equal(x, np.arange(grid_cols) * self.tile_w)
+            and np.array_equal(y, np.arange(grid_rows) * self.tile_h)
+            and self.resolution == (grid_cols * self.tile_w, grid_rows * self.tile_h)
+        )
+        # With a fractional pitch the tiles leave 1px background gaps between
+        # some cells. Each row of cells is then packed tightly and spread out
+        # with src_cols, which maps every frame column to a packed column or
+        # to the extra background column at the end.
+        self.cell_x = x
+        self.cell_y = y
+        packed_width = grid_cols * self.tile_w
+        self.src_cols = np.full(self.resolution[0], packed_width, dtype=np.intp)
+        self.src_cols[(x[:, None] + np.arange(self.tile_w)).reshape(-1)] = np.arange(packed_width)
+        covered = np.zeros(self.resolution[1], dtype=bool)
+        covered[(y[:, None] + np.arange(self.tile_h)).reshape(-1)] = True
+        self.gap_rows = np.flatnonzero(~covered)
+
+    @staticmethod
+    def crop_glyphs(sheet, num_columns, tile_width, tile_height, fill=0):
+        """
+        Cut the glyphs of the first num_columns columns of a font sheet
+        (H, W, C array) into one (num_columns * 256, int(tile_height),
+        int(tile_width), C) array. Tile corners are truncated like the
+        per-glyph crop did; tiles reaching past the sheet edge are filled
+        with 'fill' (zeros: transparent).
+        """
+        tile_w, tile_h = int(tile_width), int(tile_height)
+        channels = sheet.shape[2]
+        if (tile_w == tile_width and tile_h == tile_height
+                and sheet.shape[0] >= GLYPHS_PER_COLUMN * tile_h and sheet.shape[1] >= num_columns * tile_w):
+            # Whole-pixel pitch: the glyphs tile the sheet, so a reshape cuts them all
+            grid = sheet[:GLYPHS_PER_COLUMN * tile_h, :num_columns * tile_w]
+            grid = grid.reshape(GLYPHS_PER_COLUMN, tile_h, num_columns, tile_w, channels)
+            return np.ascontiguousarray(grid.transpose(2, 0, 1, 3, 4)).reshape(-1, tile_h, tile_w, channels)
+
+        glyphs = np.arange(num_columns * GLYPHS_PER_COLUMN)
+        left = (glyphs // GLYPHS_PER_COLUMN * tile_width).astype(np.intp)
+        upper = (glyphs % GLYPHS_PER_COLUMN * tile_height).astype(np.intp)
+        inside = (left + tile_w <= sheet.shape[1]) & (upper + tile_h <= sheet.shape[0])
+
+        rows = np.minimum(upper[:, None] + np.arange(tile_h), sheet.shape[0] - 1)
+        cols = np.minimum(left[:, None] + np.arange(tile_w), sheet.shape[1] - 1)
+        tiles = sheet[rows[:, :, None], cols[:, None, :]]
+        tiles[~inside] = fill
+        return tiles
+
+    @staticmethod
+    def resize_tiles(tiles, tile_width, tile_height):
+        """
+        Resample (n, h, w, C) tiles to tile_width x tile_height pixels, one
+        tile at a time so no glyph bleeds into its neighbour. Shrinking uses
+        area interpolation, enlarging bilinear. RGBA tiles are resampled with
+        premultiplied alpha, so the colour of transparent pixels doesn't leak
+        into the glyph edges.
+        """
+        num_tiles, height, width, channels = tiles.shape
+        shrinking = tile_width <= width and tile_height <= height
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+        resized = np.empty((num_tiles, tile_height, tile_width, channels), dtype=np.uint8)
+        for i in range(num_tiles):
+            tile = tiles[i].astype(np.float32)
+            if channels == 4:
+                tile[..., :3] *= tile[..., 3:] / 255
+            tile = cv2.resize(tile, (tile_width, tile_height), interpolation=interpolation)
+            if channels == 4:
+                alpha = tile[..., 3:]
+                np.divide(tile[..., :3] * 255, alpha, out=tile[..., :3], where=alpha > 0)
+            np.clip(np.rint(tile), 0, 255, out=tile)
+            resized[i] = tile
+        return resized
+
+    @staticmethod
+    def pack_tiles(tiles, background):
+        """Append the background tile for empty cells to a (n, h, w, C) glyph array."""
+        blank = np.empty((1,) + tiles.shape[1:], dtype=np.uint8)
+        blank[:] = background
+        return np.concatenate([tiles, blank])
+
+    def glyph_indices(self, frame_content):
+        """
+        Map a flat, row-major frame of glyph indices to atlas rows, shaped
+        (grid_rows, grid_cols). Columns past the sheet are clamped to the
+        last one; cells missing from a short frame get the background tile.
+        """
+        num_cells = self.grid_rows * self.grid_cols
+        content = np.asarray(frame_content, dtype=np.intp).reshape(-1)[:num_cells]
+
+        column = np.minimum(content // GLYPHS_PER_COLUMN, self.num_columns - 1)
+        indices = np.full(num_cells, self.blank_index, dtype=np.intp)
+        indices[:len(content)] = column * GLYPHS_PER_COLUMN + content % GLYPHS_PER_COLUMN
+        return indices.reshape(self.grid_rows, self.grid_cols)
+
+    def new_frame(self):
+        """Allocate a frame filled with the background color."""
+        frame = np.empty((self.resolution[1], self.resolution[0], self.channels), dtype=np.uint8)
+        frame[:] = self.background
+        return frame
+
+    def render(self, frame_content, out=None):
+        """
+        Render a frame into 'out' (or a new array) of shape (height, width, C).
+        """
+        return self.render_indices(self.glyph_indices(frame_content), out)
+
+    def render_indices(self, indices, out=None):
+        """
+        Render a (grid_rows, grid_cols) grid of atlas rows from glyph_indices().
+        Each row of cells is a single gather from the atlas; gathering row by
+        row keeps the copies cache-sized and avoids a full-frame temporary.
+        """
+        rows, cols = self.grid_rows, self.grid_cols
+        th, tw, channels = self.tile_h, self.tile_w, self.channels
+
+        if self.contiguous:
+            if out is None:
+                out = np.empty((self.resolution[1], self.resolution[0], channels), dtype=np.uint8)
+            # (rows, th, cols, tw, C) frame seen as (rows, cols, th, tw, C) cells
+            cells = out.reshape(rows, th, cols, tw, channels).transpose(0, 2, 1, 3, 4)
+            for i in range(rows):
+                cells[i] = self.tiles[indices[i]]
+        else:
+            if out is None:
+                out = np.empty((self.resolution[1], self.resolution[0], channels), dtype=np.uint8)
+            out[self.gap_rows] = self.background
+
+            packed_row = np.empty((th, cols * tw + 1, channels), dtype=np.uint8)
+            packed_row[:, -1] = self.background
+            cells = packed_row[:, :-1].reshape(th, cols, tw, channels).transpose(1, 0, 2, 3)
+            for i, y in enumerate(self.cell_y):
+                cells[...] = self.tiles[indices[i]]
+                np.take(packed_row, self.src_cols, axis=1, out=out[y:y + th])
+        return out
+
+    def draw_cells(self, out, cell_rows, cell_cols, indices):
+        """
+        Redraw only the given cells of an already rendered frame in place.
+        'indices' are the atlas rows for the cells at (cell_rows, cell_cols).
+        """
+        th, tw = self.tile_h, self.tile_w
+        if self.contiguous:
+            cells = out.reshape(self.grid_rows, th, self.grid_cols, tw, self.channels).transpose(0, 2, 1, 3, 4)
+            cells[cell_rows, cell_cols] = self.tiles[indices]
+        else:
+            for row, col, index in zip(cell_rows, cell_cols, indices):
+                y, x = self.cell_y[row], self.cell_x[col]
+                out[y:y + th, x:x + tw] = self.tiles[index]
+
+
+class IncrementalRenderer:
+    """
+    Renders consecutive frames into persistent canvases. Each new glyph grid
+    is compared with the grid last drawn on the target canvas and only the
+    cells that changed are redrawn, which is usually a handful (timer,
+    voltage, RSSI digits).
+
+    Without 'out' a single internal canvas is reused and overwritten by the
+    next render() call. With 'out' the frame is drawn in place into a
+    caller-owned buffer, e.g. one of a FrameWriter's pooled buffers; the
+    grid drawn on each buffer is remembered, so the buffer must not be
+    written to by anything else.
+    """
+
+    def __init__(self, atlas):
+        self.atlas = atlas
+        self.canvas = None
+        self.drawn_indices = {}  # id(canvas) -> glyph grid currently drawn on it
+        self.frames_rendered = 0
+        self.dirty_cells = 0
+
+    def render(self, frame_content, out=None):
+        if out is None:
+            if self.canvas is None:
+                self.canvas = np.empty(
+                    (self.atlas.resolution[1], self.atlas.resolution[0], self.atlas.channels), dtype=np.uint8
+                )
+            out = self.canvas
+
+        indices = self.atlas.glyph_indices(frame_content)
+        num_cells = indices.size
+        previous = self.drawn_indices.get(id(out))
+
+        if previous is None:
+            self.atlas.render_indices(indices, out=out)
+            dirty = num_cells
+        else:
+            cell_rows, cell_cols = np.nonzero(indices != previous)
+            dirty = len(cell_rows)
+            if dirty > num_cells // 2:
+                self.atlas.render_indices(indices, out=out)
+            elif dirty:
+                self.atlas.draw_cells(out, cell_rows, cell_cols, indices[cell_rows, cell_cols])
+
+        self.drawn_indices[id(out)] = indices
+        self.frames_rendered += 1
+        self.dirty_cells += dirty
+        return out
+
+    def dirty_ratio(self):
+        """Average fraction of cells redrawn per rendered frame."""
+        total_cells = self.frames_rendered * self.atlas.grid_rows * self.atlas.grid_cols
+        return self.dirty_cells / total_cells if total_cells else 0.0
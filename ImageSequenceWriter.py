@@ -0,0 +1,216 @@
+import os
+import re
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Lists every unique image with how long it is shown; ffmpeg reads it with
+# "ffmpeg -f concat -i index.ffconcat" to turn the sequence back into a video
+INDEX_NAME = "index.ffconcat"
+FRAME_PREFIX = "frame_"
+# Frames queued for the writer threads per thread; bounds memory when
+# rendering outpaces encoding
+QUEUE_PER_THREAD = 2
+
+
+class ImageFormat:
+    """A lossless image format with alpha: its extension and Pillow save options for a compression level."""
+
+    def __init__(self, name, extension, compression_range, default_compression, save_options, description):
+        self.name = name
+        self.extension = extension
+        self.compression_range = compression_range  # (lowest, highest)
+        self.default_compression = default_compression
+        self.save_options = save_options  # compression -> Image.save() keywords
+        self.description = description
+
+    def options(self, compression=None):
+        if compression is None:
+            compression = self.default_compression
+        low, high = self.compression_range
+        if not low <= compression <= high:
+            raise ValueError(f"{self.name} compression must be between {low} and {high}, not {compression}")
+        return self.save_options(compression)
+
+
+# Measured on one CPU core with OSD frames of a Betaflight flight at
+# 2544x1440 (53x20 grid, 1440p font), Pillow 12:
+#
+#   format   compression   ms per frame   KB per frame
+#   png                1             68            112
+#   png                3             64            110
+#   png                6            110             62
+#   png                9            172             61
+#   webp               1            146             19
+#   webp               4            112             19
+#
+# Both encoders release the GIL, so the writer threads encode in parallel.
+# Pillow writes PNGs about twice as fast as cv2.imwrite at the same size,
+# and its lossless WebP (with exact=True) keeps the colour of transparent
+# pixels, so either format decodes to exactly the rendered frame.
+IMAGE_FORMATS = {
+    "png": ImageFormat(
+        "png", ".png", (0, 9), 3,
+        lambda level: {"format": "PNG", "compress_level": level},
+        "PNG, zlib level 0-9. Read by every editor.",
+    ),
+    "webp": ImageFormat(
+        "webp", ".webp", (0, 6), 4,
+        lambda method: {"format": "WEBP", "lossless": True, "exact": True, "method": method},
+        "Lossless WebP, effort 0-6. A fifth of the size of PNG, fewer editors read it.",
+    ),
+}
+DEFAULT_IMAGE_FORMAT = "png"
+
+
+def get_image_format(name):
+    try:
+        return IMAGE_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown image format '{name}', expected one of {', '.join(IMAGE_FORMATS)}")
+
+
+def link_or_copy(source, target):
+    """Hardlink target to source, or copy it where the filesystem has no hardlinks (FAT, exFAT)."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ImageSequenceWriter:
+    """
+    Writes a numbered image sequence (frame_000000.png, ...) with alpha
+    into 'directory', one image per output frame.
+
+    write() takes one rendered frame and how many output frames show it.
+    The frame is encoded once, by a pool of writer threads, and the frames
+    that repeat it are hardlinks to that file (link_repeats), so they cost
+    neither encoding nor disk space. index.ffconcat lists every encoded
+    image with its duration, which is all that editors or ffmpeg need when
+    the repeats are not linked.
+
+    Files of an earlier sequence in the directory are removed first, so no
+    stale frames are left past the end of a shorter render.
+    """
+
+    def __init__(self, directory, fps, image_format=DEFAULT_IMAGE_FORMAT, compression=None, threads=0,
+                 link_repeats=True):
+        self.directory = directory
+        self.fps = fps
+        self.format = get_image_format(image_format)
+        self.save_options = self.format.options(compression)
+        self.threads = threads or os.cpu_count() or 1
+        self.link_repeats = link_repeats
+
+        os.makedirs(directory, exist_ok=True)
+        self.remove_sequence(directory)
+
+        self.index = []  # (file name, number of output frames) in order
+        self.frames = 0  # output frames, repeats included
+        self.images = 0  # images encoded
+        self.bytes_out = 0
+        self.write_seconds = 0.0  # summed over the writer threads
+        self.error = None
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.threads * QUEUE_PER_THREAD)
+        self.pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="ImageWriter")
+        self.start_time = time.perf_counter()
+        self.wall_seconds = None
+
+    @staticmethod
+    def remove_sequence(directory):
+        """Delete the frames and index of an earlier sequence in 'directory', and nothing else."""
+        extensions = "|".join(re.escape(image_format.extension) for image_format in IMAGE_FORMATS.values())
+        pattern = re.compile(re.escape(FRAME_PREFIX) + r"\d+(" + extensions + ")$")
+        for name in os.listdir(directory):
+            if pattern.match(name) or name == INDEX_NAME:
+                os.remove(os.path.join(directory, name))
+
+    def frame_name(self, frame_num):
+        return f"{FRAME_PREFIX}{frame_num:06d}{self.format.extension}"
+
+    def write(self, frame, first_frame, num_frames=1):
+        """
+        Queue an RGBA frame shown from output frame first_frame for
+        num_frames frames. The frame is copied, so the caller may draw the
+        next one into the same array right away. Blocks while the writer
+        threads are QUEUE_PER_THREAD frames per thread behind.
+        """
+        if self.error is not None:
+            raise self.error
+        self.slots.acquire()
+        image = Image.fromarray(frame.copy(), "RGBA")
+        name = self.frame_name(first_frame)
+        self.index.append((name, num_frames))
+        self.frames += num_frames
+        future = self.pool.submit(self._encode, image, first_frame, num_frames)
+        future.add_done_callback(self._done)
+
+    def _encode(self, image, first_frame, num_frames):
+        start = time.perf_counter()
+        path = os.path.join(self.directory, self.frame_name(first_frame))
+        image.save(path, **self.save_options)
+        if self.link_repeats:
+            for frame_num in range(first_frame + 1, first_frame + num_frames):
+                link_or_copy(path, os.path.join(self.directory, self.frame_name(frame_num)))
+        size = os.path.getsize(path)
+        with self.lock:
+            self.images += 1
+            self.bytes_out += size
+            self.write_seconds += time.perf_counter() - start
+
+    def _done(self, future):
+        self.slots.release()
+        if future.exception() is not None and self.error is None:
+            self.error = future.exception()
+
+    def write_index(self):
+        """Write index.ffconcat: each image with its duration in seconds."""
+        lines = ["ffconcat version 1.0"]
+        for name, num_frames in self.index:
+            lines.append(f"file '{name}'")
+            lines.append(f"duration {num_frames / self.fps:.6f}")
+        if self.index:
+            # The concat demuxer only applies the last duration when the
+            # last file is listed once more
+            lines.append(f"file '{self.index[-1][0]}'")
+        with open(os.path.join(self.directory, INDEX_NAME), "w", encoding="utf-8") as index_file:
+            index_file.write("\n".join(lines) + "\n")
+
+    def close(self, complete=True):
+        """
+        Wait for the writer threads and, if the sequence is complete, write
+        the index; it is written last, so its presence marks a finished
+        sequence. Raises the first error of a writer thread.
+        """
+        self.pool.shutdown(wait=True)
+        self.wall_seconds = time.perf_counter() - self.start_time
+        if self.error is not None:
+            raise self.error
+        if complete:
+            self.write_index()
+
+    def stats(self):
+        """Frames, images, output size and throughput of the sequence so far."""
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self.start_time
+        return {
+            "codec": f"{self.format.name} sequence",
+            "frames": self.frames,
+            "images": self.images,
+            "threads": self.threads,
+            "output_bytes": self.bytes_out,
+            "wall_seconds": wall,
+            "write_seconds": self.write_seconds,
+            "fps": self.frames / wall if wall else 0.0,
+            "images_per_second": self.images / wall if wall else 0.0,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"Image sequence {self.format.name}: {stats['images']} images for {stats['frames']} frames "
+                f"in {stats['wall_seconds']:.1f}s ({stats['images_per_second']:.1f} images/s with "
+                f"{stats['threads']} threads), {stats['output_bytes'] / 2**20:.1f} MB out")
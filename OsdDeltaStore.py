@@ -0,0 +1,198 @@
+import os
+import json
+import tempfile
+import numpy as np
+
+from OsdFrameStore import OsdFrameStore
+
+# A full grid every this many frames bounds the deltas replayed for random
+# access; it matches the block size the renderers stream with.
+DEFAULT_KEYFRAME_INTERVAL = 256
+# Bump when the sidecar layout changes, so old sidecars are ignored
+SIDECAR_VERSION = 1
+SIDECAR_SUFFIX = ".delta.npz"
+
+
+class DeltaFrameStore(OsdFrameStore):
+    """
+    Compressed drop-in for OsdFrameStore: a full glyph grid (keyframe) every
+    keyframe_interval frames and, for every other frame, only the cells that
+    changed since the previous frame as (cell index, new glyph) pairs.
+
+    OSD frames mostly differ in a handful of cells (timer, voltage, RSSI), so
+    this is typically one to two orders of magnitude smaller than the full
+    grids. Any frame is decoded from its nearest keyframe by replaying at most
+    keyframe_interval - 1 deltas.
+
+    Deltas are stored CSR-style: the changes of frame i are
+    delta_cells/delta_glyphs[delta_offsets[i]:delta_offsets[i + 1]], with
+    cells as flat row-major indices into the (rows, cols) grid.
+    """
+
+    def __init__(self, keyframes, delta_offsets, delta_cells, delta_glyphs, keyframe_interval,
+                 raw_timestamps=None, frame_numbers=None, frame_sizes=None, time_divisor=1.0, frame_rate=60):
+        self.keyframes = keyframes
+        self.delta_offsets = delta_offsets
+        self.delta_cells = delta_cells
+        self.delta_glyphs = delta_glyphs
+        self.keyframe_interval = keyframe_interval
+        self.raw_timestamps = raw_timestamps
+        self.frame_numbers = frame_numbers
+        self.frame_sizes = frame_sizes
+        self.time_divisor = time_divisor
+        self.frame_rate = frame_rate
+        self._timestamps = None
+
+    def __len__(self):
+        return len(self.delta_offsets) - 1
+
+    @property
+    def num_rows(self):
+        return self.keyframes.shape[1]
+
+    @property
+    def num_cols(self):
+        return self.keyframes.shape[2]
+
+    @property
+    def frames(self):
+        """All frames decoded as a (n_frames, rows, cols) array; only for code that needs every grid at once."""
+        return self.block(0, len(self))[1]
+
+    @property
+    def nbytes(self):
+        """Memory held by the glyph data (keyframes and deltas)."""
+        return sum(array.nbytes for array in (self.keyframes, self.delta_offsets, self.delta_cells, self.delta_glyphs))
+
+    def _apply_deltas(self, grid, start, stop):
+        """Apply the changes of frames start..stop-1 in order to a flat grid, in place."""
+        lo, hi = self.delta_offsets[start], self.delta_offsets[stop]
+        if lo == hi:
+            return
+        # A cell may change several times; keep only its last new glyph
+        cells = self.delta_cells[lo:hi][::-1]
+        glyphs = self.delta_glyphs[lo:hi][::-1]
+        cells, last = np.unique(cells, return_index=True)
+        grid[cells] = glyphs[last]
+
+    def frame(self, frame_index):
+        """Decode one frame as a flat, row-major array of glyph indices."""
+        if frame_index < 0:
+            frame_index += len(self)
+        if not 0 <= frame_index < len(self):
+            raise IndexError("Frame index out of bounds.")
+        keyframe = frame_index // self.keyframe_interval
+        grid = self.keyframes[keyframe].reshape(-1).copy()
+        self._apply_deltas(grid, keyframe * self.keyframe_interval + 1, frame_index + 1)
+        return grid
+
+    def block(self, start, stop):
+        """
+        Decode frames start..stop-1. Returns (timestamps, frames) with frames
+        as a contiguous (n, rows, cols) uint16 array, like OsdFrameStore.block().
+        """
+        stop = min(stop, len(self))
+        frames = np.empty((max(stop - start, 0), self.num_rows * self.num_cols), dtype=np.uint16)
+        if len(frames):
+            frames[0] = self.frame(start)
+            for i in range(1, len(frames)):
+                frame_index = start + i
+                if frame_index % self.keyframe_interval == 0:
+                    frames[i] = self.keyframes[frame_index // self.keyframe_interval].reshape(-1)
+                    continue
+                frames[i] = frames[i - 1]
+                lo, hi = self.delta_offsets[frame_index], self.delta_offsets[frame_index + 1]
+                frames[i, self.delta_cells[lo:hi]] = self.delta_glyphs[lo:hi]
+        return self.timestamps_between(start, stop), frames.reshape(-1, self.num_rows, self.num_cols)
+
+    @classmethod
+    def from_store(cls, store, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        """Compress any frame store, reading it keyframe_interval frames at a time."""
+        num_cells = store.num_rows * store.num_cols
+        keyframes, cells, glyphs = [], [], []
+        counts = np.zeros(len(store), dtype=np.int64)
+
+        for start in range(0, len(store), keyframe_interval):
+            _, frames = store.block(start, start + keyframe_interval)
+            frames = frames.reshape(len(frames), num_cells)
+            keyframes.append(frames[0])
+            # Row-major nonzero keeps the changes grouped by frame
+            frame_offsets, changed_cells = np.nonzero(frames[1:] != frames[:-1])
+            counts[start + 1:start + len(frames)] = np.bincount(frame_offsets, minlength=len(frames) - 1)
+            cells.append(changed_cells.astype(np.uint16))
+            glyphs.append(frames[1:][frame_offsets, changed_cells])
+
+        keyframes = np.array(keyframes, dtype=np.uint16).reshape(-1, store.num_rows, store.num_cols)
+        return cls(
+            keyframes,
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            np.concatenate(cells) if cells else np.zeros(0, dtype=np.uint16),
+            np.concatenate(glyphs).astype(np.uint16) if glyphs else np.zeros(0, dtype=np.uint16),
+            keyframe_interval,
+            raw_timestamps=None if store.raw_timestamps is None else np.array(store.raw_timestamps),
+            frame_numbers=None if store.frame_numbers is None else np.array(store.frame_numbers),
+            frame_sizes=None if store.frame_sizes is None else np.array(store.frame_sizes),
+            time_divisor=store.time_divisor,
+            frame_rate=store.frame_rate,
+        )
+
+    def save(self, path, header=None, source=None):
+        """
+        Write the store to a compressed .npz sidecar. 'header' (the reader's
+        header dict) and 'source' (e.g. size and mtime of the .osd file) are
+        stored as JSON so load() callers can check the sidecar is current.
+        The file is replaced atomically.
+        """
+        arrays = {
+            "keyframes": self.keyframes,
+            "delta_offsets": self.delta_offsets,
+            "delta_cells": self.delta_cells,
+            "delta_glyphs": self.delta_glyphs,
+        }
+        for name in ("raw_timestamps", "frame_numbers", "frame_sizes"):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        meta = {
+            "sidecar_version": SIDECAR_VERSION,
+            "keyframe_interval": self.keyframe_interval,
+            "time_divisor": self.time_divisor,
+            "header": header,
+            "source": source,
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, frame_rate=60):
+        """
+        Read a sidecar written by save(). Returns (store, meta) where meta
+        holds the saved header and source info, or None if the file is from
+        another sidecar version.
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("sidecar_version") != SIDECAR_VERSION:
+                return None
+            arrays = {name: data[name] for name in data.files if name != "meta"}
+
+        store = cls(
+            arrays["keyframes"],
+            arrays["delta_offsets"],
+            arrays["delta_cells"],
+            arrays["delta_glyphs"],
+            meta["keyframe_interval"],
+            raw_timestamps=arrays.get("raw_timestamps"),
+            frame_numbers=arrays.get("frame_numbers"),
+            frame_sizes=arrays.get("frame_sizes"),
+            time_divisor=meta["time_divisor"],
+            frame_rate=frame_rate,
+        )
+        return store, meta
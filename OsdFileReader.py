@@ -1,17 +1,40 @@
+import os
+import math
 import struct
+import numpy as np
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog
 
+from OsdFrameStore import OsdFrameStore
+from OsdDeltaStore import DeltaFrameStore, SIDECAR_SUFFIX
+from RenderSchedule import RenderSchedule
+from TelemetryExtractor import extract_telemetry, iter_telemetry, DEFAULT_BLOCK_SIZE
+
 class OsdFileReader:
-    def __init__(self, file_path, framerate=60):
+    def __init__(self, file_path, framerate=60, compact=False, sidecar=False):
+        """
+        'compact' keeps the frames as keyframes plus per-frame deltas
+        (DeltaFrameStore) instead of full grids. 'sidecar' also saves that
+        store next to the .osd file and loads it instead of parsing the file
+        next time, as long as the .osd file is unchanged.
+        """
         self.file_path = file_path
         self.header = {}
-        self.frame_data = pd.DataFrame(columns=["timestamp", "frameNumber", "frameSize", "frameContent"])
+        self.frames = None  # OsdFrameStore (or DeltaFrameStore) with the glyph grids
+        self._frame_data = None  # DataFrame view, built from self.frames on first use
         self.parsed_data_df = None  # will hold parsed data from user-defined parse() calls
         self.frame_rate = framerate
         self.duration = None
+        self.use_sidecar = sidecar
+
+        if sidecar and self.load_sidecar():
+            return
         self.load_file()
+        if compact or sidecar:
+            self.compact()
+        if sidecar:
+            self.save_sidecar()
 
     def load_file(self):
         with open(self.file_path, 'rb') as file:
@@ -31,8 +54,102 @@ class OsdFileReader:
             # Otherwise, use the DJI/DJO3 parser
             self._parse_djo3_format(file, header_bytes)
 
-        # Generate missing timestamps or frame numbers as needed
-        self.generate_pseudo_frames(self.frame_rate)
+    @property
+    def frame_data(self):
+        """
+        The frames as a DataFrame with one list of glyphs per row. This is a
+        compatibility view built from self.frames on first access; it costs
+        ~28 bytes per glyph, so bulk processing should use self.frames.
+        """
+        if self._frame_data is None:
+            self._frame_data = self._build_frame_data()
+        return self._frame_data
+
+    @frame_data.setter
+    def frame_data(self, value):
+        self._frame_data = value
+
+    def _build_frame_data(self):
+        n_frames = len(self.frames)
+        nulls = [None] * n_frames
+        frame_numbers = self.frames.frame_numbers
+        frame_data = pd.DataFrame({
+            "timestamp": self.frames.timestamps if self.frames.has_timestamps else nulls,
+            "frameNumber": nulls if frame_numbers is None else frame_numbers.tolist(),
+            "frameSize": self.frames.frame_sizes.tolist(),
+            "frameContent": self._frame_contents(),
+        })
+        if self.header.get('version') == 99:
+            # DJI/DJO3 files have no frame numbers; derive them at the load-time
+            # frame rate, as generate_pseudo_frames() does
+            frame_data["frameNumber"] = (frame_data["timestamp"] * self.frames.frame_rate).astype(int)
+        return frame_data
+
+    def _frame_contents(self):
+        """
+        Per-frame glyph lists as the frame-by-frame parser returns them: the
+        store pads short frames of variable-size files to the grid, so each
+        one is cut back to the glyphs its frameSize gave. Frames larger than
+        the grid were truncated by the store and stay at the grid size.
+        """
+        num_rows, num_cols = self.frames.num_rows, self.frames.num_cols
+        grids = self.frames.frames.reshape(len(self.frames), num_rows * num_cols).tolist()
+        lengths = np.asarray(self.frames.frame_sizes, dtype=np.int64)
+        if self.header.get('version') == 2:
+            lengths = lengths // num_rows * num_rows  # v2 frames keep whole columns only
+        lengths = np.minimum(lengths, num_rows * num_cols)
+        if np.all(lengths == num_rows * num_cols):
+            return grids
+        return [content[:length] for content, length in zip(grids, lengths.tolist())]
+
+    def compact(self, keyframe_interval=None):
+        """Replace the frame store with a DeltaFrameStore of the same frames."""
+        if isinstance(self.frames, DeltaFrameStore):
+            return
+        before = self.frames.frames.nbytes
+        kwargs = {} if keyframe_interval is None else {"keyframe_interval": keyframe_interval}
+        compact = DeltaFrameStore.from_store(self.frames, **kwargs)
+        if compact.nbytes > before:
+            # Most cells change every frame; deltas would cost more than full grids
+            compact = DeltaFrameStore.from_store(self.frames, keyframe_interval=1)
+        self.frames = compact
+        self._frame_data = None  # the decoded DataFrame of variable-size files is rebuilt on demand
+        print(f"Compact frame store: {before / 2**20:.1f} MB of grids -> {self.frames.nbytes / 2**20:.1f} MB")
+
+    def sidecar_path(self):
+        return self.file_path + SIDECAR_SUFFIX
+
+    def _source_info(self):
+        stat = os.stat(self.file_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def load_sidecar(self):
+        """
+        Load header and frames from the sidecar if it exists and was written
+        for the current .osd file. Returns True on success.
+        """
+        path = self.sidecar_path()
+        if not os.path.exists(path):
+            return False
+        try:
+            loaded = DeltaFrameStore.load(path, frame_rate=self.frame_rate)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable sidecar {path}: {e}")
+            return False
+        if loaded is None or loaded[1]["source"] != self._source_info():
+            return False
+
+        self.frames, meta = loaded
+        self.header = meta["header"]
+        return True
+
+    def save_sidecar(self):
+        """Write the compact frame store next to the .osd file; failures are only reported."""
+        self.compact()
+        try:
+            self.frames.save(self.sidecar_path(), header=self.header, source=self._source_info())
+        except OSError as e:
+            print(f"Could not write sidecar {self.sidecar_path()}: {e}")
 
     def _parse_djo3_format(self, file, header_bytes):
         """
@@ -73,34 +190,11 @@ class OsdFileReader:
             'signature': signature.decode('utf-8', errors='ignore')
         }
 
-        frames = []
-        while True:
-            # Read delta_time (4 bytes, unsigned int)
-            time_data = file.read(4)
-            if len(time_data) < 4:
-                break  # End of file
-
-            (delta_time_ms,) = struct.unpack('<I', time_data)
-            timestamp_sec = float(delta_time_ms) / 1000.0
-
-            # Read the frame content based on computed framesize (each word is 2 bytes)
-            frame_bytes = file.read(framesize * 2)
-            if len(frame_bytes) < framesize * 2:
-                break  # Incomplete frame
-
-            frame_content = []
-            for i in range(0, len(frame_bytes), 2):
-                val = struct.unpack('<H', frame_bytes[i:i+2])[0]
-                frame_content.append(val)
-
-            frames.append({
-                "timestamp": timestamp_sec,
-                "frameNumber": None,
-                "frameSize": framesize,
-                "frameContent": frame_content
-            })
-
-        self.frame_data = pd.DataFrame(frames)
+        # Every frame is a fixed-size record, so the body is memory-mapped as
+        # one structured array instead of being read into memory.
+        self.frames = OsdFrameStore.open_djo3(
+            self.file_path, len(header_bytes), numRows, numCols, frame_rate=self.frame_rate
+        )
 
     def _parse_old_format(self, file):
         """
@@ -119,51 +213,110 @@ class OsdFileReader:
             'fontVariant': file.read(5).decode('utf-8').strip('\x00')
         }
 
-        frames = []
+        version = self.header['version']
+        width = self.header['config']['charWidth']
         height = self.header['config']['charHeight']
 
-        while True:
-            try:
-                if self.header['version'] == 3:
-                    timestamp, = struct.unpack('<d', file.read(8))
-                    frame_size, = struct.unpack('<I', file.read(4))
-                    frame_data = file.read(frame_size)
-                    if len(frame_data) < frame_size:
-                        break
-                    frame_data = list(frame_data)
-                    frames.append({
-                        "timestamp": timestamp,
-                        "frameNumber": None,
-                        "frameSize": frame_size,
-                        "frameContent": frame_data
-                    })
-                elif self.header['version'] == 2:
-                    frame_number, frame_size = struct.unpack('<II', file.read(8))
-                    raw_data = file.read(2 * frame_size)
-                    if len(raw_data) < (2 * frame_size):
-                        break
-                    frame_data = []
-                    for i in range(0, len(raw_data), 2):
-                        val = struct.unpack('<H', raw_data[i:i + 2])[0]
-                        frame_data.append(val)
-                    frame_data = [
-                        frame_data[i * height + j]
-                        for j in range(height)
-                        for i in range(len(frame_data) // height)
-                    ]
-                    frames.append({
-                        "timestamp": None,
-                        "frameNumber": frame_number,
-                        "frameSize": frame_size,
-                        "frameContent": frame_data
-                    })
-                else:
-                    print(f"Unsupported version: {self.header['version']}")
-                    break
-            except (struct.error, EOFError):
-                break
-
-        self.frame_data = pd.DataFrame(frames)
+        if version in (2, 3):
+            self.frames = OsdFrameStore.open_msposd(
+                self.file_path, file.tell(), version, height, width, frame_rate=self.frame_rate
+            )
+            if self.frames is not None:
+                return
+
+        if version == 3:
+            # [double timestamp][uint32 frame_size][uint8 glyph * frame_size]
+            head_fields = [("timestamp", "<f8"), ("frameSize", "<u4")]
+            glyph_dtype = "u1"
+        elif version == 2:
+            # [uint32 frame_number][uint32 frame_size][uint16 glyph * frame_size]
+            head_fields = [("frameNumber", "<u4"), ("frameSize", "<u4")]
+            glyph_dtype = "<u2"
+        else:
+            print(f"Unsupported version: {version}")
+            self._set_decoded_frames(pd.DataFrame([]))
+            return
+
+        timestamps, frame_numbers, frame_sizes, contents = [], [], [], []
+        for records in self._decode_sized_frames(file.read(), head_fields, glyph_dtype):
+            n_frames = len(records)
+            content = records["content"]
+            if version == 3:
+                timestamps.extend(records["timestamp"].tolist())
+                frame_numbers.extend([None] * n_frames)
+            else:
+                # v2 stores the grid column by column; switch to row-major
+                frame_size = content.shape[1]
+                width = frame_size // height
+                content = (
+                    content[:, :width * height]
+                    .reshape(n_frames, width, height)
+                    .transpose(0, 2, 1)
+                    .reshape(n_frames, width * height)
+                )
+                timestamps.extend([None] * n_frames)
+                frame_numbers.extend(records["frameNumber"].tolist())
+            frame_sizes.extend(records["frameSize"].tolist())
+            contents.extend(content.tolist())
+
+        if not contents:
+            self._set_decoded_frames(pd.DataFrame([]))
+            return
+
+        self._set_decoded_frames(pd.DataFrame({
+            "timestamp": timestamps,
+            "frameNumber": frame_numbers,
+            "frameSize": frame_sizes,
+            "frameContent": contents,
+        }))
+
+    def _set_decoded_frames(self, frame_data):
+        """
+        Keep a frame-by-frame decoded DataFrame (used when frame sizes vary and
+        the file cannot be memory-mapped) and build the frame store from it.
+        """
+        self._frame_data = frame_data
+        config = self.header['config']
+        if frame_data.empty:
+            self.frames = OsdFrameStore.from_frame_lists([], config['charHeight'], config['charWidth'])
+            return
+
+        has_timestamps = not frame_data["timestamp"].isnull().all()
+        has_frame_numbers = not frame_data["frameNumber"].isnull().all()
+        self.frames = OsdFrameStore.from_frame_lists(
+            frame_data["frameContent"].tolist(),
+            config['charHeight'],
+            config['charWidth'],
+            raw_timestamps=frame_data["timestamp"] if has_timestamps else None,
+            frame_numbers=frame_data["frameNumber"] if has_frame_numbers else None,
+            frame_sizes=frame_data["frameSize"],
+            frame_rate=self.frame_rate,
+        )
+
+    @staticmethod
+    def _decode_sized_frames(body, head_fields, glyph_dtype):
+        """
+        Decode back-to-back [head][frameSize glyphs] records with np.frombuffer.
+        Frames normally all have the same size, so each run of equally sized
+        frames is decoded as one structured array; a size change starts a new run.
+        Yields one structured array per run and stops at the first incomplete frame.
+        """
+        head_dtype = np.dtype(head_fields)
+        offset = 0
+        while offset + head_dtype.itemsize <= len(body):
+            frame_size = int(np.frombuffer(body, dtype=head_dtype, count=1, offset=offset)["frameSize"][0])
+            frame_dtype = np.dtype(head_fields + [("content", glyph_dtype, (frame_size,))])
+            count = (len(body) - offset) // frame_dtype.itemsize
+            if count == 0:
+                break  # Incomplete frame
+
+            records = np.frombuffer(body, dtype=frame_dtype, count=count, offset=offset)
+            size_changes = np.flatnonzero(records["frameSize"] != frame_size)
+            if size_changes.size:
+                records = records[:size_changes[0]]
+
+            yield records
+            offset += len(records) * frame_dtype.itemsize
 
     def print_info(self):
         print("Header Information:")
@@ -179,9 +332,107 @@ class OsdFileReader:
         """Return the frame data as a DataFrame for external processing."""
         return self.frame_data
 
+    def get_frames(self):
+        """Return the OsdFrameStore with the (n_frames, rows, cols) glyph grids."""
+        return self.frames
+
+    def iter_blocks(self, block_size=256, start=0):
+        """
+        Stream the recording in blocks of up to block_size frames, beginning at
+        frame index 'start'. Yields (timestamps, frames) with frames shaped
+        (n, rows, cols); each block is read from the file only when the
+        consumer asks for it.
+        """
+        for block_start in range(start, len(self.frames), block_size):
+            yield self.frames.block(block_start, block_start + block_size)
+
+    def iter_frames(self, block_size=256, start=0):
+        """Yield (frame_index, timestamp, frame) for each frame from 'start' on, read via iter_blocks()."""
+        frame_index = start
+        for timestamps, frames in self.iter_blocks(block_size, start):
+            for timestamp, frame in zip(timestamps, frames):
+                yield frame_index, timestamp, frame
+                frame_index += 1
+
+    def get_time_range(self):
+        """First and last timestamp in seconds, read without loading the frames."""
+        if not len(self.frames):
+            raise ValueError("The OSD file contains no frames.")
+        first = self.frames.timestamps_between(0, 1)[0]
+        last = self.frames.timestamps_between(len(self.frames) - 1, len(self.frames))[0]
+        return float(first), float(last)
+
+    def get_output_frame_count(self, fps):
+        """Number of frames needed to cover the recording at a constant fps."""
+        start_time, end_time = self.get_time_range()
+        return int((end_time - start_time) * fps) + 1
+
+    def get_output_frame_range(self, fps, start_time=None, end_time=None, start_frame=None, end_frame=None):
+        """
+        Output frames start..end-1 to render for a clip, given either as
+        seconds from the start of the recording (start_time/end_time) or as
+        output frame numbers. Output frame n shows the OSD at n / fps, the
+        same as in a full render, so a clip lines up with the source.
+        Missing bounds default to the whole recording.
+        """
+        if (start_time is not None and start_frame is not None) or (end_time is not None and end_frame is not None):
+            raise ValueError("Give the clip bounds either as times or as frame numbers, not both.")
+        num_frames = self.get_output_frame_count(fps)
+
+        # Frames whose time lies in [start_time, end_time)
+        if start_time is not None:
+            start_frame = math.ceil(start_time * fps)
+        if end_time is not None:
+            end_frame = math.ceil(end_time * fps)
+
+        start_frame = min(max(start_frame or 0, 0), num_frames)
+        end_frame = num_frames if end_frame is None else min(max(end_frame, start_frame), num_frames)
+        if start_frame >= end_frame:
+            raise ValueError("The selected range contains no frames.")
+        return start_frame, end_frame
+
+    def get_render_schedule(self, fps, start_frame=0, end_frame=None):
+        """
+        RenderSchedule mapping output frames start_frame..end_frame-1 at a
+        constant fps to the OSD frames they show, in one searchsorted call.
+        """
+        if end_frame is None:
+            end_frame = self.get_output_frame_count(fps)
+        else:
+            self.get_time_range()  # fail early on a file without frames
+        return RenderSchedule.from_store(self.frames, fps, start_frame, end_frame)
+
+    def iter_scheduled_blocks(self, schedule, block_size=256):
+        """
+        Yield (frame_index, first_frame, run_length, frame) for each run of
+        a RenderSchedule, with frame the (rows, cols) grid of that OSD frame.
+        OSD frames are read block_size at a time as the runs reach them.
+        """
+        chunk_start, chunk = 0, None
+        for frame_index, first_frame, run_length in schedule.iter_runs():
+            if chunk is None or not chunk_start <= frame_index < chunk_start + len(chunk):
+                chunk_start = frame_index
+                _, chunk = self.frames.block(frame_index, frame_index + block_size)
+            yield frame_index, first_frame, run_length, chunk[frame_index - chunk_start]
+
+    def iter_output_frames(self, fps, block_size=256, start_frame=0, end_frame=None):
+        """
+        Walk the recording at a constant output frame rate.
+        Yields (frame_num, frame_index, frame) where frame is the (rows, cols)
+        grid shown at that output frame. start_frame/end_frame limit the
+        output frames that are yielded. The mapping comes from
+        get_render_schedule() and OSD frames are streamed through
+        iter_scheduled_blocks(), so memory stays bounded by one block.
+        """
+        schedule = self.get_render_schedule(fps, start_frame, end_frame)
+        for frame_index, first_frame, run_length, frame in self.iter_scheduled_blocks(schedule, block_size):
+            for frame_num in range(first_frame, first_frame + run_length):
+                yield frame_num, frame_index, frame
+
     def generate_pseudo_frames(self, frame_rate):
         """Generate timestamps or frame numbers if they're missing, based on the frame_rate."""
         self.frame_rate = frame_rate
+        self.frames.frame_rate = frame_rate
         if "timestamp" in self.frame_data.columns and self.frame_data["timestamp"].isnull().all():
             # No timestamps, but we do have frameNumbers
             if "frameNumber" in self.frame_data.columns and not self.frame_data["frameNumber"].isnull().all():
@@ -194,8 +445,7 @@ class OsdFileReader:
 
     def print_frame(self, frame_index):
         try:
-            frame = self.frame_data.iloc[frame_index]
-            content = frame["frameContent"]
+            content = self.frames.frame(frame_index)
             print(f"\nFrame {frame_index}:")
             for idx, value in enumerate(content):
                 # Print 16-bit or 8-bit in hex with enough padding
@@ -209,27 +459,26 @@ class OsdFileReader:
 
     def calculate_frame_rate(self):
         """
-        If we have timestamps in the DataFrame, we can attempt to compute a frame rate.
+        If we have timestamps, we can attempt to compute a frame rate.
         """
-        if "timestamp" in self.frame_data.columns and not self.frame_data["timestamp"].isnull().all():
-            timestamps = self.frame_data["timestamp"].dropna()
+        if self.frames.has_timestamps:
+            timestamps = self.frames.timestamps
             if len(timestamps) > 1:
-                diffs = timestamps.diff().dropna()
-                avg_dt = diffs.mean()
+                avg_dt = np.diff(timestamps).mean()
                 if avg_dt > 0:
                     self.frame_rate = 1.0 / avg_dt
         return self.frame_rate
 
     def get_frame_count(self):
-        return len(self.frame_data)
+        return len(self.frames)
 
     def get_duration(self):
         """
         If we have timestamps, the duration is the max timestamp;
         otherwise approximate from frame_count / frame_rate.
         """
-        if "timestamp" in self.frame_data.columns and not self.frame_data["timestamp"].isnull().all():
-            self.duration = self.frame_data["timestamp"].max()
+        if self.frames.has_timestamps and len(self.frames):
+            self.duration = self.frames.timestamps.max()
         elif self.frame_rate:
             self.duration = self.get_frame_count() / self.frame_rate
         return self.duration
@@ -240,10 +489,31 @@ class OsdFileReader:
         print(f"Duration: {self.get_duration()} seconds")
         print(f"Frame Rate: {self.calculate_frame_rate()} fps")
 
+    def extract_telemetry(self, field_definitions, charmap=None):
+        """
+        Vectorized replacement for parse(): same field definitions, returns a
+        typed DataFrame with one row per frame instead of filling
+        parsed_data_df cell by cell. See TelemetryExtractor.extract_telemetry().
+        """
+        return extract_telemetry(
+            self.frames, field_definitions, self.header['config'].get('charWidth', 0), charmap=charmap
+        )
+
+    def iter_telemetry(self, field_definitions, charmap=None, block_size=DEFAULT_BLOCK_SIZE, text_rows=False):
+        """
+        extract_telemetry() one block of frames at a time, for exporting long
+        flights without holding every row. See TelemetryExtractor.iter_telemetry().
+        """
+        return iter_telemetry(
+            self.frames, field_definitions, self.header['config'].get('charWidth', 0),
+            charmap=charmap, block_size=block_size, text_rows=text_rows
+        )
+
     def parse(self, field_definitions):
         """
         Optional parse method. It attempts to find fields in the frame content by
         either an identifier or coordinates, with a certain length and format_type.
+        This walks the frames row by row; extract_telemetry() is much faster.
         """
         self.parsed_data_df = pd.DataFrame(index=self.frame_data.index, columns=field_definitions.keys())
 
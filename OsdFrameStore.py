@@ -0,0 +1,183 @@
+import os
+import bisect
+import numpy as np
+
+
+class OsdFrameStore:
+    """
+    Compact, read-only store of the glyph grids of an .osd file.
+
+    'frames' is a (n_frames, rows, cols) array of glyph indices (uint16, or
+    uint8 for MSPOSD v3 files which store one byte per glyph). When the store
+    is opened straight from a file it is a view into a numpy.memmap, so
+    only the frames that are actually touched get paged in. Opening a
+    DJI/DJO3 file costs the same regardless of the recording length;
+    open_msposd() also checks the size field of every frame, which reads
+    through the whole file once (O(n), ~6 ms for two hours at 10 Hz once
+    the file is in the OS cache).
+    """
+
+    def __init__(self, frames, raw_timestamps=None, frame_numbers=None, frame_sizes=None,
+                 time_divisor=1.0, frame_rate=60):
+        self.frames = frames
+        self.raw_timestamps = raw_timestamps
+        self.frame_numbers = frame_numbers
+        self.frame_sizes = frame_sizes
+        self.time_divisor = time_divisor
+        self.frame_rate = frame_rate
+        self._timestamps = None
+
+    def __len__(self):
+        return self.frames.shape[0]
+
+    @property
+    def num_rows(self):
+        return self.frames.shape[1]
+
+    @property
+    def num_cols(self):
+        return self.frames.shape[2]
+
+    @property
+    def has_timestamps(self):
+        return self.raw_timestamps is not None
+
+    @property
+    def timestamps(self):
+        """
+        Frame timestamps in seconds as a float64 array. Files without
+        timestamps (MSPOSD v2) fall back to frameNumber / frame_rate.
+        """
+        if self.raw_timestamps is None:
+            return self.timestamps_between(0, len(self))
+
+        if self._timestamps is None:
+            self._timestamps = self.timestamps_between(0, len(self))
+        return self._timestamps
+
+    def timestamps_between(self, start, stop):
+        """Timestamps in seconds of frames start..stop-1, without touching the rest."""
+        if self.raw_timestamps is not None:
+            return self.raw_timestamps[start:stop] / self.time_divisor
+        if self.frame_numbers is not None:
+            return self.frame_numbers[start:stop] / self.frame_rate
+        return np.arange(start, min(stop, len(self))) / self.frame_rate
+
+    def index_at(self, seconds):
+        """
+        Index of the frame on screen at 'seconds': the last frame whose
+        timestamp is <= seconds, or 0 before the first one. Timestamps are
+        binary searched in the mapped file, so only about log2(n) records
+        are read.
+        """
+        if not len(self):
+            raise IndexError("The store contains no frames.")
+        return max(bisect.bisect_right(_TimestampSequence(self), seconds) - 1, 0)
+
+    def frame(self, frame_index):
+        """Return one frame as a flat, row-major array of glyph indices."""
+        return self.frames[frame_index].reshape(-1)
+
+    def block(self, start, stop):
+        """
+        Copy frames start..stop-1 out of the file. Returns (timestamps, frames)
+        with frames as a contiguous (n, rows, cols) uint16 array.
+        """
+        return self.timestamps_between(start, stop), np.array(self.frames[start:stop], dtype=np.uint16)
+
+    @staticmethod
+    def _map_records(file_path, offset, frame_dtype):
+        """Memory-map every complete fixed-size record after 'offset'."""
+        n_frames = (os.path.getsize(file_path) - offset) // frame_dtype.itemsize
+        if n_frames <= 0:
+            return np.zeros(0, dtype=frame_dtype)
+        return np.memmap(file_path, dtype=frame_dtype, mode='r', offset=offset, shape=(n_frames,))
+
+    @classmethod
+    def open_djo3(cls, file_path, offset, num_rows, num_cols, frame_rate=60):
+        """
+        Map a DJI/DJO3 body: [uint32 delta_time in ms][uint16 glyph * rows * cols].
+        """
+        framesize = num_rows * num_cols
+        frame_dtype = np.dtype([
+            ("timestamp", "<u4"),
+            ("content", "<u2", (framesize,)),
+        ])
+        records = cls._map_records(file_path, offset, frame_dtype)
+        return cls(
+            records["content"].reshape(len(records), num_rows, num_cols),
+            raw_timestamps=records["timestamp"],
+            frame_sizes=np.broadcast_to(np.int64(framesize), (len(records),)),
+            time_divisor=1000.0,
+            frame_rate=frame_rate,
+        )
+
+    @classmethod
+    def open_msposd(cls, file_path, offset, version, num_rows, num_cols, frame_rate=60):
+        """
+        Map an MSPOSD v2/v3 body. Returns None if the frames are not all
+        rows * cols glyphs, in which case the caller has to decode the file
+        frame by frame. Checking that pages in every record, so unlike
+        open_djo3() this takes time proportional to the file's length.
+        """
+        framesize = num_rows * num_cols
+        if version == 3:
+            head_fields = [("timestamp", "<f8"), ("frameSize", "<u4")]
+            glyph_dtype = "u1"
+        else:
+            head_fields = [("frameNumber", "<u4"), ("frameSize", "<u4")]
+            glyph_dtype = "<u2"
+
+        frame_dtype = np.dtype(head_fields + [("content", glyph_dtype, (framesize,))])
+        records = cls._map_records(file_path, offset, frame_dtype)
+        # Every size is checked: a frame of another size in the middle shifts
+        # the ones after it off the fixed stride, and a later change can
+        # shift them back into line by the last frame
+        if not len(records) or not np.all(records["frameSize"] == framesize):
+            return None
+
+        n_frames = len(records)
+        if version == 3:
+            frames = records["content"].reshape(n_frames, num_rows, num_cols)
+            return cls(frames, raw_timestamps=records["timestamp"],
+                       frame_sizes=records["frameSize"], frame_rate=frame_rate)
+
+        # v2 stores the grid column by column; expose it row-major as a view
+        frames = records["content"].reshape(n_frames, num_cols, num_rows).transpose(0, 2, 1)
+        return cls(frames, frame_numbers=records["frameNumber"],
+                   frame_sizes=records["frameSize"], frame_rate=frame_rate)
+
+    @classmethod
+    def from_frame_lists(cls, contents, num_rows, num_cols, raw_timestamps=None, frame_numbers=None,
+                         frame_sizes=None, frame_rate=60):
+        """
+        Build an in-memory store from per-frame glyph lists of any length.
+        Frames are truncated or zero-padded to rows * cols, which is how the
+        renderers index them.
+        """
+        framesize = num_rows * num_cols
+        frames = np.zeros((len(contents), framesize), dtype=np.uint16)
+        for i, content in enumerate(contents):
+            content = content[:framesize]
+            frames[i, :len(content)] = content
+
+        return cls(
+            frames.reshape(len(contents), num_rows, num_cols),
+            raw_timestamps=None if raw_timestamps is None else np.asarray(raw_timestamps, dtype=np.float64),
+            frame_numbers=None if frame_numbers is None else np.asarray(frame_numbers, dtype=np.int64),
+            frame_sizes=None if frame_sizes is None else np.asarray(frame_sizes, dtype=np.int64),
+            frame_rate=frame_rate,
+        )
+
+
+class _TimestampSequence:
+    """Read-only sequence of one store's timestamps in seconds, computed on access for bisect."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        return self.store.timestamps_between(index, index + 1)[0]
@@ -1,13 +1,29 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
+import multiprocessing
 import os
 import time
+from PIL import ImageTk
 
 # Import your custom classes
 from VideoMaker import VideoMaker
 from TransparentVideoMaker import TransparentVideoMaker
 from OsdFileReader import OsdFileReader
+from EncoderBackend import CODECS, DEFAULT_CODEC
+from PreviewRenderer import PreviewRenderer, FrameCache
+from RenderCheckpoint import RenderCancelled
+from ImageSequenceWriter import IMAGE_FORMATS
+
+# Codec box choices that write a folder of images instead of a video
+SEQUENCE_CHOICES = {f"{name} sequence": name for name in IMAGE_FORMATS}
+# Output height choice that keeps the font's own resolution
+NATIVE_HEIGHT = "Font size"
+# The preview renders at most this height, whatever the output height
+PREVIEW_HEIGHT = 720
+PREVIEW_SIZE = (640, 360)
+# Scrubber moves within this many ms are coalesced into one render
+SCRUB_DELAY_MS = 30
 
 class OverlayToolApp:
     def __init__(self, root):
@@ -23,11 +39,26 @@ class OverlayToolApp:
         self.font_image_path = tk.StringVar(value='fonts/WS_BFx4_Nexus_Moonlight_2160p.png')
         self.chroma_key_hex = tk.StringVar(value='FF00FF')  # Default to magenta
         self.fps = tk.DoubleVar(value=30.0)
+        self.workers = tk.IntVar(value=1)  # render processes
+        self.clip_start = tk.StringVar()  # seconds, empty = from the beginning
+        self.clip_end = tk.StringVar()  # seconds, empty = to the end
         self.transparent_background = tk.BooleanVar(value=True)  # Checkbox for transparency
+        self.codec = tk.StringVar(value=DEFAULT_CODEC)  # transparent output codec
+        self.vfr = tk.BooleanVar(value=False)  # one frame per OSD change (transparent only)
+        self.output_height = tk.StringVar(value=NATIVE_HEIGHT)  # "Font size" or a height in pixels
 
         # Placeholder variables for VideoMaker and OsdFileReader
         self.video_maker = None
         self.osd_reader = None
+        self.osd_reader_key = None  # (path, mtime) the reader was loaded from
+        self.cancel_event = threading.Event()  # set by the Cancel button
+
+        # Preview: rendered frames are cached across reloads with other settings
+        self.preview = None
+        self.preview_cache = FrameCache()
+        self.preview_photo = None  # keeps the shown PhotoImage alive
+        self.preview_time = tk.DoubleVar(value=0.0)
+        self.scrub_job = None
 
         # Build the GUI
         self.create_widgets()
@@ -57,6 +88,10 @@ class OverlayToolApp:
 
         # Transparent Background checkbox and Chroma Key
         ttk.Checkbutton(input_frame, text="Transparent Background", variable=self.transparent_background, command=self.toggle_chroma_key).grid(row=4, column=1, sticky='w', padx=5, pady=5)
+        self.codec_box = ttk.Combobox(input_frame, textvariable=self.codec, values=list(CODECS) + list(SEQUENCE_CHOICES),
+                                      state="readonly", width=14)
+        self.codec_box.grid(row=4, column=2, padx=5, pady=5)
+        self.codec_box.bind("<<ComboboxSelected>>", lambda event: self.update_output_extension())
         ttk.Label(input_frame, text="Chroma Key Hex:").grid(row=5, column=0, sticky='e', padx=5, pady=5)
         self.chroma_key_entry = ttk.Entry(input_frame, textvariable=self.chroma_key_hex)
         self.chroma_key_entry.grid(row=5, column=1, sticky='w', padx=5, pady=5)
@@ -64,9 +99,45 @@ class OverlayToolApp:
         # FPS
         ttk.Label(input_frame, text="FPS:").grid(row=6, column=0, sticky='e', padx=5, pady=5)
         ttk.Entry(input_frame, textvariable=self.fps).grid(row=6, column=1, sticky='w', padx=5, pady=5)
-
-        # Create Video button
-        ttk.Button(input_frame, text="Create Video", command=self.start_creation).grid(row=7, column=1, pady=10)
+        self.vfr_check = ttk.Checkbutton(input_frame, text="Variable frame rate", variable=self.vfr)
+        self.vfr_check.grid(row=6, column=2, sticky='w', padx=5, pady=5)
+
+        # Worker processes
+        ttk.Label(input_frame, text="Workers:").grid(row=7, column=0, sticky='e', padx=5, pady=5)
+        ttk.Spinbox(input_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.workers, width=5).grid(row=7, column=1, sticky='w', padx=5, pady=5)
+
+        # Optional clip range in seconds
+        ttk.Label(input_frame, text="Clip (s):").grid(row=8, column=0, sticky='e', padx=5, pady=5)
+        clip_frame = ttk.Frame(input_frame)
+        clip_frame.grid(row=8, column=1, sticky='w', padx=5, pady=5)
+        ttk.Entry(clip_frame, textvariable=self.clip_start, width=8).pack(side='left')
+        ttk.Label(clip_frame, text=" to ").pack(side='left')
+        ttk.Entry(clip_frame, textvariable=self.clip_end, width=8).pack(side='left')
+        ttk.Label(clip_frame, text=" (empty = whole file)").pack(side='left')
+
+        # Output height: the font's own size or a smaller proxy
+        ttk.Label(input_frame, text="Output Height:").grid(row=9, column=0, sticky='e', padx=5, pady=5)
+        ttk.Combobox(input_frame, textvariable=self.output_height, values=[NATIVE_HEIGHT, "2160", "1440", "1080", "720"],
+                     width=10).grid(row=9, column=1, sticky='w', padx=5, pady=5)
+
+        # Create Video and Cancel buttons
+        ttk.Button(input_frame, text="Create Video", command=self.start_creation).grid(row=10, column=1, pady=10)
+        self.cancel_button = ttk.Button(input_frame, text="Cancel", command=self.cancel_creation, state="disabled")
+        self.cancel_button.grid(row=10, column=2, padx=5, pady=10)
+
+        # Preview of a single moment, rendered with the current settings
+        preview_frame = ttk.LabelFrame(self.root, text="Preview")
+        preview_frame.pack(padx=10, pady=(0, 10), fill='x')
+        self.preview_label = ttk.Label(preview_frame, text="Load an OSD file to preview it", anchor='center')
+        self.preview_label.pack(padx=5, pady=5)
+        scrub_frame = ttk.Frame(preview_frame)
+        scrub_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Button(scrub_frame, text="Load Preview", command=self.load_preview).pack(side='left')
+        self.preview_scale = ttk.Scale(scrub_frame, from_=0.0, to=0.0, orient='horizontal',
+                                       variable=self.preview_time, command=self.on_scrub)
+        self.preview_scale.pack(side='left', fill='x', expand=True, padx=5)
+        self.preview_time_label = ttk.Label(scrub_frame, text="0.0 s", width=10)
+        self.preview_time_label.pack(side='left')
 
         # Progress bar and label
         self.progress_label = ttk.Label(self.root, text="")
@@ -85,8 +156,12 @@ class OverlayToolApp:
         """Enable or disable the chroma key field based on the Transparent Background checkbox."""
         if self.transparent_background.get():
             self.chroma_key_entry.config(state="disabled")
+            self.codec_box.config(state="readonly")
+            self.vfr_check.config(state="normal")
         else:
             self.chroma_key_entry.config(state="normal")
+            self.codec_box.config(state="disabled")
+            self.vfr_check.config(state="disabled")
         self.update_output_extension()
 
     def update_output_extension(self):
@@ -95,11 +170,23 @@ class OverlayToolApp:
         if not current_path:
             return
 
-        new_extension = ".mov" if self.transparent_background.get() else ".mp4"
+        new_extension = self.output_extension()
         base_name, _ = os.path.splitext(current_path)
         updated_path = base_name + new_extension
         self.output_path.set(updated_path)
 
+    def output_extension(self):
+        """.mp4 for chroma key videos, none for image sequence folders, else the container of the selected codec."""
+        if not self.transparent_background.get():
+            return ".mp4"
+        if self.image_format() is not None:
+            return ""
+        return CODECS[self.codec.get()].extension
+
+    def image_format(self):
+        """The image format chosen in the codec box, or None for a video codec."""
+        return SEQUENCE_CHOICES.get(self.codec.get())
+
     def browse_osd_file(self):
         filename = filedialog.askopenfilename(
             title="Select OSD file",
@@ -109,10 +196,15 @@ class OverlayToolApp:
             self.osd_file_path.set(filename)
 
     def browse_output_path(self):
+        if self.transparent_background.get() and self.image_format() is not None:
+            folder = filedialog.askdirectory(title="Select output folder")
+            if folder:
+                self.output_path.set(folder)
+            return
         filename = filedialog.asksaveasfilename(
             title="Select output file",
-            defaultextension=".mov",
-            filetypes=(("MOV files", "*.mov"), ("All files", "*.*"))
+            defaultextension=self.output_extension(),
+            filetypes=(("Video files", "*" + self.output_extension()), ("All files", "*.*"))
         )
         if filename:
             self.output_path.set(filename)
@@ -135,51 +227,143 @@ class OverlayToolApp:
         if filename:
             self.font_image_path.set(filename)
 
+    def get_osd_reader(self):
+        """The reader of the selected OSD file, reused while the file is unchanged."""
+        path = self.osd_file_path.get()
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        if self.osd_reader is None or self.osd_reader_key != key:
+            self.osd_reader = OsdFileReader(path)
+            self.osd_reader_key = key
+        return self.osd_reader
+
+    def make_video_maker(self, osd_reader, target_height, workers=1, resumable=False):
+        """A VideoMaker or TransparentVideoMaker with the current settings."""
+        if self.transparent_background.get():
+            image_format = self.image_format()
+            return TransparentVideoMaker(
+                osd_reader=osd_reader,
+                font_image_path=self.font_image_path.get(),
+                fps=self.fps.get(),
+                workers=workers,
+                codec=DEFAULT_CODEC if image_format else self.codec.get(),
+                vfr=self.vfr.get() and image_format is None,  # the index file times sequences
+                target_height=target_height,
+                resumable=resumable,
+                image_format=image_format
+            )
+        return VideoMaker(
+            osd_reader=osd_reader,
+            font_image_path=self.font_image_path.get(),
+            chroma_key_hex=self.chroma_key_hex.get(),
+            fps=self.fps.get(),
+            workers=workers,
+            target_height=target_height,
+            resumable=resumable
+        )
+
+    def load_preview(self):
+        if not self.osd_file_path.get():
+            messagebox.showerror("Error", "Please select an OSD file.")
+            return
+
+        threading.Thread(target=self.load_preview_process).start()
+
+    def load_preview_process(self):
+        """(Re)build the preview for the current file and settings, then show the scrubber position."""
+        try:
+            self.update_progress_label("Loading preview...")
+            osd_reader = self.get_osd_reader()
+            # The preview never needs more than PREVIEW_HEIGHT; rendering the
+            # atlas smaller keeps scrubbing fast with 4K fonts
+            target_height = self.parse_height(self.output_height.get())
+            if target_height is None:
+                target_height = self.make_video_maker(osd_reader, None).RESOLUTION[1]
+            maker = self.make_video_maker(osd_reader, min(target_height, PREVIEW_HEIGHT))
+            preview = PreviewRenderer(osd_reader, maker, cache=self.preview_cache)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        finally:
+            self.progress_label.config(text="")
+
+        if self.preview is not None:
+            self.preview.close()
+        self.preview = preview
+        self.preview_scale.config(to=preview.duration)
+        self.preview_time.set(min(self.preview_time.get(), preview.duration))
+        self.root.after(0, self.show_preview)
+
+    def on_scrub(self, value):
+        """Render after the scrubber has been still for SCRUB_DELAY_MS, not on every move."""
+        self.preview_time_label.config(text=f"{float(value):.1f} s")
+        if self.scrub_job is not None:
+            self.root.after_cancel(self.scrub_job)
+        self.scrub_job = self.root.after(SCRUB_DELAY_MS, self.show_preview)
+
+    def show_preview(self):
+        self.scrub_job = None
+        if self.preview is None:
+            return
+        seconds = self.preview_time.get()
+        try:
+            _, frame = self.preview.frame_at(seconds)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.preview_photo = ImageTk.PhotoImage(self.preview.to_image(frame, PREVIEW_SIZE))
+        self.preview_label.config(image=self.preview_photo, text="")
+        self.preview_time_label.config(text=f"{seconds:.1f} s")
+
     def start_creation(self):
         if not self.osd_file_path.get():
             messagebox.showerror("Error", "Please select an OSD file.")
             return
 
+        self.cancel_event.clear()
+        self.cancel_button.config(state="normal")
         threading.Thread(target=self.create_video_process).start()
 
+    def cancel_creation(self):
+        """Ask the running render to stop; its finished segments are kept for the next run."""
+        self.cancel_event.set()
+        self.update_progress_label("Cancelling...")
+
     def create_video_process(self):
         try:
-            # 1) Read the OSD file
-            self.osd_reader = OsdFileReader(self.osd_file_path.get())
-
-            # 2) Initialize whichever VideoMaker is appropriate
-            if self.transparent_background.get():
-                self.video_maker = TransparentVideoMaker(
-                    osd_reader=self.osd_reader,
-                    font_image_path=self.font_image_path.get(),
-                    fps=self.fps.get()
-                )
-            else:
-                self.video_maker = VideoMaker(
-                    osd_reader=self.osd_reader,
-                    font_image_path=self.font_image_path.get(),
-                    chroma_key_hex=self.chroma_key_hex.get(),
-                    fps=self.fps.get()
-                )
+            # 1) Read the OSD file (the preview may already have)
+            osd_reader = self.get_osd_reader()
+
+            # 2) Initialize whichever VideoMaker is appropriate. Renders are
+            # checkpointed, so a cancelled or crashed one continues next time
+            self.video_maker = self.make_video_maker(
+                osd_reader,
+                self.parse_height(self.output_height.get()),
+                workers=self.workers.get(),
+                resumable=True
+            )
 
             # 3) Determine output path
             output_path = self.output_path.get()
             if not output_path:
-                extension = ".mov" if self.transparent_background.get() else ".mp4"
+                extension = self.output_extension()
                 output_path = os.path.splitext(self.osd_file_path.get())[0] + '_OSD' + extension
 
             # 4) Progress callback to update the GUI
             start_time = time.time()
+            first_frame = None  # later than 0 when resuming a checkpointed render
 
-            def progress_callback(percentage, frame_num):
+            def progress_callback(percentage, frame_num, stats=None):
+                nonlocal first_frame
+                if first_frame is None:
+                    first_frame = frame_num
                 # Update the progress bar
                 self.progress_bar['value'] = percentage
 
                 # Compute and display estimated remaining time + FPS every 50 frames
-                if frame_num % 25 == 0 and frame_num > 0:
+                if frame_num % 25 == 0 and frame_num > first_frame:
                     elapsed_time = time.time() - start_time
-                    frames_processed = frame_num
-                    frames_remaining = self.video_maker.total_frames - frames_processed
+                    frames_processed = frame_num - first_frame
+                    frames_remaining = self.video_maker.total_frames - frame_num
 
                     if frames_remaining > 0 and elapsed_time > 0:
                         # Estimate remaining time
@@ -191,26 +375,68 @@ class OverlayToolApp:
                         # Calculate current FPS
                         current_fps = frames_processed / elapsed_time
 
+                        # Split the FPS into time spent rendering vs. waiting on the encoder
+                        breakdown = ""
+                        if stats is not None and stats.elapsed() > 0:
+                            wall = stats.elapsed()
+                            render_share = (stats.seconds["block_lookup"] + stats.seconds["render"]) / wall
+                            encoder_share = (stats.seconds["buffer_wait"] + stats.seconds["submit_wait"]) / wall
+                            breakdown = f" (render {render_share:.0%}, waiting on encoder {encoder_share:.0%})"
+
                         # Update the label with both time and FPS
                         self.time_label.config(
                             text=f"Estimated time remaining: {remaining_str} - Current FPS: {current_fps:.2f}"
+                                 f"{breakdown}"
                         )
 
                 self.update_progress_label(f"Processing: {int(percentage)}% complete")
                 self.root.update_idletasks()
 
             # 5) Create the video
-            self.video_maker.create_video(output_path, progress_callback=progress_callback)
+            self.video_maker.create_video(
+                output_path,
+                progress_callback=progress_callback,
+                start_time=self.parse_seconds(self.clip_start.get()),
+                end_time=self.parse_seconds(self.clip_end.get()),
+                cancel_event=self.cancel_event
+            )
             messagebox.showinfo("Success", f"Video created successfully at {output_path}")
 
+        except RenderCancelled as e:
+            messagebox.showinfo("Cancelled", str(e))
+
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
         finally:
+            self.cancel_button.config(state="disabled")
             self.progress_label.config(text="")
             self.progress_bar['value'] = 0
             self.time_label.config(text="")
 
+    def parse_height(self, text):
+        """Output height in pixels, or None for the font's own size."""
+        text = text.strip()
+        if not text or text == NATIVE_HEIGHT:
+            return None
+        try:
+            height = int(text)
+        except ValueError:
+            raise ValueError(f"Invalid output height: {text}")
+        if height <= 0:
+            raise ValueError(f"Invalid output height: {text}")
+        return height
+
+    def parse_seconds(self, text):
+        """Clip bound from an entry: empty means no bound."""
+        text = text.strip()
+        if not text:
+            return None
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"Invalid clip time: {text}")
+
     def update_progress_label(self, text):
         self.progress_label.config(text=text)
         self.root.update_idletasks()
@@ -231,6 +457,7 @@ class OverlayToolApp:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # worker processes in the PyInstaller build
     root = tk.Tk()
     app = OverlayToolApp(root)
     root.mainloop()
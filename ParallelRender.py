@@ -0,0 +1,283 @@
+import os
+import pstats
+import shutil
+import subprocess
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from OsdFileReader import OsdFileReader
+from RenderStats import RenderStats, progress_reporter, profiled
+from RenderCheckpoint import RenderCheckpoint, RenderCancelled, SEGMENT_SECONDS, file_signature
+
+# More segments than workers keeps every worker busy when some parts of the
+# flight render faster than others (e.g. long static stretches).
+SEGMENTS_PER_WORKER = 4
+# Workers report progress in steps of this many frames
+PROGRESS_STEP = 25
+# Maker settings that don't change the video, so changing them between runs
+# keeps the checkpointed segments
+UNRECORDED_SETTINGS = ("incremental", "atlas_cache", "profile", "encoder_threads", "ffmpeg_path", "resumable")
+
+
+def _render_segment(maker_class, osd_path, frame_rate, use_sidecar, maker_settings, segment_path,
+                    start_frame, end_frame, progress_queue, cancel_event=None):
+    """
+    Worker entry point: open the .osd file and font in this process and
+    render output frames start_frame..end_frame-1 into segment_path.
+    With profiling on, the segment's profile is saved to segment_path + ".prof".
+    Raises RenderCancelled once cancel_event is set.
+    """
+    reader = OsdFileReader(osd_path, framerate=frame_rate, sidecar=use_sidecar)
+    maker = maker_class(reader, **maker_settings)
+
+    reported = 0
+
+    def progress_callback(percentage, frame_num):
+        nonlocal reported
+        done = frame_num + 1
+        if done - reported >= PROGRESS_STEP or done == end_frame - start_frame:
+            progress_queue.put(done - reported)
+            reported = done
+
+    if maker.profile:
+        with profiled(segment_path + ".prof", top=0):
+            maker.render_frames(segment_path, start_frame, end_frame, progress_callback, cancel_event)
+    else:
+        maker.render_frames(segment_path, start_frame, end_frame, progress_callback, cancel_event)
+    return _segment_result(maker, start_frame, end_frame)
+
+
+def _segment_result(maker, start_frame, end_frame):
+    """(repeated frames, dirty-cell ratio, unique frames, stats) of the segment 'maker' just rendered."""
+    unique_frames = end_frame - start_frame - maker.repeated_frames
+    return (maker.repeated_frames, getattr(maker, "dirty_cell_ratio", None), unique_frames,
+            maker.render_stats.as_dict())
+
+
+def concat_segments(ffmpeg_path, segment_paths, output_path):
+    """Join segment files without re-encoding, using ffmpeg's concat demuxer."""
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+    with open(list_path, "w", encoding="utf-8") as list_file:
+        for segment_path in segment_paths:
+            # The demuxer resolves relative entries against the list's folder
+            escaped = os.path.abspath(segment_path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+
+    subprocess.run([
+        ffmpeg_path,
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        output_path
+    ], check=True)
+
+
+def render_parallel(maker, output_path, schedule, ffmpeg_path, workers, progress_callback=None,
+                    cancel_event=None):
+    """
+    Render the output frames of a RenderSchedule of 'maker' by time segment
+    in a pool of worker processes and join the segments into output_path.
+    Segments start on run boundaries, so no OSD frame is rendered twice.
+    Each worker re-opens the .osd file and font from their paths, so
+    nothing large is pickled.
+
+    maker.render_stats sums the workers' stage times (so they can exceed the
+    wall time); progress callbacks that take stats get it as segments finish.
+    Setting cancel_event stops the workers and raises RenderCancelled.
+    """
+    segments = schedule.split(workers * SEGMENTS_PER_WORKER)
+    extension = os.path.splitext(output_path)[1]
+    segment_dir = tempfile.mkdtemp(
+        prefix=os.path.basename(output_path) + ".segments.",
+        dir=os.path.dirname(os.path.abspath(output_path))
+    )
+    segment_paths = [
+        os.path.join(segment_dir, f"segment_{i:04d}{extension}")
+        for i in range(len(segments))
+    ]
+    print(f"Rendering {len(segments)} segments with {workers} worker processes...")
+    stats = RenderStats()
+    maker.render_stats = stats
+    jobs = [(index, path, start, end) for index, (path, (start, end)) in enumerate(zip(segment_paths, segments))]
+
+    try:
+        results = _render_in_pool(maker, jobs, workers, len(schedule), 0, stats, progress_callback, cancel_event)
+        concat_segments(ffmpeg_path, segment_paths, output_path)
+        if maker.profile:
+            _merge_profiles(segment_paths, output_path)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    _finish(maker, stats, results)
+    return results
+
+
+def render_checkpointed(maker, output_path, schedule, ffmpeg_path, workers=1, progress_callback=None,
+                        cancel_event=None, segment_seconds=SEGMENT_SECONDS):
+    """
+    Render like render_parallel, but in fixed-length segments of
+    segment_seconds that are kept, with a manifest, in a RenderCheckpoint
+    next to output_path until the video is complete. Rendering the same
+    output again with the same source, font, settings and range only
+    renders the segments that are missing. workers == 1 renders the
+    segments in this process.
+
+    Setting cancel_event stops the render after the current OSD frame and
+    raises RenderCancelled; the finished segments are kept for the next run.
+    """
+    num_frames = len(schedule)
+    settings = {key: value for key, value in maker.get_settings().items() if key not in UNRECORDED_SETTINGS}
+    job = {
+        "maker": type(maker).__name__,
+        "osd_file": file_signature(maker.osd_reader.file_path),
+        "font_file": file_signature(maker.font_image_path),
+        "settings": settings,
+        "start_frame": schedule.start_frame,
+        "end_frame": schedule.end_frame,
+    }
+    checkpoint = RenderCheckpoint(output_path, job, schedule.segments(max(1, round(segment_seconds * maker.fps))))
+    pending = checkpoint.pending()
+    if len(pending) < len(checkpoint.segments):
+        print(f"Resuming from {checkpoint.directory}: {len(checkpoint.segments) - len(pending)} of "
+              f"{len(checkpoint.segments)} segments already rendered")
+    print(f"Rendering {len(pending)} segments of {segment_seconds} s"
+          + (f" with {workers} worker processes..." if workers > 1 else "..."))
+    stats = RenderStats()
+    maker.render_stats = stats
+    jobs = [(index, checkpoint.part_path(index), start, end) for index, start, end in pending]
+    frames_done = checkpoint.frames_done()
+
+    try:
+        if workers > 1:
+            results = _render_in_pool(maker, jobs, workers, num_frames, frames_done, stats, progress_callback,
+                                      cancel_event, checkpoint.mark_done)
+        else:
+            results = _render_in_process(maker, jobs, num_frames, frames_done, stats, progress_callback,
+                                         cancel_event, checkpoint.mark_done)
+    except RenderCancelled:
+        raise RenderCancelled(
+            f"Rendering cancelled; {len(checkpoint.finished)} of {len(checkpoint.segments)} segments are "
+            f"kept in {checkpoint.directory} and rendering the same output again resumes from there."
+        )
+
+    if len(checkpoint.segments) == 1:
+        os.replace(checkpoint.segment_paths[0], output_path)
+    elif checkpoint.segments:
+        concat_segments(ffmpeg_path, checkpoint.segment_paths, output_path)
+    if maker.profile and jobs:
+        _merge_profiles([path for _, path, _, _ in jobs], output_path)
+    checkpoint.remove()
+
+    _finish(maker, stats, results)
+    return results
+
+
+def _render_in_pool(maker, jobs, workers, num_frames, frames_done, stats, progress_callback=None,
+                    cancel_event=None, on_segment_done=None):
+    """
+    Render (index, path, start_frame, end_frame) jobs in a process pool and
+    return their _segment_result()s in job order. on_segment_done(index) is
+    called as each segment completes.
+    """
+    report_progress = progress_reporter(progress_callback, stats)
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        progress_queue = manager.Queue()
+        # A proxy of the caller's event: threading.Events don't cross processes
+        worker_cancel = manager.Event()
+        futures = {
+            pool.submit(
+                _render_segment,
+                type(maker),
+                maker.osd_reader.file_path,
+                maker.osd_reader.frames.frame_rate,
+                maker.osd_reader.use_sidecar,
+                maker.get_settings(),
+                segment_path,
+                start_frame,
+                end_frame,
+                progress_queue,
+                worker_cancel
+            ): index
+            for index, segment_path, start_frame, end_frame in jobs
+        }
+
+        pending = set(futures)
+        while pending:
+            if cancel_event is not None and cancel_event.is_set() and not worker_cancel.is_set():
+                worker_cancel.set()
+                for future in pending:
+                    future.cancel()
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.cancelled() or isinstance(future.exception(), RenderCancelled):
+                    continue
+                if future.exception() is not None:
+                    # Stop the other segments like a cancel: leaving the pool
+                    # would otherwise wait for every queued one to render
+                    worker_cancel.set()
+                    for other in pending:
+                        other.cancel()
+                    raise future.exception()
+                stats.merge(future.result()[3])
+                if on_segment_done is not None:
+                    on_segment_done(futures[future])
+            reported = 0
+            while not progress_queue.empty():
+                reported += progress_queue.get()
+            frames_done += reported
+            if reported and report_progress:
+                report_progress(frames_done / num_frames * 100, frames_done)
+
+        if worker_cancel.is_set():
+            raise RenderCancelled("Rendering cancelled")
+        return [future.result() for future in futures]
+
+
+def _render_in_process(maker, jobs, num_frames, frames_done, stats, progress_callback=None,
+                       cancel_event=None, on_segment_done=None):
+    """_render_in_pool() for one worker: render the jobs one after another in this process."""
+    report_progress = progress_reporter(progress_callback, stats)
+    results = []
+    for index, segment_path, start_frame, end_frame in jobs:
+        segment_start = frames_done
+
+        def segment_progress(percentage, frame_num):
+            done = segment_start + frame_num + 1
+            report_progress(done / num_frames * 100, done - 1)
+
+        if maker.profile:
+            with profiled(segment_path + ".prof", top=0):
+                maker.render_frames(segment_path, start_frame, end_frame,
+                                    segment_progress if report_progress else None, cancel_event)
+        else:
+            maker.render_frames(segment_path, start_frame, end_frame,
+                                segment_progress if report_progress else None, cancel_event)
+        stats.merge(maker.render_stats.as_dict())
+        results.append(_segment_result(maker, start_frame, end_frame))
+        frames_done += end_frame - start_frame
+        if on_segment_done is not None:
+            on_segment_done(index)
+    maker.render_stats = stats
+    return results
+
+
+def _merge_profiles(segment_paths, output_path):
+    profile_path = os.path.splitext(output_path)[0] + ".prof"
+    pstats.Stats(*[path + ".prof" for path in segment_paths]).dump_stats(profile_path)
+    print(f"Profile of all segments written to {profile_path}")
+
+
+def _finish(maker, stats, results):
+    """Set the maker's summary attributes from the segments' results."""
+    stats.stop()
+    print(stats.report())
+    maker.repeated_frames = sum(result[0] for result in results)
+    ratios = [(ratio, unique) for _, ratio, unique, _ in results if ratio is not None]
+    if ratios and sum(unique for _, unique in ratios):
+        # Weight each segment's ratio by the number of frames it rendered
+        maker.dirty_cell_ratio = (
+            sum(ratio * unique for ratio, unique in ratios) / sum(unique for _, unique in ratios)
+        )
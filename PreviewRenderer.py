@@ -0,0 +1,200 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from VideoMaker import VideoMaker
+
+# Rendered frames kept for scrubbing back and forth; 720p RGBA frames are 3.5 MB
+DEFAULT_CACHE_BYTES = 256 * 2**20
+# OSD frames on each side of the one shown that are rendered ahead of time
+DEFAULT_PREFETCH = 8
+CHECKER_SIZE = 16
+
+
+class FrameCache:
+    """
+    Least-recently-used cache of rendered frames, bounded by their total
+    size in bytes. Keys are (recording, block index, font, mode), so one
+    cache can be shared by the previews of different files and settings;
+    switching back to a font or chroma key shows its frames again without
+    rendering. Thread-safe.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.frames
+
+    def get(self, key):
+        """The cached frame, marked as most recently used, or None."""
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame):
+        """Add a frame, evicting the least recently used ones beyond max_bytes."""
+        with self.lock:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                return
+            self.frames[key] = frame
+            self.bytes += frame.nbytes
+            while self.bytes > self.max_bytes and len(self.frames) > 1:
+                _, evicted = self.frames.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.bytes = 0
+
+
+def checkerboard(size, square=CHECKER_SIZE):
+    """Grey checkerboard RGB image of 'size', the usual backdrop for transparency."""
+    width, height = size
+    y, x = np.ogrid[:height, :width]
+    light = ((y // square + x // square) % 2).astype(bool)
+    pixels = np.where(light[..., None], np.uint8(204), np.uint8(153)).repeat(3, axis=2)
+    return Image.fromarray(pixels, "RGB")
+
+
+class PreviewRenderer:
+    """
+    Renders single moments of a recording for the GUI preview, through the
+    maker's own frame render path (its glyph atlas), so the preview shows
+    exactly what the video will. Rendered frames go into a FrameCache; after
+    each frame_at() a worker thread renders the neighbouring OSD frames, so
+    scrubbing back and forth mostly hits the cache. The recording is read
+    from the reader's memory-mapped store and never parsed again.
+    """
+
+    def __init__(self, osd_reader, maker, cache=None, prefetch=DEFAULT_PREFETCH):
+        self.osd_reader = osd_reader
+        self.maker = maker
+        self.cache = cache if cache is not None else FrameCache()
+        self.prefetch = prefetch
+        if isinstance(maker, VideoMaker):
+            self.transparent = False
+            self.mode = ("chroma", maker.chroma_key_hex.lstrip('#').upper(), maker.target_height)
+            self.render_frame = maker.render_frame
+        else:
+            self.transparent = True
+            self.mode = ("transparent", maker.target_height)
+            self.render_frame = maker.render_frame_with_alpha
+        # Build (or map the cached) atlas here, not on the prefetch thread
+        maker.get_atlas()
+
+        self.first_time, last_time = osd_reader.get_time_range()
+        self.duration = last_time - self.first_time
+        self.num_blocks = len(osd_reader.frames)
+        # Identifies the recording in cache keys; the mtime tells a file
+        # rewritten in place from the one cached before
+        self.source = (os.path.abspath(osd_reader.file_path), os.path.getmtime(osd_reader.file_path))
+        self.backdrop = None
+
+        self._wanted = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._prefetch_loop, name="PreviewPrefetch", daemon=True)
+        self._thread.start()
+
+    def key(self, block_index):
+        return (self.source, block_index, self.maker.font_image_path, self.mode)
+
+    def block_at(self, seconds):
+        """Index of the OSD frame on screen 'seconds' into the recording."""
+        return int(self.osd_reader.frames.index_at(self.first_time + seconds))
+
+    def _render(self, block_index):
+        _, grids = self.osd_reader.frames.block(block_index, block_index + 1)
+        frame = self.render_frame(grids[0].reshape(-1))
+        self.cache.put(self.key(block_index), frame)
+        return frame
+
+    def render_block(self, block_index):
+        """Rendered frame of one OSD frame, from the cache when possible."""
+        frame = self.cache.get(self.key(block_index))
+        if frame is None:
+            frame = self._render(block_index)
+        return frame
+
+    def frame_at(self, seconds):
+        """
+        (block_index, frame) for the OSD on screen 'seconds' into the
+        recording, with frame as the maker renders it (RGBA or BGR). Queues
+        the neighbouring OSD frames for prefetching.
+        """
+        block_index = self.block_at(seconds)
+        frame = self.render_block(block_index)
+        self.request_prefetch(block_index)
+        return block_index, frame
+
+    def request_prefetch(self, block_index):
+        """Render the frames around block_index next, nearest first, replacing older requests."""
+        neighbours = []
+        for offset in range(1, self.prefetch + 1):
+            for neighbour in (block_index + offset, block_index - offset):
+                if 0 <= neighbour < self.num_blocks:
+                    neighbours.append(neighbour)
+        with self._condition:
+            self._wanted = neighbours
+            self._condition.notify()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._condition:
+                while not self._wanted and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                block_index = self._wanted.pop(0)
+            if self.key(block_index) in self.cache:
+                continue
+            try:
+                self._render(block_index)
+            except Exception:
+                # Prefetching is best effort; rendering the frame when it is
+                # shown raises the same error where the GUI reports it
+                continue
+
+    def to_image(self, frame, max_size=None):
+        """
+        PIL RGB image of a rendered frame, shrunk to fit max_size (width,
+        height). Transparent frames are shown over a checkerboard.
+        """
+        if self.transparent:
+            overlay = Image.fromarray(frame, "RGBA")
+            if self.backdrop is None or self.backdrop.size != overlay.size:
+                self.backdrop = checkerboard(overlay.size)
+            image = self.backdrop.copy()
+            image.paste(overlay, mask=overlay)
+        else:
+            image = Image.fromarray(np.ascontiguousarray(frame[..., ::-1]), "RGB")
+        if max_size is not None:
+            image.thumbnail(max_size)
+        return image
+
+    def close(self):
+        """Stop the prefetch thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
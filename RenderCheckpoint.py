@@ -0,0 +1,109 @@
+import os
+import json
+import shutil
+
+# Length of the checkpointed segments in seconds of output; at most this
+# much rendering is lost when a render crashes or is cancelled
+SEGMENT_SECONDS = 60
+# The segments and manifest of an unfinished render of X are kept in X + this
+PARTIAL_SUFFIX = ".partial"
+MANIFEST_NAME = "manifest.json"
+# Bump when the manifest layout changes, so old checkpoints are discarded
+MANIFEST_VERSION = 1
+
+
+class RenderCancelled(Exception):
+    """Raised by a render that was stopped through its cancel event."""
+
+
+def file_signature(path):
+    """(absolute path, size, mtime) of a file, to notice when it changed."""
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime]
+
+
+class RenderCheckpoint:
+    """
+    Segment files and manifest of a resumable render of output_path, kept in
+    the folder output_path + PARTIAL_SUFFIX until the segments are joined.
+
+    'job' is a JSON-able description of the render (source files, settings,
+    frame range); 'segments' its (start_frame, end_frame) ranges. Segments
+    are rendered to a .part file and renamed when complete, then recorded in
+    the manifest, so a crash never leaves a truncated segment behind. A
+    checkpoint of a different job found in the folder is discarded.
+    """
+
+    def __init__(self, output_path, job, segments):
+        self.output_path = output_path
+        self.directory = output_path + PARTIAL_SUFFIX
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        self.extension = os.path.splitext(output_path)[1]
+        # Round-trip through JSON so it compares equal to a loaded manifest
+        self.job = json.loads(json.dumps(job))
+        self.segments = [(int(start), int(end)) for start, end in segments]
+        self.finished = {}  # segment index -> size of its file in bytes
+        self.load()
+
+    def load(self):
+        """Pick up the finished segments of an earlier run of the same job."""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            manifest = None
+
+        if (manifest is not None and manifest.get("version") == MANIFEST_VERSION
+                and manifest.get("job") == self.job
+                and [tuple(segment) for segment in manifest.get("segments", [])] == self.segments):
+            for index, size in manifest.get("finished", {}).items():
+                path = self.segment_path(int(index))
+                if os.path.isfile(path) and os.path.getsize(path) == size:
+                    self.finished[int(index)] = size
+        elif os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.save()
+
+    def save(self):
+        """Write the manifest atomically, so it is never seen half-written."""
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "job": self.job,
+            "segments": self.segments,
+            "finished": {str(index): size for index, size in sorted(self.finished.items())},
+        }
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def segment_path(self, index):
+        return os.path.join(self.directory, f"segment_{index:04d}{self.extension}")
+
+    def part_path(self, index):
+        """Where segment 'index' is rendered before it is complete."""
+        return os.path.join(self.directory, f"segment_{index:04d}.part{self.extension}")
+
+    @property
+    def segment_paths(self):
+        return [self.segment_path(index) for index in range(len(self.segments))]
+
+    def pending(self):
+        """(index, start_frame, end_frame) of every segment still to render."""
+        return [(index, start, end) for index, (start, end) in enumerate(self.segments)
+                if index not in self.finished]
+
+    def frames_done(self):
+        """Output frames covered by the finished segments."""
+        return sum(self.segments[index][1] - self.segments[index][0] for index in self.finished)
+
+    def mark_done(self, index):
+        """Record segment 'index' as finished once its .part file is complete."""
+        os.replace(self.part_path(index), self.segment_path(index))
+        self.finished[index] = os.path.getsize(self.segment_path(index))
+        self.save()
+
+    def remove(self):
+        """Delete the segments and manifest, once the output is complete."""
+        shutil.rmtree(self.directory, ignore_errors=True)
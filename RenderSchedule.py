@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class RenderSchedule:
+    """
+    Which OSD frame (block) is shown at each output frame of a constant-fps
+    render, computed for the whole range at once.
+
+    'frame_blocks' holds the block index of every output frame
+    start_frame..end_frame-1. Consecutive output frames showing the same
+    block form a run: 'block_indices' lists the block of each run,
+    'run_starts' its first output frame and 'run_lengths' how many frames it
+    lasts. A block only has to be rendered once per run; the rest of the run
+    repeats it. 'run_times' is when each run's block appears, in seconds
+    from the start of the recording: its source timestamp, or the start of
+    the range for the first run. Variable-frame-rate output uses it to give
+    each run one frame with its real duration.
+    """
+
+    def __init__(self, frame_blocks, start_frame, fps):
+        self.frame_blocks = frame_blocks
+        self.start_frame = start_frame
+        self.end_frame = start_frame + len(frame_blocks)
+        self.fps = fps
+
+        if len(frame_blocks):
+            changes = np.flatnonzero(frame_blocks[1:] != frame_blocks[:-1]) + 1
+            run_offsets = np.concatenate([[0], changes])
+        else:
+            run_offsets = np.zeros(0, dtype=np.intp)
+        self.block_indices = frame_blocks[run_offsets]
+        self.run_starts = start_frame + run_offsets
+        self.run_lengths = np.diff(np.append(run_offsets, len(frame_blocks)))
+        # Output frame times until from_store() knows the source timestamps
+        self.run_times = self.run_starts / fps
+
+    @classmethod
+    def from_store(cls, store, fps, start_frame, end_frame):
+        """
+        Map output frames start_frame..end_frame-1 of 'store' to blocks.
+        Output frame n is at first_timestamp + n / fps and shows the last
+        block whose timestamp is <= that time, or the first block before it.
+        Only the timestamps inside the range are read.
+        """
+        first_time = store.timestamps_between(0, 1)[0]
+        frame_times = first_time + np.arange(start_frame, end_frame) / fps
+        if not len(frame_times):
+            return cls(np.zeros(0, dtype=np.intp), start_frame, fps)
+
+        first_block = store.index_at(frame_times[0])
+        last_block = store.index_at(frame_times[-1])
+        timestamps = store.timestamps_between(first_block, last_block + 1)
+        frame_blocks = first_block + np.searchsorted(timestamps, frame_times, side="right") - 1
+        schedule = cls(np.maximum(frame_blocks, first_block).astype(np.intp), start_frame, fps)
+        block_times = timestamps[schedule.block_indices - first_block] - first_time
+        schedule.run_times = np.maximum(block_times, start_frame / fps)
+        return schedule
+
+    def __len__(self):
+        return len(self.frame_blocks)
+
+    @property
+    def num_runs(self):
+        return len(self.block_indices)
+
+    @property
+    def repeated_frames(self):
+        """Output frames that repeat the previous one and need no rendering."""
+        return len(self) - self.num_runs
+
+    @property
+    def end_time(self):
+        """End of the range in seconds from the start of the recording."""
+        return self.end_frame / self.fps
+
+    def iter_runs(self):
+        """Yield (block_index, first_frame, run_length) for each run in order."""
+        return zip(self.block_indices.tolist(), self.run_starts.tolist(), self.run_lengths.tolist())
+
+    def split(self, num_segments):
+        """
+        Split the range into up to num_segments contiguous (start, end) frame
+        ranges of about equal length. Boundaries are moved to the nearest run
+        start, so no block has to be rendered by two segments.
+        """
+        num_segments = max(1, min(num_segments, len(self)))
+        targets = self.start_frame + np.arange(1, num_segments) * len(self) / num_segments
+        nearest = np.clip(np.searchsorted(self.run_starts, targets), 1, max(self.num_runs - 1, 1))
+        # Pick whichever neighbouring run start is closer to the even split
+        earlier = self.run_starts[nearest - 1]
+        later = self.run_starts[np.minimum(nearest, self.num_runs - 1)]
+        cuts = np.where(targets - earlier <= later - targets, earlier, later)
+
+        bounds = np.unique(np.concatenate([[self.start_frame], cuts, [self.end_frame]]))
+        return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def segments(self, segment_frames):
+        """
+        Split the range into (start, end) frame ranges of segment_frames
+        frames each, the last one shorter. Unlike split() the boundaries only
+        depend on the range, so rendering it again gives the same segments.
+        """
+        bounds = list(range(self.start_frame, self.end_frame, segment_frames)) + [self.end_frame]
+        return list(zip(bounds[:-1], bounds[1:]))
@@ -0,0 +1,162 @@
+import io
+import time
+import inspect
+import cProfile
+import pstats
+import contextlib
+
+# Where a render spends its wall time. The first four are on the render
+# thread, the last two on the FrameWriter thread.
+#   block_lookup  reading the next OSD frame grid from the store
+#   render        drawing the frame into its buffer (NumPy gathers)
+#   buffer_wait   waiting for a free frame buffer, i.e. the writer is behind
+#   submit_wait   waiting for room in the writer queue, same cause
+#   write         handing a frame to the encoder: cv2's write, or copying it
+#                 into the ffmpeg pipe, blocking while ffmpeg catches up
+#   writer_idle   the writer waiting for frames, i.e. rendering is behind
+STAGES = ("block_lookup", "render", "buffer_wait", "submit_wait", "write", "writer_idle")
+
+
+class RenderStats:
+    """
+    Per-stage timings of one render, filled in by the makers' render loop
+    and their FrameWriter. Passed to progress callbacks that accept it (see
+    progress_reporter()) and printed by report() at the end, so a slow job
+    can be told apart as CPU-bound in NumPy or stalled on the encoder.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.counts = dict.fromkeys(STAGES, 0)
+        self.frames_rendered = 0  # unique frames drawn
+        self.frames_written = 0  # output frames, repeats included
+        self.bytes_written = 0
+        self.start_time = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    def add(self, stage, seconds):
+        self.seconds[stage] += seconds
+        self.counts[stage] += 1
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed_iter(self, iterable, stage):
+        """Iterate, counting the time spent producing each item as 'stage'."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def stop(self):
+        """Fix the wall time at the end of the render."""
+        self.wall_seconds = time.perf_counter() - self.start_time
+
+    def elapsed(self):
+        return self.wall_seconds or time.perf_counter() - self.start_time
+
+    def merge(self, other):
+        """
+        Add the stage times and frame counts of another render (e.g. a
+        parallel segment, as a dict from as_dict()). Wall time is not summed.
+        """
+        other = other if isinstance(other, dict) else other.as_dict()
+        for stage in STAGES:
+            self.seconds[stage] += other["seconds"][stage]
+            self.counts[stage] += other["counts"][stage]
+        self.frames_rendered += other["frames_rendered"]
+        self.frames_written += other["frames_written"]
+        self.bytes_written += other["bytes_written"]
+
+    def bottleneck(self):
+        """
+        "encoder" if rendering mostly waited for the writer, "render" if the
+        writer mostly waited for frames, else "balanced".
+        """
+        backpressure = self.seconds["buffer_wait"] + self.seconds["submit_wait"]
+        busy = self.seconds["block_lookup"] + self.seconds["render"]
+        if backpressure > busy:
+            return "encoder"
+        if self.seconds["writer_idle"] > self.seconds["write"]:
+            return "render"
+        return "balanced"
+
+    def as_dict(self):
+        return {
+            "seconds": dict(self.seconds),
+            "counts": dict(self.counts),
+            "frames_rendered": self.frames_rendered,
+            "frames_written": self.frames_written,
+            "bytes_written": self.bytes_written,
+            "wall_seconds": self.elapsed(),
+            "bottleneck": self.bottleneck(),
+        }
+
+    def report(self):
+        """Table of the stage times, their share of the wall time and per-call cost."""
+        wall = self.elapsed()
+        lines = [f"Render stats: {self.frames_written} frames written, {self.frames_rendered} rendered, "
+                 f"{wall:.2f}s wall, bottleneck: {self.bottleneck()}"]
+        for stage in STAGES:
+            seconds, count = self.seconds[stage], self.counts[stage]
+            share = seconds / wall if wall else 0.0
+            per_call = seconds / count * 1000 if count else 0.0
+            lines.append(f"  {stage:<13}{seconds:9.3f}s {share:7.1%} {count:8d} x {per_call:8.3f} ms")
+        # Render-thread time outside the stages: progress callbacks, schedule, setup
+        other = wall - sum(self.seconds[stage] for stage in STAGES[:4])
+        if other > 0:
+            lines.append(f"  {'other':<13}{other:9.3f}s {other / wall:7.1%}")
+        return "\n".join(lines)
+
+
+def progress_reporter(progress_callback, stats):
+    """
+    Wrap a progress callback as (percentage, frame_num) -> None. Callbacks
+    that take a third argument (or a 'stats' keyword) also get the live
+    RenderStats; plain (percentage, frame_num) callbacks work as before.
+    """
+    if progress_callback is None:
+        return None
+    try:
+        parameters = inspect.signature(progress_callback).parameters.values()
+    except (TypeError, ValueError):
+        return progress_callback
+    positional = [p for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    if any(p.name == "stats" for p in parameters):
+        return lambda percentage, frame_num: progress_callback(percentage, frame_num, stats=stats)
+    if len(positional) >= 3 or any(p.kind == p.VAR_POSITIONAL for p in parameters):
+        return lambda percentage, frame_num: progress_callback(percentage, frame_num, stats)
+    return progress_callback
+
+
+@contextlib.contextmanager
+def profiled(path=None, top=20):
+    """
+    Run the body under cProfile. The profile is saved to 'path' (open it
+    with pstats or snakeviz) and the 'top' functions by cumulative time are
+    printed. Only the calling thread is profiled; the FrameWriter thread's
+    share shows up in RenderStats as write/writer_idle.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+            print(f"Profile written to {path}")
+        if top:
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(top)
+            print(summary.getvalue())
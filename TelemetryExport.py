@@ -0,0 +1,120 @@
+"""
+Export the telemetry shown in an .osd recording to CSV or Parquet.
+
+    python TelemetryExport.py flight.osd flight.csv [--firmware inav] [--text-rows]
+
+Values such as battery voltage, mAh, altitude, speed and the flight timer
+are read off the glyph grid through the firmware's charmap (see
+Charmaps.py) and written one row per OSD frame with its timestamp, so they
+can be lined up with blackbox logs. Frames are decoded and written in
+chunks; the whole flight is never held in memory. Parquet output needs
+pyarrow.
+"""
+import os
+import io
+import argparse
+import contextlib
+
+from OsdFileReader import OsdFileReader
+from TelemetryExtractor import DEFAULT_BLOCK_SIZE
+from Charmaps import CHARMAPS, charmap_for_font, charmap_for_variant, load_charmap
+
+
+def choose_charmap(reader, firmware=None, font_path=None):
+    """
+    Charmap for a recording: 'firmware' (a CHARMAPS name or a charmap .json
+    file) wins, then the font the overlay is rendered with, then the font
+    variant in the file header, and Betaflight's layout otherwise.
+    """
+    if firmware:
+        if firmware.lower().endswith(".json"):
+            return load_charmap(firmware)
+        return CHARMAPS[firmware.lower()]
+    if font_path:
+        return charmap_for_font(font_path)
+    return charmap_for_variant(reader.header.get('config', {}).get('fontVariant')) or CHARMAPS["betaflight"]
+
+
+def _write_csv(chunks, output_path):
+    rows = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            chunk = chunk.copy()
+            # Durations as plain seconds read better next to blackbox logs
+            for name in chunk.select_dtypes("timedelta").columns:
+                chunk[name] = chunk[name].dt.total_seconds()
+            chunk.to_csv(f, header=i == 0)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(chunks, output_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow); use a .csv output instead") from None
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=True)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_telemetry(reader, output_path, fields=None, charmap=None, chunk_size=DEFAULT_BLOCK_SIZE, text_rows=False):
+    """
+    Write the telemetry of an OsdFileReader to output_path (.csv or .parquet),
+    chunk_size frames at a time. 'fields' defaults to the charmap's fields;
+    text_rows=True also writes every screen row as text. Returns the number
+    of rows written.
+    """
+    if charmap is None:
+        charmap = choose_charmap(reader)
+    if fields is None:
+        fields = charmap.fields
+    chunks = reader.iter_telemetry(fields, charmap=charmap, block_size=chunk_size, text_rows=text_rows)
+
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension == ".csv":
+        return _write_csv(chunks, output_path)
+    if extension in (".parquet", ".pq"):
+        return _write_parquet(chunks, output_path)
+    raise ValueError(f"Unsupported output format '{extension}', use .csv or .parquet")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("osd", help=".osd file")
+    parser.add_argument("output", nargs="?", help="output .csv or .parquet (default: <osd name>.csv)")
+    parser.add_argument("--firmware", help=f"charmap: {', '.join(CHARMAPS)} or a charmap .json file")
+    parser.add_argument("--font", help="pick the charmap from the font used for the overlay")
+    parser.add_argument("--text-rows", action="store_true", help="also write every screen row as text")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_BLOCK_SIZE, help="frames decoded at a time")
+    args = parser.parse_args(argv)
+
+    if args.firmware and not args.firmware.lower().endswith(".json") and args.firmware.lower() not in CHARMAPS:
+        parser.error(f"unknown firmware '{args.firmware}'")
+    output_path = args.output or os.path.splitext(args.osd)[0] + ".csv"
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader = OsdFileReader(args.osd)
+    charmap = choose_charmap(reader, args.firmware, args.font)
+    try:
+        rows = export_telemetry(reader, output_path, charmap=charmap, chunk_size=args.chunk_size,
+                                text_rows=args.text_rows)
+    except (ImportError, ValueError) as e:
+        parser.error(str(e))
+    print(f"{rows} frames ({charmap.name} charmap) -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
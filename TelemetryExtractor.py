@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+# Field formats. 0-2 decode like OsdFileReader.parse(); FORMAT_NUMBER reads
+# the number shown on screen (e.g. "12.6V" -> 12.6) and FORMAT_CLOCK an
+# "mm:ss" timer (-> seconds) through the charmap.
+FORMAT_STRING = 0
+FORMAT_FLOAT = 1
+FORMAT_TIME = 2
+FORMAT_NUMBER = 3
+FORMAT_CLOCK = 4
+
+# Frames are processed this many at a time, bounding the temporary masks
+DEFAULT_BLOCK_SIZE = 4096
+NUM_GLYPHS = 1 << 16
+
+
+def build_charmap(mapping=None):
+    """
+    Lookup table glyph index -> Unicode code point (0 = no character).
+    'mapping' is a dict {glyph: char}; without it printable ASCII maps to
+    itself, which is how Betaflight/INAV fonts lay out digits and letters.
+    """
+    table = np.zeros(NUM_GLYPHS, dtype=np.uint32)
+    if mapping is None:
+        printable = np.arange(0x20, 0x7F)
+        table[printable] = printable
+    else:
+        for glyph, char in mapping.items():
+            table[glyph] = ord(char)
+    return table
+
+
+DEFAULT_CHARMAP = build_charmap()
+
+
+def _field_windows(frames, identifier, coordinates, length, char_width):
+    """
+    Locate one field in every frame of a (n, cells) block and gather its
+    cells. Returns (windows, valid) with windows shaped (n, abs(length)).
+    With an identifier the field is the abs(length) cells right after it,
+    or right before it for a negative length. (parse() skips one more cell
+    before the identifier, so it can't read a value in front of a unit
+    symbol.) With coordinates a negative length ends just before them.
+    """
+    n_frames, num_cells = frames.shape
+    read_len = abs(length)
+    if identifier != -1:
+        mask = frames == identifier
+        valid = mask.any(axis=1)
+        start = mask.argmax(axis=1).astype(np.int64) + (1 if length > 0 else length)
+    elif list(coordinates) != [-1, -1]:
+        x, y = coordinates
+        valid = np.ones(n_frames, dtype=bool)
+        start = np.full(n_frames, y * char_width + x + min(length, 0), dtype=np.int64)
+    else:
+        return np.zeros((n_frames, read_len), dtype=frames.dtype), np.zeros(n_frames, dtype=bool)
+
+    valid &= (start >= 0) & (start + read_len <= num_cells) & (read_len > 0)
+
+    positions = np.clip(start[:, None] + np.arange(read_len), 0, num_cells - 1)
+    return np.take_along_axis(frames, positions, axis=1), valid
+
+
+def _decode_string(windows, valid, charmap):
+    if not windows.size:
+        return np.full(len(windows), None, dtype=object)
+    codes = charmap[windows]
+    # Drop unmapped glyphs by moving them to the end, where the fixed-width view trims them
+    order = np.argsort(codes == 0, axis=1, kind="stable")
+    codes = np.ascontiguousarray(np.take_along_axis(codes, order, axis=1))
+    strings = codes.view(f"<U{windows.shape[1]}").reshape(-1)
+    return np.where(valid, strings.astype(object), None)
+
+
+def _decode_float(windows, valid):
+    # parse() reads the glyphs as one big-endian hex number; that needs byte glyphs
+    valid = valid & (windows < 256).all(axis=1)
+    weights = 256.0 ** np.arange(windows.shape[1] - 1, -1, -1)
+    return np.where(valid, windows.astype(np.float64) @ weights, np.nan)
+
+
+def _decode_time(windows, valid):
+    """Seconds, with the first glyph as minutes and the rest as big-endian seconds, as in parse()."""
+    if windows.shape[1] < 2:
+        return np.full(len(windows), np.nan)
+    valid = valid & (windows < 256).all(axis=1)
+    weights = 256.0 ** np.arange(windows.shape[1] - 2, -1, -1)
+    seconds = windows[:, 0] * 60.0 + windows[:, 1:].astype(np.float64) @ weights
+    return np.where(valid, seconds, np.nan)
+
+
+def _parse_numbers(chars):
+    """
+    Value of the first number in each row of an (n, k) code point array:
+    digits with at most one '.', which may come right before the first
+    digit (".5"), ending at the first other character or second '.',
+    negated by a '-' right before it. NaN where a row has no digit.
+    """
+    if not chars.shape[1]:
+        return np.full(len(chars), np.nan)
+    rows = np.arange(len(chars))
+    positions = np.arange(chars.shape[1])
+    is_digit = (chars >= ord("0")) & (chars <= ord("9"))
+    is_point = chars == ord(".")
+    has_digit = is_digit.any(axis=1)
+    first_digit = is_digit.argmax(axis=1)
+    before_digit = np.maximum(first_digit - 1, 0)
+    start = np.where((first_digit > 0) & is_point[rows, before_digit], before_digit, first_digit)
+
+    # The number runs from its start up to the first character that is
+    # neither a digit nor its first point
+    from_start = positions >= start[:, None]
+    points = np.cumsum(is_point & from_start, axis=1)
+    breaks = from_start & ~(is_digit | (is_point & (points == 1)))
+    end = np.where(breaks.any(axis=1), breaks.argmax(axis=1), chars.shape[1])
+    in_number = from_start & (positions < end[:, None])
+    is_digit &= in_number
+
+    after_point = np.cumsum(is_point & in_number, axis=1) > 0
+    int_digits = is_digit & ~after_point
+    frac_digits = is_digit & after_point
+    # Place value of an integer digit = integer digits to its right;
+    # of a fraction digit = -(fraction digits up to and including it)
+    int_exponent = np.cumsum(int_digits[:, ::-1], axis=1)[:, ::-1] - 1
+    frac_exponent = -np.cumsum(frac_digits, axis=1)
+    exponent = np.where(int_digits, int_exponent, frac_exponent)
+    digits = np.where(is_digit, chars.astype(np.int64) - ord("0"), 0)
+    values = (digits * 10.0 ** exponent).sum(axis=1)
+
+    sign = chars[rows, np.maximum(start - 1, 0)]
+    values = np.where((start > 0) & (sign == ord("-")), -values, values)
+    return np.where(has_digit, values, np.nan)
+
+
+def _decode_number(windows, valid, charmap):
+    """First decimal number in each window, e.g. 12.6 from "12.6V" or -3 from " -3M"."""
+    return np.where(valid, _parse_numbers(charmap[windows]), np.nan)
+
+
+def _decode_clock(windows, valid, charmap):
+    """Seconds from an "mm:ss" or "hh:mm:ss" timer; each ':' multiplies what came before it by 60."""
+    chars = charmap[windows]
+    if not chars.shape[1]:
+        return np.full(len(chars), np.nan)
+    part_index = np.cumsum(chars == ord(":"), axis=1)
+    num_colons = part_index[:, -1]
+    seconds = np.zeros(len(chars))
+    for part in range(int(num_colons.max()) + 1 if len(chars) else 0):
+        # Blank everything outside this part so only its number is parsed
+        value = _parse_numbers(np.where(part_index == part, chars, ord(" ")))
+        scale = 60.0 ** np.maximum(num_colons - part, 0)
+        seconds += np.where(part <= num_colons, np.nan_to_num(value) * scale, 0)
+    has_digit = ((chars >= ord("0")) & (chars <= ord("9"))).any(axis=1)
+    return np.where(valid & has_digit & (num_colons > 0), seconds, np.nan)
+
+
+def _resolve_fields(field_definitions, charmap):
+    """Check the formats and turn symbol-name identifiers into glyph indices."""
+    fields = {}
+    for name, (identifier, coordinates, length, format_type) in field_definitions.items():
+        if isinstance(identifier, str):
+            if not hasattr(charmap, "glyph"):
+                raise ValueError(f"Field '{name}' names a symbol, which needs a Charmap")
+            identifier = charmap.glyph(identifier)
+        if format_type not in (FORMAT_STRING, FORMAT_FLOAT, FORMAT_TIME, FORMAT_NUMBER, FORMAT_CLOCK):
+            raise ValueError(f"Unknown format type {format_type} for field '{name}'")
+        fields[name] = (identifier, coordinates, length, format_type)
+    return fields
+
+
+def _decode_block(timestamps, grids, fields, char_width, charmap, codes, text_rows, first_frame):
+    frames = grids.reshape(len(grids), -1)
+    columns = {"timestamp": np.asarray(timestamps, dtype=np.float64)}
+    for name, (identifier, coordinates, length, format_type) in fields.items():
+        windows, valid = _field_windows(frames, identifier, coordinates, length, char_width)
+        if format_type == FORMAT_STRING:
+            columns[name] = pd.array(_decode_string(windows, valid, codes), dtype="string")
+        elif format_type == FORMAT_FLOAT:
+            columns[name] = _decode_float(windows, valid)
+        elif format_type == FORMAT_TIME:
+            columns[name] = pd.to_timedelta(_decode_time(windows, valid), unit="s")
+        elif format_type == FORMAT_NUMBER:
+            columns[name] = _decode_number(windows, valid, codes)
+        else:
+            columns[name] = _decode_clock(windows, valid, codes)
+
+    if text_rows:
+        text = charmap.text_rows(grids)
+        for row in range(grids.shape[1]):
+            columns[f"row_{row:02d}"] = pd.array(text[:, row], dtype="string")
+    return pd.DataFrame(columns, index=pd.RangeIndex(first_frame, first_frame + len(grids), name="frame"))
+
+
+def iter_telemetry(store, field_definitions, char_width, charmap=None, block_size=DEFAULT_BLOCK_SIZE,
+                   text_rows=False):
+    """
+    Like extract_telemetry(), but yields one DataFrame per block_size
+    frames, so a whole flight can be written out in bounded memory.
+
+    text_rows=True adds the screen as text, one 'row_NN' column per grid
+    row; it needs a Charmaps.Charmap.
+    """
+    codes = DEFAULT_CHARMAP if charmap is None else getattr(charmap, "codes", charmap)
+    fields = _resolve_fields(field_definitions, charmap)
+    if text_rows and not hasattr(charmap, "text_rows"):
+        raise ValueError("text_rows needs a Charmap")
+
+    for start in range(0, len(store), block_size):
+        timestamps, grids = store.block(start, start + block_size)
+        yield _decode_block(timestamps, grids, fields, char_width, charmap, codes, text_rows, start)
+
+
+def extract_telemetry(store, field_definitions, char_width, charmap=None, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Vectorized counterpart of OsdFileReader.parse() over a frame store.
+
+    field_definitions: {name: (identifier, coordinates, length, format_type)}
+    like parse(), with FORMAT_NUMBER and FORMAT_CLOCK as extra formats.
+    Each block of frames is searched for identifier glyphs at once (mask +
+    argmax), the field cells are gathered in bulk and decoded with array
+    operations.
+
+    'charmap' is a Charmaps.Charmap or a raw glyph -> code point table
+    (default: printable ASCII). With a Charmap, identifiers may also be
+    symbol names such as "VOLT".
+
+    Returns a DataFrame indexed by frame with a 'timestamp' column in
+    seconds and one typed column per field: string, float64, timedelta64
+    (FORMAT_TIME) or float64 (FORMAT_NUMBER, FORMAT_CLOCK in seconds).
+    Frames where a field is not found or would be read past the grid hold NA.
+    """
+    chunks = list(iter_telemetry(store, field_definitions, char_width, charmap, block_size))
+    if chunks:
+        return pd.concat(chunks)
+    # No frames: decode an empty block to still get the typed columns
+    codes = DEFAULT_CHARMAP if charmap is None else getattr(charmap, "codes", charmap)
+    empty = np.zeros((0, store.num_rows, store.num_cols), dtype=np.uint16)
+    fields = _resolve_fields(field_definitions, charmap)
+    return _decode_block(np.zeros(0), empty, fields, char_width, charmap, codes, False, 0)
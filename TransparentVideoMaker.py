@@ -1,37 +1,69 @@
-import os, sys
+import os
 import numpy as np
 import pandas as pd
 from PIL import Image
-import subprocess
-
-def resource_path(relative_path):
-    """
-    PyInstaller helper: gets the absolute path of a bundled file.
-    If running from source, it uses this file's directory;
-    if running from .exe, it uses the _MEIPASS temp folder.
-    """
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.dirname(__file__), relative_path)
+
+from FramePipeline import FrameWriter, peak_memory_bytes
+from AtlasCache import default_cache_dir, load_cached_tiles
+from GlyphAtlas import GlyphAtlas, IncrementalRenderer
+from ParallelRender import render_parallel, render_checkpointed
+from RenderCheckpoint import RenderCancelled
+from RenderStats import RenderStats, progress_reporter, profiled
+from EncoderBackend import FfmpegEncoder, DEFAULT_CODEC, check_container, find_ffmpeg
+from ImageSequenceWriter import ImageSequenceWriter, get_image_format
 
 class TransparentVideoMaker:
-    def __init__(self, osd_reader, font_image_path, fps=60.0):
+    def __init__(self, osd_reader, font_image_path, fps=60.0, incremental=True, workers=1, atlas_cache=True,
+                 profile=False, codec=DEFAULT_CODEC, encoder_threads=0, ffmpeg_path=None, vfr=False,
+                 target_height=None, resumable=False, image_format=None, image_compression=None,
+                 link_repeats=True):
         self.osd_reader = osd_reader
         self.font_image_path = font_image_path
         self.fps = fps
+        self.incremental = incremental  # redraw only the cells that changed
+        self.workers = workers  # > 1 renders time segments in that many processes
+        # True caches the atlas in default_cache_dir(), a path caches it there, False disables it
+        self.atlas_cache = atlas_cache
+        self.profile = profile  # run under cProfile and save <output>.prof
+        # Output codec from EncoderBackend.CODECS, ffmpeg's encoder threads (0 = auto)
+        # and an explicit ffmpeg binary (None searches for one, see find_ffmpeg())
+        self.codec = codec
+        self.encoder_threads = encoder_threads
+        self.ffmpeg_path = ffmpeg_path
+        # Variable frame rate: one frame per OSD change, timed by the source
+        # timestamps, instead of repeating frames at a constant fps
+        self.vfr = vfr
+        # Output height in pixels (e.g. 1080 for editing proxies); the glyphs
+        # are resampled to fit once and the width follows the grid. None
+        # keeps the font's own size.
+        self.target_height = target_height
+        # Render in checkpointed segments (see RenderCheckpoint), so a crashed
+        # or cancelled render continues where it stopped
+        self.resumable = resumable
+        # "png" or "webp" writes an image sequence into the folder output_path
+        # instead of a video (see ImageSequenceWriter), encoded by
+        # encoder_threads threads; image_compression is the format's level
+        # (None = its default) and link_repeats hardlinks repeated frames
+        # instead of only listing their durations in the index file
+        self.image_format = image_format
+        self.image_compression = image_compression
+        self.link_repeats = link_repeats
+        if image_format is not None:
+            get_image_format(image_format).options(image_compression)  # fail early on bad settings
 
-        # Load font image
-        self.font_image = self.load_font_image()
-        self.tile_cache = {}
+        # Only the font size is read here; the pixels are loaded if the atlas isn't cached
+        self._font_image = None
+        self.font_width, self.font_height = self.read_font_size()
+        self.atlas = None  # GlyphAtlas, built on first render
 
         # We assume 256 rows. Each tile has a 1:1.5 width:height ratio,
         # i.e. tile_width = tile_height / 1.5
         self.num_rows = 256
-        self.tile_height = self.font_image.height / self.num_rows
+        self.tile_height = self.font_height / self.num_rows
         self.tile_width = self.tile_height / 1.5  # 1:1.5 => ~0.6667
 
         # Detect how many columns the font image physically supports.
-        self.num_columns = int(self.font_image.width // self.tile_width)
+        self.num_columns = int(self.font_width // self.tile_width)
         if self.num_columns < 1:
             self.num_columns = 1
         elif self.num_columns > 4:
@@ -40,6 +72,19 @@ class TransparentVideoMaker:
         # Compute final resolution
         self.TILE_WIDTH, self.TILE_HEIGHT, self.RESOLUTION = self.compute_tile_and_resolution()
 
+    @property
+    def font_image(self):
+        if self._font_image is None:
+            self._font_image = self.load_font_image()
+        return self._font_image
+
+    def read_font_size(self):
+        try:
+            with Image.open(self.font_image_path) as image:
+                return image.size
+        except Exception as e:
+            raise ValueError(f"Failed to load font image: {e}")
+
     def load_font_image(self):
         try:
             return Image.open(self.font_image_path).convert('RGBA')
@@ -56,6 +101,10 @@ class TransparentVideoMaker:
 
         grid_width = self.osd_reader.header['config']['charWidth']
         grid_height = self.osd_reader.header['config']['charHeight']
+        if self.target_height:
+            # Same 1:1.5 ratio, scaled so the grid is target_height pixels high
+            tile_h = self.target_height / grid_height
+            tile_w = tile_h * self.tile_width / self.tile_height
 
         resolution = (
             int(grid_width * tile_w),
@@ -66,102 +115,298 @@ class TransparentVideoMaker:
     def get_tile_with_alpha(self, tile_index):
         """
         Convert tile_index -> column,row. If out of range, clamp.
-        Then crop from the font image or create a blank tile.
+        Returns the RGBA tile, transparent where the font sheet ends.
         """
-        if tile_index in self.tile_cache:
-            return self.tile_cache[tile_index]
+        column = min(tile_index // 256, self.num_columns - 1)
+        return self.get_atlas().tiles[column * 256 + tile_index % 256]
 
-        column = tile_index // 256
-        row = tile_index % 256
-
-        if column >= self.num_columns:
-            column = self.num_columns - 1
-        if row > 255:
-            row = 255
+    def build_tiles(self):
+        """
+        Crop every glyph the font sheet holds, followed by a fully
+        transparent background tile.
+        """
+        tiles = GlyphAtlas.crop_glyphs(
+            np.asarray(self.font_image), self.num_columns, self.tile_width, self.tile_height
+        )
+        return GlyphAtlas.pack_tiles(tiles, (0, 0, 0, 0))
 
-        left = int(column * self.tile_width)
-        upper = int(row * self.tile_height)
-        right = int(left + self.tile_width)
-        lower = int(upper + self.tile_height)
+    def build_output_tiles(self):
+        """build_tiles(), resampled to the output tile size when target_height is set."""
+        tiles = self.build_tiles()
+        if self.target_height:
+            tiles = GlyphAtlas.resize_tiles(tiles, int(self.TILE_WIDTH), int(self.TILE_HEIGHT))
+        return tiles
 
-        if right > self.font_image.width or lower > self.font_image.height:
-            tile = Image.new('RGBA', (int(self.tile_width), int(self.tile_height)), (0, 0, 0, 0))
+    def build_atlas(self):
+        """
+        Pack the glyph tiles into a GlyphAtlas, loading them from the atlas
+        cache when this font was prepared before.
+        """
+        if self.atlas_cache:
+            cache_dir = default_cache_dir() if self.atlas_cache is True else self.atlas_cache
+            key = {
+                "mode": "rgba",
+                "tile_pitch": (self.tile_width, self.tile_height),
+                "num_columns": self.num_columns,
+            }
+            if self.target_height:
+                key["output_pitch"] = (self.TILE_WIDTH, self.TILE_HEIGHT)
+            tiles = load_cached_tiles(self.font_image_path, key, self.build_output_tiles, cache_dir)
         else:
-            tile = self.font_image.crop((left, upper, right, lower))
+            tiles = self.build_output_tiles()
 
-        tile_array = np.array(tile)
-        self.tile_cache[tile_index] = tile_array
-        return tile_array
+        return GlyphAtlas(
+            tiles,
+            self.num_columns,
+            self.TILE_WIDTH,
+            self.TILE_HEIGHT,
+            self.osd_reader.header["config"]["charWidth"],
+            self.osd_reader.header["config"]["charHeight"],
+            background=(0, 0, 0, 0),
+        )
+
+    def get_atlas(self):
+        if self.atlas is None:
+            self.atlas = self.build_atlas()
+        return self.atlas
 
     def render_frame_with_alpha(self, frame_content):
         """
-        Render a frame with an alpha channel by placing tiles onto an RGBA array.
-        """
-        char_width = self.osd_reader.header["config"]["charWidth"]
-        char_height = self.osd_reader.header["config"]["charHeight"]
-        frame = np.zeros((self.RESOLUTION[1], self.RESOLUTION[0], 4), dtype=np.uint8)
-
-        for i in range(char_height):
-            for j in range(char_width):
-                idx = i * char_width + j
-                if idx < len(frame_content):
-                    tile_index = frame_content[idx]
-                    tile = self.get_tile_with_alpha(tile_index)
-
-                    x = int(j * self.TILE_WIDTH)
-                    y = int(i * self.TILE_HEIGHT)
-                    tile_h, tile_w = tile.shape[:2]
-                    frame[y:y + tile_h, x:x + tile_w, :] = tile
-
-        return frame
-
-    def create_video(self, output_path, progress_callback=None):
-        ffmpeg_path = resource_path(r"ffmpeg\bin\ffmpeg.exe")
-        ffmpeg_command = [
-            ffmpeg_path,
-            "-y",
-            "-f", "rawvideo",
-            "-vcodec", "rawvideo",
-            "-pix_fmt", "rgba",
-            "-s", f"{self.RESOLUTION[0]}x{self.RESOLUTION[1]}",
-            "-r", str(self.fps),
-            "-i", "-",
-            "-c:v", "qtrle",
-            "-pix_fmt", "rgba",
-            output_path
-        ]
-
-        process = subprocess.Popen(ffmpeg_command, stdin=subprocess.PIPE)
-        blocks = self.osd_reader.frame_data.to_dict(orient="records")
-
-        start_time = blocks[0]['timestamp']
-        end_time = blocks[-1]['timestamp']
-        num_frames = int((end_time - start_time) * self.fps) + 1
+        Render a frame with an alpha channel by gathering tiles from the
+        glyph atlas into an RGBA array.
+        """
+        return self.get_atlas().render(frame_content)
+
+    def get_settings(self):
+        """Constructor arguments (besides osd_reader) for an equivalent single-process maker."""
+        return {
+            "font_image_path": self.font_image_path,
+            "fps": self.fps,
+            "incremental": self.incremental,
+            "atlas_cache": self.atlas_cache,
+            "profile": self.profile,
+            "codec": self.codec,
+            "encoder_threads": self.encoder_threads,
+            "ffmpeg_path": self.ffmpeg_path,
+            "vfr": self.vfr,
+            "target_height": self.target_height,
+            "resumable": self.resumable,
+            "image_format": self.image_format,
+            "image_compression": self.image_compression,
+            "link_repeats": self.link_repeats,
+        }
+
+    def create_video(self, output_path, progress_callback=None, start_time=None, end_time=None,
+                     start_frame=None, end_frame=None, cancel_event=None):
+        """
+        Render the recording, or only a clip of it: start_time/end_time in
+        seconds from the start of the recording, or start_frame/end_frame as
+        output frame numbers. Setting 'cancel_event' (a threading.Event)
+        stops the render with RenderCancelled.
+        """
+        start_frame, end_frame = self.osd_reader.get_output_frame_range(
+            self.fps, start_time, end_time, start_frame, end_frame
+        )
+        num_frames = end_frame - start_frame
         self.total_frames = num_frames
+        if self.image_format is None:
+            check_container(self.codec, output_path)
 
-        print(f"Total frames to render: {num_frames}")
+        if (self.workers > 1 or self.resumable) and self.image_format is not None:
+            # The writer threads already encode in parallel
+            print("Image sequences render in a single process, without checkpoints")
+        elif (self.workers > 1 or self.resumable) and self.vfr:
+            # Segments are joined by frame count, which VFR output doesn't have
+            print("Variable frame rate renders in a single process, without checkpoints")
+        elif self.workers > 1 or self.resumable:
+            if self.atlas_cache:
+                self.get_atlas()  # fill the cache once so every worker just maps it
+            # Segments are joined by stream copy; with a lossless codec the
+            # result matches a single-process render
+            schedule = self.osd_reader.get_render_schedule(self.fps, start_frame, end_frame)
+            if self.resumable:
+                render_checkpointed(self, output_path, schedule, find_ffmpeg(self.ffmpeg_path),
+                                    self.workers, progress_callback, cancel_event)
+            else:
+                render_parallel(self, output_path, schedule, find_ffmpeg(self.ffmpeg_path),
+                                self.workers, progress_callback, cancel_event)
+            print(f"Video created successfully at {output_path}")
+            return
+
+        render = self.render_frames if self.image_format is None else self.render_image_sequence
+        if self.profile:
+            with profiled(os.path.splitext(output_path)[0] + ".prof"):
+                render(output_path, start_frame, end_frame, progress_callback, cancel_event)
+        else:
+            render(output_path, start_frame, end_frame, progress_callback, cancel_event)
+
+    def render_image_sequence(self, output_dir, start_frame, end_frame, progress_callback=None,
+                              cancel_event=None):
+        """
+        Render output frames start_frame..end_frame-1 as a numbered image
+        sequence in output_dir. Each run is drawn and encoded once; the
+        frames repeating it are hardlinks to its image, or only listed in
+        the index file (see ImageSequenceWriter).
+        """
+        num_frames = end_frame - start_frame
+        schedule = self.osd_reader.get_render_schedule(self.fps, start_frame, end_frame)
+        self.schedule = schedule
+        print(f"Total frames to render: {num_frames} ({schedule.num_runs} unique)")
 
-        current_block_index = 0
-        for frame_num in range(num_frames):
-            current_time = start_time + frame_num / self.fps
+        stats = RenderStats()
+        self.render_stats = stats
+        report_progress = progress_reporter(progress_callback, stats)
+        renderer = IncrementalRenderer(self.get_atlas()) if self.incremental else None
+        writer = ImageSequenceWriter(output_dir, self.fps, self.image_format, self.image_compression,
+                                     threads=self.encoder_threads, link_repeats=self.link_repeats)
+        self.repeated_frames = schedule.repeated_frames
+        complete = False
+        try:
+            runs = stats.timed_iter(self.osd_reader.iter_scheduled_blocks(schedule), "block_lookup")
+            for _, first_frame, run_length, frame_grid in runs:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RenderCancelled("Rendering cancelled")
+                frame_content = frame_grid.reshape(-1)
+                with stats.timed("render"):
+                    if renderer is not None:
+                        frame = renderer.render(frame_content)
+                    else:
+                        frame = self.get_atlas().render(frame_content)
+                stats.frames_rendered += 1
+                # Waits here while the writer threads are behind
+                with stats.timed("submit_wait"):
+                    writer.write(frame, first_frame - start_frame, run_length)
+                stats.frames_written += run_length
 
-            while (
-                current_block_index + 1 < len(blocks)
-                and current_time >= blocks[current_block_index + 1]['timestamp']
-            ):
-                current_block_index += 1
+                first_frame -= start_frame
+                for frame_num in range(first_frame, first_frame + run_length):
+                    if frame_num % 100 == 0:
+                        print(f"Processed {frame_num + 1}/{num_frames} frames")
+                    if report_progress:
+                        percentage = (frame_num + 1) / num_frames * 100
+                        report_progress(percentage, frame_num)
+            complete = True
+        finally:
+            # A cancelled or failed sequence gets no index, so it isn't taken for a finished one
+            try:
+                writer.close(complete)
+            finally:
+                stats.stop()
+        self.encoder_stats = writer.stats()
+        stats.bytes_written = self.encoder_stats["output_bytes"]
+        print(writer.report())
+        print(f"Rendered {num_frames - self.repeated_frames} unique frames, "
+              f"repeated {self.repeated_frames} of {num_frames}")
+        if renderer is not None:
+            self.dirty_cell_ratio = renderer.dirty_ratio()
+            print(f"Average dirty-cell ratio: {self.dirty_cell_ratio:.1%}")
+        print(stats.report())
+        print(f"Image sequence created successfully in {output_dir}")
 
-            if frame_num % 100 == 0:
-                print(f"Processed {frame_num + 1}/{num_frames} frames")
+    def render_frames(self, output_path, start_frame, end_frame, progress_callback=None, cancel_event=None):
+        """
+        Render output frames start_frame..end_frame-1 into one video file.
+        cancel_event is checked before each OSD frame is drawn.
+        """
+        encoder = FfmpegEncoder(
+            output_path,
+            self.RESOLUTION[0],
+            self.RESOLUTION[1],
+            self.fps,
+            codec=self.codec,
+            threads=self.encoder_threads,
+            ffmpeg_path=self.ffmpeg_path,
+            vfr=self.vfr
+        )
+        num_frames = end_frame - start_frame
 
-            frame_content = blocks[current_block_index]['frameContent']
-            frame = self.render_frame_with_alpha(frame_content)
-            process.stdin.write(frame.tobytes())
+        schedule = self.osd_reader.get_render_schedule(self.fps, start_frame, end_frame)
+        self.schedule = schedule
+        print(f"Total frames to render: {num_frames} ({schedule.num_runs} unique)")
 
-            if progress_callback:
-                percentage = (frame_num + 1) / num_frames * 100
-                progress_callback(percentage, frame_num)
+        # The schedule maps every output frame to an OSD block up front. Each
+        # run of frames showing the same block is rendered once and the same
+        # buffer is written for the rest of the run; blocks are streamed from
+        # the file as the runs reach them. A background thread feeds ffmpeg
+        # while the next block is rendered. With vfr each change of the
+        # glyph grid is written once, at the time its run starts, and runs
+        # that show the same grid as the one before are skipped.
+        stats = RenderStats()
+        self.render_stats = stats
+        report_progress = progress_reporter(progress_callback, stats)
+        renderer = IncrementalRenderer(self.get_atlas()) if self.incremental else None
+        writer = FrameWriter(
+            encoder.write,
+            (self.RESOLUTION[1], self.RESOLUTION[0], 4),
+            stats=stats
+        )
+        last_buffer = None
+        last_grid = None
+        # VFR timestamps are seconds from the start of the clip
+        run_times = schedule.run_times - start_frame / self.fps
+        self.repeated_frames = schedule.repeated_frames
+        # High-water mark once everything is allocated; it should not grow while rendering
+        setup_peak_memory = peak_memory_bytes()
+        try:
+            runs = stats.timed_iter(self.osd_reader.iter_scheduled_blocks(schedule), "block_lookup")
+            for run, (_, first_frame, run_length, frame_grid) in enumerate(runs):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RenderCancelled("Rendering cancelled")
+                if not (self.vfr and last_grid is not None and np.array_equal(frame_grid, last_grid)):
+                    frame_content = frame_grid.reshape(-1)
+                    buffer = writer.acquire()
+                    with stats.timed("render"):
+                        if renderer is not None:
+                            renderer.render(frame_content, out=buffer)
+                        else:
+                            self.get_atlas().render(frame_content, out=buffer)
+                    stats.frames_rendered += 1
+                    if last_buffer is not None:
+                        writer.release(last_buffer)
+                    last_buffer = buffer
+                    if self.vfr:
+                        last_grid = frame_grid.copy()
+                        last_change = run_times[run]
+                        writer.submit(buffer, last_change)
 
-        process.stdin.close()
-        process.wait()
+                first_frame -= start_frame
+                for frame_num in range(first_frame, first_frame + run_length):
+                    if frame_num % 100 == 0:
+                        print(f"Processed {frame_num + 1}/{num_frames} frames")
+                    if not self.vfr:
+                        writer.submit(buffer)
+                    if report_progress:
+                        percentage = (frame_num + 1) / num_frames * 100
+                        report_progress(percentage, frame_num)
+            if self.vfr and last_buffer is not None:
+                # Close with the last screen at the last output frame, so the
+                # video lasts as long as a constant-fps render of the clip
+                last_time = (num_frames - 1) / self.fps
+                if last_time > last_change:
+                    writer.submit(last_buffer, last_time)
+        finally:
+            # A writer error must not leave ffmpeg running
+            try:
+                writer.close()
+            finally:
+                encoder.close()
+                stats.stop()
+        self.encoder_stats = encoder.stats()
+        print(encoder.report())
+        if self.vfr:
+            print(f"Wrote {stats.frames_written} frames for {num_frames} at {self.fps} fps")
+        else:
+            print(f"Rendered {num_frames - self.repeated_frames} unique frames, "
+                  f"repeated {self.repeated_frames} of {num_frames}")
+        self.memory_stats = writer.memory_stats()
+        self.memory_stats["setup_peak_memory_bytes"] = setup_peak_memory
+        if self.memory_stats["peak_memory_bytes"] is not None:
+            print(f"Peak memory: {setup_peak_memory / 2**20:.0f} MB after setup, "
+                  f"{self.memory_stats['peak_memory_bytes'] / 2**20:.0f} MB at the end "
+                  f"({self.memory_stats['peak_buffers_in_use']} of {self.memory_stats['num_buffers']} "
+                  f"frame buffers of {self.memory_stats['buffer_bytes'] / 2**20:.1f} MB used)")
+        if renderer is not None:
+            self.dirty_cell_ratio = renderer.dirty_ratio()
+            print(f"Average dirty-cell ratio: {self.dirty_cell_ratio:.1%}")
+        print(stats.report())
         print(f"Video created successfully at {output_path}")
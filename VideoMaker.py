@@ -1,30 +1,59 @@
+import os
 import cv2
 import numpy as np
 import pandas as pd
 from PIL import Image
 
+from FramePipeline import FrameWriter, peak_memory_bytes
+from AtlasCache import default_cache_dir, load_cached_tiles
+from GlyphAtlas import GlyphAtlas, IncrementalRenderer
+from ParallelRender import render_parallel, render_checkpointed
+from RenderCheckpoint import RenderCancelled
+from RenderStats import RenderStats, progress_reporter, profiled
+from EncoderBackend import find_ffmpeg
+
+# Font sheet rows blended at a time by VideoMaker.preblend()
+PREBLEND_ROWS = 64
+
 class VideoMaker:
-    def __init__(self, osd_reader, font_image_path, chroma_key_hex="FF00FF", fps=60.0):
+    def __init__(self, osd_reader, font_image_path, chroma_key_hex="FF00FF", fps=60.0, incremental=True,
+                 workers=1, atlas_cache=True, profile=False, target_height=None, resumable=False):
         """
         Removed any references to a hex grid.
         'osd_reader' provides the 'frame_data', 'font_image_path' is the tile set.
+        'incremental' redraws only the cells that changed between OSD frames.
+        'workers' > 1 renders time segments in that many processes.
+        'atlas_cache' keeps the blended tiles on disk between runs: True uses
+        default_cache_dir(), a path uses that folder, False disables it.
+        'profile' runs the render under cProfile and saves <output>.prof.
+        'target_height' renders at that output height (e.g. 1080 for editing
+        proxies) by resampling the glyphs once; None keeps the font's size.
+        'resumable' renders in checkpointed segments (see RenderCheckpoint),
+        so a crashed or cancelled render continues where it stopped.
         """
         self.osd_reader = osd_reader
         self.font_image_path = font_image_path
         self.chroma_key_hex = chroma_key_hex
         self.fps = fps
-
-        # Load font image
-        self.font_image = self.load_font_image()
-        self.tile_cache = {}
+        self.incremental = incremental
+        self.workers = workers
+        self.atlas_cache = atlas_cache
+        self.profile = profile
+        self.target_height = target_height
+        self.resumable = resumable
+
+        # Only the font size is read here; the pixels are loaded if the atlas isn't cached
+        self._font_image = None
+        self.font_width, self.font_height = self.read_font_size()
+        self.atlas = None  # GlyphAtlas, built on first render
 
         # We assume 256 rows, with tile_width:tile_height = 1:1.5
         self.num_rows = 256
-        self.tile_height = self.font_image.height / self.num_rows
+        self.tile_height = self.font_height / self.num_rows
         self.tile_width = self.tile_height / 1.5  # ratio 1:1.5
 
         # Detect how many columns the font_image can hold
-        self.num_columns = int(self.font_image.width // self.tile_width)
+        self.num_columns = int(self.font_width // self.tile_width)
         if self.num_columns < 1:
             self.num_columns = 1
         elif self.num_columns > 4:
@@ -34,6 +63,19 @@ class VideoMaker:
         self.TILE_WIDTH, self.TILE_HEIGHT, self.RESOLUTION = self.compute_tile_and_resolution()
         self.chroma_key_rgb = self.hex_to_rgb(self.chroma_key_hex)
 
+    @property
+    def font_image(self):
+        if self._font_image is None:
+            self._font_image = self.load_font_image()
+        return self._font_image
+
+    def read_font_size(self):
+        try:
+            with Image.open(self.font_image_path) as image:
+                return image.size
+        except Exception as e:
+            raise ValueError(f"Failed to load font image: {e}")
+
     def load_font_image(self):
         try:
             return Image.open(self.font_image_path).convert('RGBA')
@@ -45,6 +87,10 @@ class VideoMaker:
         tile_h = self.tile_height
         grid_width = self.osd_reader.header['config']['charWidth']
         grid_height = self.osd_reader.header['config']['charHeight']
+        if self.target_height:
+            # Same 1:1.5 ratio, scaled so the grid is target_height pixels high
+            tile_h = self.target_height / grid_height
+            tile_w = tile_h * self.tile_width / self.tile_height
         resolution = (
             int(grid_width * tile_w),
             int(grid_height * tile_h)
@@ -58,85 +104,152 @@ class VideoMaker:
     def get_preblended_tile(self, tile_index):
         """
         Convert tile_index => column,row. If out of range, clamp.
-        Then blend the tile onto a chroma key background and return BGR.
+        Returns the tile blended onto the chroma key background as BGR.
         """
-        if tile_index in self.tile_cache:
-            return self.tile_cache[tile_index]
-
-        column = tile_index // 256
-        row = tile_index % 256
-
-        if column >= self.num_columns:
-            column = self.num_columns - 1
-        if row > 255:
-            row = 255
+        column = min(tile_index // 256, self.num_columns - 1)
+        return self.get_atlas().tiles[column * 256 + tile_index % 256]
 
-        left = int(column * self.tile_width)
-        upper = int(row * self.tile_height)
-        right = int(left + self.tile_width)
-        lower = int(upper + self.tile_height)
+    def preblend(self, rgba):
+        """
+        Blend RGBA pixels onto the chroma key colour and return them as BGR,
+        in integer math with rounding: (a * c + (255 - a) * key + 127) // 255.
+        The largest intermediate, 255 * 255 + 127, fits in uint16. Works in
+        bands of rows so the temporaries stay in the CPU cache.
+        """
+        key = np.array(self.chroma_key_rgb[::-1], dtype=np.uint16)  # BGR
+        blended = np.empty(rgba.shape[:-1] + (3,), dtype=np.uint8)
+        for top in range(0, rgba.shape[0], PREBLEND_ROWS):
+            band = rgba[top:top + PREBLEND_ROWS]
+            alpha = band[..., 3:].astype(np.uint16)
+            band_sum = alpha * band[..., 2::-1]  # RGB -> BGR
+            band_sum += (255 - alpha) * key
+            band_sum += 127
+            band_sum //= 255
+            blended[top:top + PREBLEND_ROWS] = band_sum
+        return blended
+
+    def build_tiles(self):
+        """
+        Pre-blend the whole font sheet in one pass and cut it into glyphs,
+        followed by a BGR background tile filled with self.chroma_key_rgb.
+        """
+        background = self.chroma_key_rgb[::-1]
+        glyphs = GlyphAtlas.crop_glyphs(
+            self.preblend(np.asarray(self.font_image)), self.num_columns, self.tile_width, self.tile_height,
+            fill=background
+        )
+        return GlyphAtlas.pack_tiles(glyphs, background)
 
-        if right > self.font_image.width or lower > self.font_image.height:
-            tile = Image.new('RGBA', (int(self.tile_width), int(self.tile_height)), (0, 0, 0, 0))
-        else:
-            tile = self.font_image.crop((left, upper, right, lower))
+    def build_output_tiles(self):
+        """build_tiles(), resampled to the output tile size when target_height is set."""
+        tiles = self.build_tiles()
+        if self.target_height:
+            tiles = GlyphAtlas.resize_tiles(tiles, int(self.TILE_WIDTH), int(self.TILE_HEIGHT))
+        return tiles
 
-        tile_array = np.array(tile)  # RGBA
-        if tile_array.shape[2] == 4:
-            alpha_channel = tile_array[:, :, 3] / 255.0
-            rgb_tile = tile_array[:, :, :3]
+    def build_atlas(self):
+        """
+        Pack the pre-blended tiles into a GlyphAtlas, loading them from the
+        atlas cache when this font and chroma key were prepared before.
+        """
+        if self.atlas_cache:
+            cache_dir = default_cache_dir() if self.atlas_cache is True else self.atlas_cache
+            key = {
+                "mode": "bgr",
+                "chroma_key": self.chroma_key_rgb,
+                "tile_pitch": (self.tile_width, self.tile_height),
+                "num_columns": self.num_columns,
+            }
+            if self.target_height:
+                key["output_pitch"] = (self.TILE_WIDTH, self.TILE_HEIGHT)
+            tiles = load_cached_tiles(self.font_image_path, key, self.build_output_tiles, cache_dir)
         else:
-            alpha_channel = np.ones((tile_array.shape[0], tile_array.shape[1]))
-            rgb_tile = tile_array
-
-        # Create a background filled with the chroma key color (in RGB)
-        blended_tile = np.full(
-            (tile_array.shape[0], tile_array.shape[1], 3),
-            self.chroma_key_rgb[::-1],  # reversed for BGR usage
-            dtype=np.uint8
+            tiles = self.build_output_tiles()
+
+        return GlyphAtlas(
+            tiles,
+            self.num_columns,
+            self.TILE_WIDTH,
+            self.TILE_HEIGHT,
+            self.osd_reader.header["config"]["charWidth"],
+            self.osd_reader.header["config"]["charHeight"],
+            background=self.chroma_key_rgb[::-1],  # BGR
         )
 
-        # Blend
-        for c in range(3):
-            blended_tile[:, :, c] = (
-                alpha_channel * rgb_tile[:, :, c]
-                + (1 - alpha_channel) * blended_tile[:, :, c]
-            ).astype(np.uint8)
-
-        # Convert from RGB to BGR
-        blended_tile_bgr = cv2.cvtColor(blended_tile.astype('uint8'), cv2.COLOR_RGB2BGR)
-        self.tile_cache[tile_index] = blended_tile_bgr
-        return blended_tile_bgr
+    def get_atlas(self):
+        if self.atlas is None:
+            self.atlas = self.build_atlas()
+        return self.atlas
 
     def render_frame(self, frame_content):
         """
-        Render a single frame by placing pre-blended tiles on a BGR background
-        filled with self.chroma_key_rgb.
+        Render a single frame by gathering pre-blended tiles from the glyph
+        atlas onto a BGR background filled with self.chroma_key_rgb.
         """
-        char_width = self.osd_reader.header["config"]["charWidth"]
-        char_height = self.osd_reader.header["config"]["charHeight"]
-
-        frame = np.full(
-            (self.RESOLUTION[1], self.RESOLUTION[0], 3),
-            self.chroma_key_rgb[::-1],  # BGR
-            dtype=np.uint8
+        return self.get_atlas().render(frame_content)
+
+    def get_settings(self):
+        """Constructor arguments (besides osd_reader) for an equivalent single-process maker."""
+        return {
+            "font_image_path": self.font_image_path,
+            "chroma_key_hex": self.chroma_key_hex,
+            "fps": self.fps,
+            "incremental": self.incremental,
+            "atlas_cache": self.atlas_cache,
+            "profile": self.profile,
+            "target_height": self.target_height,
+            "resumable": self.resumable,
+        }
+
+    def create_video(self, output_path, progress_callback=None, start_time=None, end_time=None,
+                     start_frame=None, end_frame=None, cancel_event=None):
+        """
+        Render the recording, or only a clip of it: start_time/end_time in
+        seconds from the start of the recording, or start_frame/end_frame as
+        output frame numbers. Setting 'cancel_event' (a threading.Event)
+        stops the render with RenderCancelled.
+        """
+        start_frame, end_frame = self.osd_reader.get_output_frame_range(
+            self.fps, start_time, end_time, start_frame, end_frame
         )
+        num_frames = end_frame - start_frame
+        self.total_frames = num_frames
 
-        for i in range(char_height):
-            for j in range(char_width):
-                idx = i * char_width + j
-                if idx < len(frame_content):
-                    tile_index = frame_content[idx]
-                    tile_bgr = self.get_preblended_tile(tile_index)
-
-                    x = int(j * self.TILE_WIDTH)
-                    y = int(i * self.TILE_HEIGHT)
-                    th, tw = tile_bgr.shape[:2]
-                    frame[y:y + th, x:x + tw] = tile_bgr
+        ffmpeg_path = None
+        if self.workers > 1 or self.resumable:
+            try:
+                ffmpeg_path = find_ffmpeg()
+            except FileNotFoundError:
+                if self.workers > 1:
+                    raise
+                # Only joining checkpoints needs ffmpeg; OpenCV alone writes a single pass
+                print("ffmpeg not found, rendering in one pass without checkpoints")
+
+        if ffmpeg_path is not None:
+            if self.atlas_cache:
+                self.get_atlas()  # fill the cache once so every worker just maps it
+            # mp4v segments are joined by stream copy, so frames are not re-encoded
+            schedule = self.osd_reader.get_render_schedule(self.fps, start_frame, end_frame)
+            if self.resumable:
+                render_checkpointed(self, output_path, schedule, ffmpeg_path, self.workers,
+                                    progress_callback, cancel_event)
+            else:
+                render_parallel(self, output_path, schedule, ffmpeg_path, self.workers,
+                                progress_callback, cancel_event)
+            print(f"Video created successfully at {output_path}")
+            return
 
-        return frame
+        if self.profile:
+            with profiled(os.path.splitext(output_path)[0] + ".prof"):
+                self.render_frames(output_path, start_frame, end_frame, progress_callback, cancel_event)
+        else:
+            self.render_frames(output_path, start_frame, end_frame, progress_callback, cancel_event)
 
-    def create_video(self, output_path, progress_callback=None):
+    def render_frames(self, output_path, start_frame, end_frame, progress_callback=None, cancel_event=None):
+        """
+        Render output frames start_frame..end_frame-1 into one video file.
+        cancel_event is checked before each OSD frame is drawn.
+        """
         print("Initializing VideoWriter...")
         video = cv2.VideoWriter(
             output_path,
@@ -146,37 +259,70 @@ class VideoMaker:
         )
 
         if not video.isOpened():
-            print("Error: Could not open VideoWriter.")
-            return
-
-        blocks = self.osd_reader.frame_data.to_dict(orient="records")
-        start_time = blocks[0]['timestamp']
-        end_time = blocks[-1]['timestamp']
-        num_frames = int((end_time - start_time) * self.fps) + 1
-        self.total_frames = num_frames
-
-        print(f"Total frames to render: {num_frames}")
-
-        current_block_index = 0
-        for frame_num in range(num_frames):
-            current_time = start_time + frame_num / self.fps
-
-            if frame_num % 100 == 0:
-                print(f"Processed {frame_num + 1}/{num_frames} frames")
-
-            while (
-                current_block_index + 1 < len(blocks)
-                and current_time >= blocks[current_block_index + 1]['timestamp']
-            ):
-                current_block_index += 1
-
-            frame_content = blocks[current_block_index]['frameContent']
-            frame_bgr = self.render_frame(frame_content)
-            video.write(frame_bgr)
-
-            if progress_callback:
-                percentage = (frame_num + 1) / num_frames * 100
-                progress_callback(percentage, frame_num)
-
-        video.release()
+            raise RuntimeError(f"Could not open a video writer for {output_path}")
+
+        num_frames = end_frame - start_frame
+
+        schedule = self.osd_reader.get_render_schedule(self.fps, start_frame, end_frame)
+        self.schedule = schedule
+        print(f"Total frames to render: {num_frames} ({schedule.num_runs} unique)")
+
+        # The schedule maps every output frame to an OSD block up front. Each
+        # run of frames showing the same block is rendered once and the same
+        # image is written for the rest of the run; blocks are streamed from
+        # the file as the runs reach them. A background thread encodes
+        # while the next block is rendered.
+        stats = RenderStats()
+        self.render_stats = stats
+        report_progress = progress_reporter(progress_callback, stats)
+        renderer = IncrementalRenderer(self.get_atlas()) if self.incremental else None
+        writer = FrameWriter(video.write, (self.RESOLUTION[1], self.RESOLUTION[0], 3), stats=stats)
+        last_buffer = None
+        self.repeated_frames = schedule.repeated_frames
+        # High-water mark once everything is allocated; it should not grow while rendering
+        setup_peak_memory = peak_memory_bytes()
+        try:
+            runs = stats.timed_iter(self.osd_reader.iter_scheduled_blocks(schedule), "block_lookup")
+            for _, first_frame, run_length, frame_grid in runs:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RenderCancelled("Rendering cancelled")
+                frame_content = frame_grid.reshape(-1)
+                buffer = writer.acquire()
+                with stats.timed("render"):
+                    if renderer is not None:
+                        renderer.render(frame_content, out=buffer)
+                    else:
+                        self.get_atlas().render(frame_content, out=buffer)
+                stats.frames_rendered += 1
+                if last_buffer is not None:
+                    writer.release(last_buffer)
+                last_buffer = buffer
+
+                first_frame -= start_frame
+                for frame_num in range(first_frame, first_frame + run_length):
+                    if frame_num % 100 == 0:
+                        print(f"Processed {frame_num + 1}/{num_frames} frames")
+                    writer.submit(buffer)
+                    if report_progress:
+                        percentage = (frame_num + 1) / num_frames * 100
+                        report_progress(percentage, frame_num)
+        finally:
+            try:
+                writer.close()
+            finally:
+                video.release()
+                stats.stop()
+        print(f"Rendered {num_frames - self.repeated_frames} unique frames, "
+              f"repeated {self.repeated_frames} of {num_frames}")
+        self.memory_stats = writer.memory_stats()
+        self.memory_stats["setup_peak_memory_bytes"] = setup_peak_memory
+        if self.memory_stats["peak_memory_bytes"] is not None:
+            print(f"Peak memory: {setup_peak_memory / 2**20:.0f} MB after setup, "
+                  f"{self.memory_stats['peak_memory_bytes'] / 2**20:.0f} MB at the end "
+                  f"({self.memory_stats['peak_buffers_in_use']} of {self.memory_stats['num_buffers']} "
+                  f"frame buffers of {self.memory_stats['buffer_bytes'] / 2**20:.1f} MB used)")
+        if renderer is not None:
+            self.dirty_cell_ratio = renderer.dirty_ratio()
+            print(f"Average dirty-cell ratio: {self.dirty_cell_ratio:.1%}")
+        print(stats.report())
         print(f"Video created successfully at {output_path}")
@@ -0,0 +1,95 @@
+"""
+Transparent codec comparison: renders the same synthetic flight with
+TransparentVideoMaker once per codec in EncoderBackend.CODECS and prints
+encode speed and file size, as a Markdown table for the README.
+
+    python benchmarks/bench_encoders.py [--seconds 10] [--osd flight.osd] [--threads 0 4] [--output results.json]
+
+Frames come from the real render pipeline (incremental rendering, repeated
+frames), so the numbers include everything create_video() does; rendering
+itself is a small share next to encoding. The synthetic recording fills
+every cell with random glyphs, a worst case for every codec; pass --osd to
+measure the first --seconds of a real flight instead.
+"""
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from OsdFileReader import OsdFileReader
+from TransparentVideoMaker import TransparentVideoMaker
+from EncoderBackend import CODECS, find_ffmpeg
+from synthetic_osd import write_djo3
+from bench_render import environment, without_stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10, help="length of the synthetic recording")
+    parser.add_argument("--osd", help="real recording to encode instead of the synthetic one")
+    parser.add_argument("--font", default="fonts/WS_BFx4_Nexus_Moonlight_1440p.png")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS), choices=list(CODECS))
+    parser.add_argument("--threads", nargs="+", type=int, default=[0], help="encoder thread counts to try")
+    parser.add_argument("--vfr", action="store_true", help="variable frame rate: one frame per OSD change")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    font_path = args.font if os.path.isabs(args.font) else os.path.join(root, args.font)
+    ffmpeg_path = find_ffmpeg()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.osd:
+            osd_path = args.osd
+        else:
+            osd_path = os.path.join(work_dir, "synthetic.osd")
+            write_djo3(osd_path, int(args.seconds * 10))
+        with contextlib.redirect_stdout(io.StringIO()):
+            reader = OsdFileReader(osd_path)
+
+        print("| codec | threads | encode fps | MB | MB per minute |")
+        print("|---|---|---|---|---|")
+        for codec in args.codecs:
+            for threads in args.threads:
+                output_path = os.path.join(work_dir, "out" + CODECS[codec].extension)
+                maker = TransparentVideoMaker(reader, font_path, fps=args.fps, codec=codec,
+                                              encoder_threads=threads, ffmpeg_path=ffmpeg_path, vfr=args.vfr)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    without_stderr(lambda: maker.create_video(output_path, end_time=args.seconds))
+                elapsed = time.perf_counter() - start
+
+                size = os.path.getsize(output_path)
+                frames = maker.render_stats.frames_written
+                minutes = maker.total_frames / args.fps / 60
+                result = {
+                    "codec": codec,
+                    "threads": threads,
+                    "frames": frames,
+                    "resolution": list(maker.RESOLUTION),
+                    "seconds": elapsed,
+                    "fps": frames / elapsed,
+                    "output_bytes": size,
+                    "encoder": maker.encoder_stats,
+                }
+                results.append(result)
+                print(f"| {codec} | {threads or 'auto'} | {result['fps']:.1f} | {size / 2**20:.1f} | "
+                      f"{size / 2**20 / minutes:.0f} |")
+                os.remove(output_path)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
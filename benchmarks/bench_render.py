@@ -0,0 +1,312 @@
+"""
+Rendering benchmark suite: times each stage of the pipeline separately on
+synthetic recordings and writes the results as JSON.
+
+    python benchmarks/bench_render.py [--frames N] [--changes N] [--output results.json]
+    python benchmarks/bench_render.py --compare old.json new.json
+
+Stages, each reported as seconds and frames per second:
+  parse         open a DJO3, MSPOSD v2 and v3 file and read every frame
+  atlas         build the glyph atlas from the font sheet (atlas cache off)
+  glyph_lookup  map frames to atlas tiles (GlyphAtlas.glyph_indices)
+  render        render_frame / render_frame_with_alpha, full redraw
+  incremental   the same frames with IncrementalRenderer
+  encode        write already rendered frames through the maker's encoder
+  end_to_end    create_video() on the first --video-seconds of the recording
+
+Rendering stages run for both makers and every --fonts sheet (by default
+the 1440p and 2160p Moonlight fonts). Each timing is the best of --repeat
+runs. Everything runs on the CPU. The transparent maker's stages that
+encode need ffmpeg (see EncoderBackend.find_ffmpeg()) and are skipped
+without it; --codec picks its output codec.
+"""
+import os
+import sys
+import io
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from OsdFileReader import OsdFileReader
+from VideoMaker import VideoMaker
+from TransparentVideoMaker import TransparentVideoMaker
+from EncoderBackend import CODECS, DEFAULT_CODEC, FfmpegEncoder, find_ffmpeg
+from GlyphAtlas import IncrementalRenderer
+from synthetic_osd import FORMATS, DEFAULT_COLS, DEFAULT_ROWS, write_synthetic
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_FONTS = ["fonts/WS_BFx4_Nexus_Moonlight_1440p.png", "fonts/WS_BFx4_Nexus_Moonlight_2160p.png"]
+RESULTS_VERSION = 1
+# Rendered frames kept in memory for the encode stage; 2160p RGBA frames are 33 MB each
+ENCODE_MEMORY_BYTES = 512 * 2**20
+
+
+def best_time(func, repeat):
+    """Best wall time of 'repeat' calls, and the last call's result."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def quiet(func):
+    """Run func with the tool's progress prints suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func()
+
+
+def without_stderr(func):
+    """Run func with file descriptor 2 sent to devnull, which also silences ffmpeg subprocesses."""
+    sys.stderr.flush()
+    saved = os.dup(2)
+    try:
+        with open(os.devnull, "w") as devnull:
+            os.dup2(devnull.fileno(), 2)
+            return func()
+    finally:
+        os.dup2(saved, 2)
+        os.close(saved)
+
+
+def environment():
+    """Machine and library versions, so results from different runs can be told apart."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def bench_parse(osd_paths, repeat):
+    results = []
+    for osd_format, path in osd_paths.items():
+        def parse():
+            reader = quiet(lambda: OsdFileReader(path))
+            for _ in reader.iter_blocks():
+                pass
+            return reader
+
+        seconds, reader = best_time(parse, repeat)
+        results.append({"stage": "parse", "format": osd_format, "frames": len(reader.frames), "seconds": seconds})
+    return results
+
+
+def make_encoder(maker, output_path, ffmpeg_path):
+    """(write_frame, close) for the encoder the maker renders into."""
+    if isinstance(maker, VideoMaker):
+        video = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), maker.fps, maker.RESOLUTION)
+        return video.write, video.release
+
+    width, height = maker.RESOLUTION
+    encoder = FfmpegEncoder(output_path, width, height, maker.fps, codec=maker.codec,
+                            threads=maker.encoder_threads, ffmpeg_path=ffmpeg_path)
+    return encoder.write, encoder.close
+
+
+def bench_maker(maker_class, font_path, osd_path, work_dir, args, ffmpeg_path):
+    reader = quiet(lambda: OsdFileReader(osd_path))
+    transparent = maker_class is TransparentVideoMaker
+    if transparent:
+        maker = maker_class(reader, font_path, fps=args.fps, atlas_cache=False, codec=args.codec,
+                            encoder_threads=args.encoder_threads, ffmpeg_path=ffmpeg_path)
+    else:
+        maker = maker_class(reader, font_path, fps=args.fps, atlas_cache=False)
+    _, grids = reader.frames.block(0, args.render_frames)
+    frames = grids.reshape(len(grids), -1)
+    label = {
+        "maker": maker_class.__name__,
+        "font": os.path.basename(font_path),
+        "resolution": list(maker.RESOLUTION),
+    }
+    results = []
+
+    def record(stage, frames_done, seconds, **extra):
+        results.append({"stage": stage, **label, "frames": frames_done, "seconds": seconds, **extra})
+
+    seconds, atlas = best_time(maker.build_atlas, args.repeat)
+    maker.atlas = atlas
+    record("atlas", 0, seconds, tiles=len(atlas.tiles))
+
+    seconds, _ = best_time(lambda: [atlas.glyph_indices(frame) for frame in frames], args.repeat)
+    record("glyph_lookup", len(frames), seconds)
+
+    render = maker.render_frame_with_alpha if transparent else maker.render_frame
+    seconds, _ = best_time(lambda: [render(frame) for frame in frames], args.repeat)
+    record("render", len(frames), seconds)
+
+    def render_incremental():
+        renderer = IncrementalRenderer(atlas)
+        out = atlas.new_frame()
+        for frame in frames:
+            renderer.render(frame, out=out)
+        return renderer
+    seconds, renderer = best_time(render_incremental, args.repeat)
+    record("incremental", len(frames), seconds, dirty_cell_ratio=renderer.dirty_ratio())
+
+    extension = CODECS[args.codec].extension if transparent else ".mp4"
+    if transparent and ffmpeg_path is None:
+        record("encode", 0, None, skipped="ffmpeg not found")
+        record("end_to_end", 0, None, skipped="ffmpeg not found")
+        return results
+
+    # Consecutive frames differ, so run-length tricks in the codec don't flatter it;
+    # at high resolutions a few rendered frames are cycled to bound memory
+    frame_bytes = maker.RESOLUTION[0] * maker.RESOLUTION[1] * atlas.channels
+    rendered = [render(frame) for frame in frames[:max(2, ENCODE_MEMORY_BYTES // frame_bytes)]]
+
+    def encode():
+        write_frame, close = make_encoder(maker, os.path.join(work_dir, "encode" + extension), ffmpeg_path)
+        try:
+            for i in range(len(frames)):
+                write_frame(rendered[i % len(rendered)])
+        finally:
+            close()
+    seconds, _ = best_time(lambda: without_stderr(encode), args.repeat)
+    record("encode", len(frames), seconds)
+
+    output_path = os.path.join(work_dir, "video" + extension)
+    seconds, _ = best_time(
+        lambda: without_stderr(lambda: quiet(lambda: maker.create_video(output_path, end_time=args.video_seconds))),
+        args.repeat
+    )
+    record("end_to_end", maker.total_frames, seconds, output_bytes=os.path.getsize(output_path))
+    return results
+
+
+def run_suite(args):
+    font_paths = [font if os.path.isabs(font) else os.path.join(ROOT, font) for font in args.fonts]
+    try:
+        ffmpeg_path = find_ffmpeg()
+    except FileNotFoundError:
+        ffmpeg_path = None
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        osd_paths = {}
+        for osd_format in FORMATS:
+            osd_paths[osd_format] = os.path.join(work_dir, f"{osd_format}.osd")
+            write_synthetic(osd_format, osd_paths[osd_format], args.frames, num_cols=args.cols, num_rows=args.rows,
+                            osd_rate=args.osd_rate, changes_per_frame=args.changes)
+        results += bench_parse(osd_paths, args.repeat)
+        for result in results:
+            print_result(result)
+
+        for font_path in font_paths:
+            for maker_class in (VideoMaker, TransparentVideoMaker):
+                for result in bench_maker(maker_class, font_path, osd_paths["djo3"], work_dir, args, ffmpeg_path):
+                    print_result(result)
+                    results.append(result)
+
+    for result in results:
+        if result["seconds"]:
+            result["fps"] = result["frames"] / result["seconds"]
+    return {
+        "version": RESULTS_VERSION,
+        "environment": environment(),
+        "config": {
+            "frames": args.frames,
+            "render_frames": args.render_frames,
+            "video_seconds": args.video_seconds,
+            "grid": [args.cols, args.rows],
+            "osd_rate": args.osd_rate,
+            "changes_per_frame": args.changes,
+            "fps": args.fps,
+            "repeat": args.repeat,
+            "fonts": [os.path.basename(font) for font in font_paths],
+            "codec": args.codec,
+            "encoder_threads": args.encoder_threads,
+            "ffmpeg": ffmpeg_path,
+        },
+        "results": results,
+    }
+
+
+def result_key(result):
+    """What a result measured, for matching results between runs."""
+    return (result["stage"], result.get("format") or result.get("maker"), result.get("font"))
+
+
+def describe(key):
+    return " ".join(part for part in key if part)
+
+
+def print_result(result):
+    if result["seconds"] is None:
+        print(f"{describe(result_key(result)):<70} skipped: {result.get('skipped')}")
+        return
+    rate = f"{result['frames'] / result['seconds']:10.1f} fps" if result["frames"] else ""
+    print(f"{describe(result_key(result)):<70} {result['seconds']:9.3f}s {rate}")
+
+
+def compare(old_path, new_path):
+    """Print the speedup of every stage between two result files (> 1 = new is faster)."""
+    with open(old_path) as f:
+        old = {result_key(result): result for result in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    print(f"{'stage':<70} {'old':>9} {'new':>9} {'speedup':>8}")
+    for result in new:
+        before = old.get(result_key(result))
+        if not before or not before["seconds"] or not result["seconds"]:
+            continue
+        # Compare per-frame time, in case the runs used different frame counts
+        old_time = before["seconds"] / max(before["frames"], 1)
+        new_time = result["seconds"] / max(result["frames"], 1)
+        print(f"{describe(result_key(result)):<70} {before['seconds']:8.3f}s {result['seconds']:8.3f}s "
+              f"{old_time / new_time:7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=6000, help="OSD frames per synthetic recording")
+    parser.add_argument("--render-frames", type=int, default=300, help="frames for the per-frame render stages")
+    parser.add_argument("--video-seconds", type=float, default=10, help="length of the end-to-end render")
+    parser.add_argument("--cols", type=int, default=DEFAULT_COLS, help="grid columns")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="grid rows")
+    parser.add_argument("--osd-rate", type=float, default=10, help="OSD frames per second")
+    parser.add_argument("--changes", type=int, default=8, help="cells that change per OSD frame")
+    parser.add_argument("--fps", type=float, default=60.0, help="output frame rate")
+    parser.add_argument("--fonts", nargs="+", default=DEFAULT_FONTS, help="font sheets to render with")
+    parser.add_argument("--codec", choices=list(CODECS), default=DEFAULT_CODEC,
+                        help=f"transparent output codec (default: {DEFAULT_CODEC})")
+    parser.add_argument("--encoder-threads", type=int, default=0, help="ffmpeg encoder threads (0 = auto)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing; the best is kept")
+    parser.add_argument("--output", help="JSON results file (default: bench_render_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    suite = run_suite(args)
+    output_path = args.output or time.strftime("bench_render_%Y%m%d-%H%M%S.json")
+    with open(output_path, "w") as f:
+        json.dump(suite, f, indent=2)
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Image-sequence writer scaling: renders the same flight with
+TransparentVideoMaker as a PNG/WebP sequence once per format, compression
+level and writer thread count, and prints images encoded per second as a
+Markdown table.
+
+    python benchmarks/bench_sequence.py [--osd flight.osd] [--seconds 10] [--threads 1 2 4 8] [--output results.json]
+
+Frames come from the real render pipeline, so the numbers include
+rendering and the hardlinks for repeated frames; encoding is by far the
+largest share. Writer threads only help up to the number of CPU cores, as
+Pillow releases the GIL while it compresses.
+"""
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from OsdFileReader import OsdFileReader
+from TransparentVideoMaker import TransparentVideoMaker
+from ImageSequenceWriter import IMAGE_FORMATS
+from synthetic_osd import write_djo3
+from bench_render import environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10, help="length of the synthetic recording")
+    parser.add_argument("--osd", help="real recording to render instead of the synthetic one")
+    parser.add_argument("--font", default="fonts/WS_BFx4_Nexus_Moonlight_1440p.png")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--formats", nargs="+", default=list(IMAGE_FORMATS), choices=list(IMAGE_FORMATS))
+    parser.add_argument("--compression", nargs="+", type=int,
+                        help="compression levels to try (default: each format's default)")
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4, 8], help="writer thread counts to try")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    font_path = args.font if os.path.isabs(args.font) else os.path.join(root, args.font)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.osd:
+            osd_path = args.osd
+        else:
+            osd_path = os.path.join(work_dir, "synthetic.osd")
+            write_djo3(osd_path, int(args.seconds * 10))
+        with contextlib.redirect_stdout(io.StringIO()):
+            reader = OsdFileReader(osd_path)
+
+        print("| format | compression | threads | images/s | output fps | MB per minute |")
+        print("|---|---|---|---|---|---|")
+        for image_format in args.formats:
+            for compression in args.compression or [IMAGE_FORMATS[image_format].default_compression]:
+                for threads in args.threads:
+                    output_dir = os.path.join(work_dir, "sequence")
+                    maker = TransparentVideoMaker(reader, font_path, fps=args.fps, encoder_threads=threads,
+                                                  image_format=image_format, image_compression=compression)
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        maker.create_video(output_dir, end_time=args.seconds)
+                    elapsed = time.perf_counter() - start
+
+                    stats = maker.encoder_stats
+                    minutes = maker.total_frames / args.fps / 60
+                    result = {
+                        "format": image_format,
+                        "compression": compression,
+                        "threads": threads,
+                        "frames": stats["frames"],
+                        "images": stats["images"],
+                        "resolution": list(maker.RESOLUTION),
+                        "seconds": elapsed,
+                        "images_per_second": stats["images"] / elapsed,
+                        "fps": stats["frames"] / elapsed,
+                        "output_bytes": stats["output_bytes"],
+                        "writer": stats,
+                    }
+                    results.append(result)
+                    print(f"| {image_format} | {compression} | {threads} | {result['images_per_second']:.1f} | "
+                          f"{result['fps']:.1f} | {stats['output_bytes'] / 2**20 / minutes:.0f} |")
+                    shutil.rmtree(output_dir)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Telemetry extraction benchmark: OsdFileReader.parse() against the
+vectorized extract_telemetry().
+
+    python benchmarks/bench_telemetry.py [--frames N] [--osd FILE]
+
+Without --osd a synthetic DJO3 recording is generated with a battery
+voltage after an identifier glyph (which moves around the screen), a timer,
+an altitude at fixed coordinates and a craft name. Both engines extract the
+same fields; the script checks they agree and prints the timings.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from OsdFileReader import OsdFileReader
+from TelemetryExtractor import FORMAT_STRING, FORMAT_FLOAT, FORMAT_TIME, FORMAT_NUMBER
+from synthetic_osd import write_djo3_frames
+
+NUM_COLS, NUM_ROWS = 53, 20
+SYM_BATT = 0x97
+SYM_TIMER = 0x9C
+
+# name: (identifier, coordinates, length, format_type), as for parse()
+FIELDS = {
+    "voltage": (SYM_BATT, [-1, -1], 4, FORMAT_STRING),
+    "timer": (SYM_TIMER, [-1, -1], 2, FORMAT_TIME),
+    "altitude_raw": (-1, [40, 18], 2, FORMAT_FLOAT),
+    "name": (-1, [2, 18], 6, FORMAT_STRING),
+}
+NUMBER_FIELDS = {
+    "voltage_v": (SYM_BATT, [-1, -1], 4, FORMAT_NUMBER),
+    "altitude_m": (-1, [40, 17], 5, FORMAT_NUMBER),
+}
+
+
+def telemetry_frames(num_frames, osd_rate=10, seed=0):
+    """Yield OSD grids showing a few telemetry fields that change over time; the same array is updated in place."""
+    rng = np.random.default_rng(seed)
+    frame = np.full((NUM_ROWS, NUM_COLS), 0x20, dtype=np.uint16)
+    frame[18, 2:8] = [ord(c) for c in "QUAD-1"]
+    batt_pos = (1, 3)
+    for i in range(num_frames):
+        if i % 1000 == 0:
+            # The battery widget moves occasionally, so it has to be searched for
+            frame[batt_pos] = 0x20
+            frame[batt_pos[0], batt_pos[1] + 1:batt_pos[1] + 5] = 0x20
+            batt_pos = (int(rng.integers(0, NUM_ROWS - 3)), int(rng.integers(0, NUM_COLS - 6)))
+        voltage = f"{16.8 - 4.0 * i / num_frames:4.1f}"
+        frame[batt_pos] = SYM_BATT
+        frame[batt_pos[0], batt_pos[1] + 1:batt_pos[1] + 5] = [ord(c) for c in voltage]
+
+        seconds = i // osd_rate
+        frame[0, 40:43] = [SYM_TIMER, seconds // 60 % 256, seconds % 60]
+        altitude = int(50 * np.sin(i / 300))
+        frame[17, 40:45] = [ord(c) for c in f"{altitude:5d}"]
+        frame[18, 40:42] = [(altitude & 0xFF00) >> 8, altitude & 0xFF]
+        yield frame
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--osd", help="OSD file to use (default: synthetic DJO3)")
+    parser.add_argument("--frames", type=int, default=20000, help="length of the synthetic recording")
+    parser.add_argument("--skip-parse", action="store_true", help="only time extract_telemetry()")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        osd_path = args.osd
+        if osd_path is None:
+            osd_path = os.path.join(work_dir, "telemetry.osd")
+            write_djo3_frames(osd_path, telemetry_frames(args.frames), NUM_COLS, NUM_ROWS)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            reader = OsdFileReader(osd_path)
+        print(f"{len(reader.frames)} frames, {len(FIELDS)} fields")
+
+        extracted, extract_time = timed(lambda: reader.extract_telemetry(FIELDS))
+        print(f"extract_telemetry:      {extract_time:8.3f}s")
+        numbers, number_time = timed(lambda: reader.extract_telemetry(NUMBER_FIELDS))
+        print(f"extract (numbers):      {number_time:8.3f}s")
+        print(numbers.describe().loc[["min", "max"]].to_string())
+
+        if args.skip_parse:
+            return
+
+        _, frame_data_time = timed(lambda: reader.frame_data)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, parse_time = timed(lambda: reader.parse(FIELDS))
+        print(f"frame_data DataFrame:   {frame_data_time:8.3f}s")
+        print(f"parse:                  {parse_time:8.3f}s")
+        print(f"speedup: {(frame_data_time + parse_time) / extract_time:.0f}x "
+              f"({parse_time / extract_time:.0f}x without building frame_data)")
+
+        # Check both engines agree (parse() returns "mm:ss" strings for times)
+        legacy = reader.parsed_data_df
+        for name, (_, _, _, format_type) in FIELDS.items():
+            new = extracted[name]
+            if format_type == FORMAT_TIME:
+                new = new.dt.total_seconds().map(
+                    lambda s: f"{int(s // 60):02}:{int(s % 60):02}", na_action="ignore"
+                )
+            old = [None if pd.isna(value) else value for value in legacy[name]]
+            new = [None if pd.isna(value) else value for value in new]
+            mismatches = sum(a != b for a, b in zip(old, new))
+            print(f"{name:>14}: {'ok' if not mismatches else f'{mismatches} mismatches'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Worker scaling benchmark for multi-process rendering.
+
+Renders the same .osd file with workers=1, 2, 4, ... and prints wall time,
+output fps and speedup over the single-process render.
+
+    python benchmarks/bench_workers.py [--osd FILE] [--font FONT] [--transparent]
+
+Without --osd a synthetic DJO3 recording is generated.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from OsdFileReader import OsdFileReader
+from VideoMaker import VideoMaker
+from TransparentVideoMaker import TransparentVideoMaker
+from synthetic_osd import write_djo3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--osd", help="OSD file to render (default: synthetic DJO3)")
+    parser.add_argument("--font", default="fonts/WS_BFx4_Nexus_Moonlight_1440p.png")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--seconds", type=float, default=60, help="length of the synthetic recording")
+    parser.add_argument("--transparent", action="store_true", help="benchmark TransparentVideoMaker")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    font_path = os.path.join(root, args.font) if not os.path.isabs(args.font) else args.font
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        osd_path = args.osd
+        if osd_path is None:
+            osd_path = os.path.join(work_dir, "synthetic.osd")
+            write_djo3(osd_path, int(args.seconds * 10))
+
+        extension = ".mov" if args.transparent else ".mp4"
+        print(f"{'workers':>8} {'seconds':>9} {'fps':>8} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            output_path = os.path.join(work_dir, f"out_{workers}{extension}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                reader = OsdFileReader(osd_path)
+                if args.transparent:
+                    maker = TransparentVideoMaker(reader, font_path, fps=args.fps, workers=workers)
+                else:
+                    maker = VideoMaker(reader, font_path, fps=args.fps, workers=workers)
+                start = time.perf_counter()
+                maker.create_video(output_path)
+                elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {maker.total_frames / elapsed:>8.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
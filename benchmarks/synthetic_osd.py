@@ -0,0 +1,116 @@
+"""
+Synthetic .osd recordings for the benchmarks.
+
+Every generator writes num_frames OSD frames at osd_rate frames per second
+on a num_cols x num_rows grid. Frames start from a random screen and change
+changes_per_frame random cells each, which sets how much work incremental
+rendering and the delta store get; 0 gives a static screen.
+
+    write_synthetic("djo3", "flight.osd", num_frames=6000)
+"""
+import struct
+
+import numpy as np
+
+FORMATS = ("djo3", "msposd_v2", "msposd_v3")
+DEFAULT_COLS, DEFAULT_ROWS = 53, 20
+
+
+def synthetic_frames(num_frames, num_cols=DEFAULT_COLS, num_rows=DEFAULT_ROWS, changes_per_frame=8,
+                     max_glyph=512, seed=0):
+    """Yield num_frames (num_rows, num_cols) uint16 grids; the same array is updated in place."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, max_glyph, (num_rows, num_cols), dtype=np.uint16)
+    flat = frame.reshape(-1)
+    for i in range(num_frames):
+        if i and changes_per_frame:
+            cells = rng.integers(0, flat.size, changes_per_frame)
+            flat[cells] = rng.integers(0, max_glyph, changes_per_frame)
+        yield frame
+
+
+def write_djo3(path, num_frames, num_cols=DEFAULT_COLS, num_rows=DEFAULT_ROWS, osd_rate=10, changes_per_frame=8,
+               seed=0):
+    """
+    DJI O3: 40-byte header, then [uint32 time in ms][uint16 glyph * rows * cols]
+    per frame. The "DJO3" signature means 53 x 20; other grid sizes are
+    stored in header bytes 36 and 38 instead.
+    """
+    frames = synthetic_frames(num_frames, num_cols, num_rows, changes_per_frame, seed=seed)
+    write_djo3_frames(path, frames, num_cols, num_rows, osd_rate)
+
+
+def write_djo3_frames(path, frames, num_cols=DEFAULT_COLS, num_rows=DEFAULT_ROWS, osd_rate=10):
+    """Write the given (num_rows, num_cols) glyph grids as a DJO3 file, see write_djo3()."""
+    if (num_cols, num_rows) == (DEFAULT_COLS, DEFAULT_ROWS):
+        signature = b"DJO3"
+    else:
+        signature = bytes([num_cols, 0, num_rows, 0])
+    with open(path, "wb") as file:
+        file.write(b"DJI\x00" + bytes(32) + signature)
+        for i, frame in enumerate(frames):
+            file.write(struct.pack("<I", int(i * 1000 / osd_rate)))
+            file.write(frame.astype("<u2").tobytes())
+
+
+def _write_msposd_header(file, version, num_cols, num_rows, font_variant=b"BTFL"):
+    file.write(b"MSPOSD\x00")
+    file.write(struct.pack("<H", version))
+    file.write(struct.pack("<BBBB", num_cols, num_rows, 0, 0))
+    file.write(struct.pack("<HH", 0, 0))
+    file.write(font_variant.ljust(5, b"\x00"))
+
+
+def write_msposd_v2(path, num_frames, num_cols=DEFAULT_COLS, num_rows=DEFAULT_ROWS, osd_rate=10,
+                    changes_per_frame=8, seed=0, frame_rate=60):
+    """
+    MSPOSD v2: [uint32 frame number][uint32 frame size][uint16 glyph * size]
+    per frame, column by column. Frame numbers count at frame_rate, the
+    reader's default video rate.
+    """
+    framesize = num_cols * num_rows
+    with open(path, "wb") as file:
+        _write_msposd_header(file, 2, num_cols, num_rows)
+        for i, frame in enumerate(synthetic_frames(num_frames, num_cols, num_rows, changes_per_frame, seed=seed)):
+            file.write(struct.pack("<II", round(i * frame_rate / osd_rate), framesize))
+            file.write(frame.T.astype("<u2").tobytes())
+
+
+def write_msposd_v3(path, num_frames, num_cols=DEFAULT_COLS, num_rows=DEFAULT_ROWS, osd_rate=10,
+                    changes_per_frame=8, seed=0):
+    """MSPOSD v3: [float64 timestamp in s][uint32 frame size][uint8 glyph * size] per frame, row by row."""
+    framesize = num_cols * num_rows
+    with open(path, "wb") as file:
+        _write_msposd_header(file, 3, num_cols, num_rows)
+        frames = synthetic_frames(num_frames, num_cols, num_rows, changes_per_frame, max_glyph=256, seed=seed)
+        for i, frame in enumerate(frames):
+            file.write(struct.pack("<dI", i / osd_rate, framesize))
+            file.write(frame.astype("u1").tobytes())
+
+
+def write_msposd_sized_frames(path, version, sizes, num_cols=DEFAULT_COLS, num_rows=DEFAULT_ROWS, osd_rate=10,
+                              frame_rate=60):
+    """
+    MSPOSD v2 or v3 file whose frame i has sizes[i] glyphs instead of
+    num_cols * num_rows, as recorders write after a change of OSD canvas.
+    Glyph k of frame i, in file order, is (i + 1) * 100 + k (modulo 256 for
+    v3). Timing is as in write_msposd_v2() and write_msposd_v3().
+    """
+    with open(path, "wb") as file:
+        _write_msposd_header(file, version, num_cols, num_rows)
+        for i, size in enumerate(sizes):
+            glyphs = (i + 1) * 100 + np.arange(size)
+            if version == 3:
+                file.write(struct.pack("<dI", i / osd_rate, size))
+                file.write((glyphs % 256).astype("u1").tobytes())
+            else:
+                file.write(struct.pack("<II", round(i * frame_rate / osd_rate), size))
+                file.write(glyphs.astype("<u2").tobytes())
+
+
+def write_synthetic(osd_format, path, num_frames, **options):
+    """Write a recording in one of FORMATS; options go to the format's writer."""
+    writers = {"djo3": write_djo3, "msposd_v2": write_msposd_v2, "msposd_v3": write_msposd_v3}
+    if osd_format not in writers:
+        raise ValueError(f"Unknown format '{osd_format}', expected one of {', '.join(FORMATS)}")
+    writers[osd_format](path, num_frames, **options)
@@ -0,0 +1,93 @@
+import os
+import sys
+import subprocess
+
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from EncoderBackend import find_ffmpeg
+from OsdFileReader import OsdFileReader
+from TransparentVideoMaker import TransparentVideoMaker
+from synthetic_osd import write_djo3
+
+FONT_PATH = os.path.join(ROOT, "fonts", "WS_BFx4_Nexus_Moonlight_1440p.png")
+# Output rate and height of the makers of make_maker: small and fast, and
+# one output frame per OSD frame of osd_path
+FPS = 10
+HEIGHT = 60
+
+
+@pytest.fixture(autouse=True)
+def atlas_cache_dir(tmp_path, monkeypatch):
+    """Keep the atlas cache of every test in its own temporary folder."""
+    monkeypatch.setenv("OVERLAYTOOL_CACHE_DIR", str(tmp_path / "atlas_cache"))
+
+
+@pytest.fixture
+def ffmpeg_path():
+    try:
+        return find_ffmpeg()
+    except FileNotFoundError:
+        pytest.skip("ffmpeg not found")
+
+
+@pytest.fixture
+def osd_path(tmp_path):
+    """A 3 s synthetic DJO3 recording at 10 OSD frames per second."""
+    path = str(tmp_path / "flight.osd")
+    write_djo3(path, 30)
+    return path
+
+
+@pytest.fixture
+def make_maker(osd_path):
+    """
+    Factory for makers of osd_path (or another recording) at FPS and HEIGHT
+    with the bundled 1440p font (or another one); keyword options override
+    those. The readers' and makers' progress output goes to pytest's
+    captured stdout.
+    """
+    def make(maker_class=TransparentVideoMaker, path=None, font_path=FONT_PATH, reader_options=None, **options):
+        reader = OsdFileReader(path or osd_path, **(reader_options or {}))
+        return maker_class(reader, font_path, **{"fps": FPS, "target_height": HEIGHT, **options})
+    return make
+
+
+def reference_tile(maker, tile_index):
+    """RGBA glyph as the makers cropped it one glyph at a time before the atlas: truncated corners, clamped column."""
+    column = min(tile_index // 256, maker.num_columns - 1)
+    row = tile_index % 256
+    left = int(column * maker.tile_width)
+    upper = int(row * maker.tile_height)
+    right = int(left + maker.tile_width)
+    lower = int(upper + maker.tile_height)
+    if right > maker.font_image.width or lower > maker.font_image.height:
+        return np.zeros((int(maker.tile_height), int(maker.tile_width), 4), dtype=np.uint8)
+    return np.array(maker.font_image.crop((left, upper, right, lower)))
+
+
+def float_blend_tile(maker, tile_index):
+    """reference_tile() blended onto the chroma key as the makers did before the atlas: in floats, truncated, BGR."""
+    tile_array = reference_tile(maker, tile_index)
+    alpha_channel = tile_array[:, :, 3] / 255.0
+    blended_tile = np.full((tile_array.shape[0], tile_array.shape[1], 3), maker.chroma_key_rgb[::-1],
+                           dtype=np.uint8)
+    for c in range(3):
+        blended_tile[:, :, c] = (
+            alpha_channel * tile_array[:, :, c] + (1 - alpha_channel) * blended_tile[:, :, c]
+        ).astype(np.uint8)
+    return cv2.cvtColor(blended_tile, cv2.COLOR_RGB2BGR)
+
+
+def frame_hashes(ffmpeg_path, video_path):
+    """MD5 of every decoded frame, to compare videos frame by frame."""
+    output = subprocess.run(
+        [ffmpeg_path, "-v", "error", "-i", video_path, "-f", "framemd5", "-"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return [line.split(",")[-1].strip() for line in output.splitlines() if not line.startswith("#")]
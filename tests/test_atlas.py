@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+
+from VideoMaker import VideoMaker
+from GlyphAtlas import IncrementalRenderer
+
+from conftest import ROOT, FONT_PATH, reference_tile, float_blend_tile
+
+# A fractional glyph pitch (36.14 x 54.21) and a whole-pixel one (48 x 72)
+FONTS = [os.path.join(ROOT, "fonts", "OG_bf_36.png"), FONT_PATH]
+
+
+def reference_frame(maker, frame_content, tile, background):
+    """Frame drawn cell by cell at the truncated positions the makers used before the atlas."""
+    char_width = maker.osd_reader.header["config"]["charWidth"]
+    char_height = maker.osd_reader.header["config"]["charHeight"]
+    frame = np.empty((maker.RESOLUTION[1], maker.RESOLUTION[0], len(background)), dtype=np.uint8)
+    frame[:] = background
+    for i in range(char_height):
+        for j in range(char_width):
+            glyph = tile(maker, int(frame_content[i * char_width + j]))
+            x = int(j * maker.TILE_WIDTH)
+            y = int(i * maker.TILE_HEIGHT)
+            frame[y:y + glyph.shape[0], x:x + glyph.shape[1]] = glyph
+    return frame
+
+
+def frame_content(maker, index=0):
+    """An OSD frame of the recording with glyphs from every column of the sheet, and past its last one."""
+    content = maker.osd_reader.frames.frame(index).reshape(-1).astype(np.int64)
+    content[::7] += np.arange(content[::7].size) % 5 * 256
+    return content
+
+
+@pytest.mark.parametrize("font_path", FONTS, ids=os.path.basename)
+def test_alpha_frame_matches_per_cell_render(make_maker, font_path):
+    maker = make_maker(font_path=font_path, target_height=None, atlas_cache=False)
+    content = frame_content(maker)
+    expected = reference_frame(maker, content, reference_tile, (0, 0, 0, 0))
+    assert np.array_equal(maker.render_frame_with_alpha(content), expected)
+
+    # Redrawing only the changed cells places them the same way
+    renderer = IncrementalRenderer(maker.get_atlas())
+    renderer.render(content)
+    content = frame_content(maker, 20)
+    expected = reference_frame(maker, content, reference_tile, (0, 0, 0, 0))
+    assert np.array_equal(renderer.render(content), expected)
+
+
+@pytest.mark.parametrize("chroma_key_hex", ["FF00FF", "00FF00"])
+@pytest.mark.parametrize("font_path", FONTS, ids=os.path.basename)
+def test_chroma_frame_matches_per_cell_render(make_maker, font_path, chroma_key_hex):
+    maker = make_maker(VideoMaker, font_path=font_path, chroma_key_hex=chroma_key_hex, target_height=None,
+                       atlas_cache=False)
+    content = frame_content(maker)
+    expected = reference_frame(maker, content, float_blend_tile, maker.chroma_key_rgb[::-1])
+    frame = maker.render_frame(content)
+    assert frame.shape == expected.shape
+    assert np.abs(frame.astype(np.int16) - expected).max() <= 1
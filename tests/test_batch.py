@@ -0,0 +1,29 @@
+import os
+import json
+
+import BatchRender
+from VideoMaker import VideoMaker
+
+from conftest import FONT_PATH
+
+
+def test_job_without_output_is_recorded_as_failed(tmp_path, monkeypatch, osd_path):
+    monkeypatch.setattr(VideoMaker, "create_video", lambda self, output_path, **options: None)
+    result = BatchRender.render_job(osd_path, str(tmp_path / "flight.mp4"), FONT_PATH, 10.0, "FF00FF",
+                                    True, False, target_height=60)
+    assert result["status"] == "failed"
+    assert result["error"] is not None
+
+
+def test_chroma_batch_with_several_jobs_needs_no_ffmpeg(tmp_path, monkeypatch, osd_path):
+    def missing(ffmpeg_path=None):
+        raise FileNotFoundError("ffmpeg not found")
+
+    monkeypatch.setattr(BatchRender, "find_ffmpeg", missing)
+    summary_path = str(tmp_path / "summary.json")
+    status = BatchRender.main([osd_path, "--chroma-key", "FF00FF", "--jobs", "2", "--fps", "10",
+                               "--height", "60", "--font", FONT_PATH, "--summary", summary_path])
+    assert status == 0
+    with open(summary_path, encoding="utf-8") as summary_file:
+        assert json.load(summary_file)["rendered"] == 1
+    assert os.path.isfile(BatchRender.output_path_for(osd_path, transparent=False))
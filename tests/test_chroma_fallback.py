@@ -0,0 +1,50 @@
+import os
+
+import cv2
+import pytest
+
+import VideoMaker as video_maker_module
+import ParallelRender
+from VideoMaker import VideoMaker
+from RenderCheckpoint import PARTIAL_SUFFIX
+
+
+def frame_count(video_path):
+    video = cv2.VideoCapture(video_path)
+    try:
+        return int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        video.release()
+
+
+def test_resumable_chroma_render_without_ffmpeg(tmp_path, monkeypatch, make_maker):
+    def missing(ffmpeg_path=None):
+        raise FileNotFoundError("ffmpeg not found")
+
+    monkeypatch.setattr(video_maker_module, "find_ffmpeg", missing)
+    output_path = str(tmp_path / "flight.mp4")
+    maker = make_maker(VideoMaker, resumable=True)
+    maker.create_video(output_path)
+
+    assert frame_count(output_path) == maker.total_frames
+    assert not os.path.exists(output_path + PARTIAL_SUFFIX)
+
+
+def test_single_segment_is_renamed_not_joined(tmp_path, monkeypatch, make_maker, ffmpeg_path):
+    def no_concat(*args):
+        raise AssertionError("a single segment needs no concat")
+
+    monkeypatch.setattr(ParallelRender, "concat_segments", no_concat)
+    output_path = str(tmp_path / "flight.mp4")
+    maker = make_maker(VideoMaker, resumable=True)
+    maker.create_video(output_path)
+
+    assert frame_count(output_path) == maker.total_frames
+    assert not os.path.exists(output_path + PARTIAL_SUFFIX)
+
+
+def test_unopenable_output_raises(tmp_path, make_maker):
+    maker = make_maker(VideoMaker)
+    output_path = str(tmp_path / "no" / "such" / "folder" / "flight.mp4")
+    with pytest.raises(RuntimeError, match="Could not open"):
+        maker.create_video(output_path)
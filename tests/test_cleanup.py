@@ -0,0 +1,27 @@
+import pytest
+
+import TransparentVideoMaker as transparent_module
+from FramePipeline import FrameWriter
+
+
+def test_encoder_closes_when_writer_fails(tmp_path, monkeypatch, make_maker, ffmpeg_path):
+    close_writer = FrameWriter.close
+    closed = []
+
+    def failing_close(self):
+        close_writer(self)
+        raise OSError("writer failed")
+
+    class RecordingEncoder(transparent_module.FfmpegEncoder):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr(FrameWriter, "close", failing_close)
+    monkeypatch.setattr(transparent_module, "FfmpegEncoder", RecordingEncoder)
+    maker = make_maker(ffmpeg_path=ffmpeg_path)
+    with pytest.raises(OSError, match="writer failed"):
+        maker.create_video(str(tmp_path / "flight.mov"))
+
+    assert len(closed) == 1
+    assert closed[0].process.returncode is not None
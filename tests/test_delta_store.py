@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+from OsdFileReader import OsdFileReader
+from OsdDeltaStore import DeltaFrameStore
+from synthetic_osd import write_djo3
+
+NUM_FRAMES = 40
+
+
+@pytest.mark.parametrize("changes_per_frame", [0, 3, 200])
+@pytest.mark.parametrize("keyframe_interval", [1, 7, 256])
+def test_saved_store_decodes_every_frame(tmp_path, keyframe_interval, changes_per_frame):
+    path = str(tmp_path / "flight.osd")
+    write_djo3(path, NUM_FRAMES, changes_per_frame=changes_per_frame)
+    source = OsdFileReader(path).frames
+    sidecar_path = str(tmp_path / "flight.delta.npz")
+    DeltaFrameStore.from_store(source, keyframe_interval=keyframe_interval).save(sidecar_path, source={"x": 1})
+    store, meta = DeltaFrameStore.load(sidecar_path)
+
+    assert meta["source"] == {"x": 1}
+    assert len(store) == NUM_FRAMES
+    for i in range(NUM_FRAMES):
+        assert np.array_equal(store.frame(i), source.frame(i).reshape(-1)), f"frame {i}"
+    # Blocks start mid-interval and cross keyframes
+    for start, stop in [(0, NUM_FRAMES), (3, 17), (6, 8), (NUM_FRAMES - 1, NUM_FRAMES + 5)]:
+        timestamps, frames = store.block(start, stop)
+        expected_timestamps, expected_frames = source.block(start, stop)
+        assert np.array_equal(frames, expected_frames)
+        assert np.array_equal(timestamps, expected_timestamps)
+    assert np.array_equal(store.frame_sizes, source.frame_sizes)
+
+
+def test_sidecar_is_ignored_once_the_osd_file_changes(tmp_path):
+    path = str(tmp_path / "flight.osd")
+    write_djo3(path, NUM_FRAMES, seed=1)
+    OsdFileReader(path, sidecar=True)
+    assert os.path.exists(path + ".delta.npz")
+    assert OsdFileReader(path).load_sidecar()
+
+    # Same size, new content and mtime
+    stat = os.stat(path)
+    write_djo3(path, NUM_FRAMES, seed=2)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert os.path.getsize(path) == stat.st_size
+    assert not OsdFileReader(path).load_sidecar()
+    reader = OsdFileReader(path, sidecar=True)
+    assert np.array_equal(reader.frames.frames, OsdFileReader(path).frames.frames)
+
+    # New size
+    write_djo3(path, NUM_FRAMES + 5, seed=3)
+    assert not OsdFileReader(path).load_sidecar()
+    reader = OsdFileReader(path, sidecar=True)
+    assert len(reader.frames) == NUM_FRAMES + 5
+    assert np.array_equal(reader.frames.frames, OsdFileReader(path).frames.frames)
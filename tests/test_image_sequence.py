@@ -0,0 +1,55 @@
+import os
+import threading
+
+import pytest
+
+from ImageSequenceWriter import INDEX_NAME
+from RenderCheckpoint import RenderCancelled
+
+# Above the 10 Hz of the synthetic recording, so most output frames repeat a run
+SEQUENCE_FPS = 30
+
+
+def read_index(output_dir):
+    """(file name, duration) pairs of index.ffconcat, without the closing repeat of the last file."""
+    with open(os.path.join(output_dir, INDEX_NAME), encoding="utf-8") as index_file:
+        lines = index_file.read().splitlines()
+    names = [line.split("'")[1] for line in lines if line.startswith("file ")]
+    durations = [float(line.split()[1]) for line in lines if line.startswith("duration ")]
+    assert names[-1] == names[-2]
+    return list(zip(names[:-1], durations))
+
+
+def test_sequence_links_repeats_and_indexes_the_clip(tmp_path, make_maker):
+    maker = make_maker(fps=SEQUENCE_FPS, image_format="png")
+    output_dir = str(tmp_path / "sequence")
+    maker.create_video(output_dir)
+
+    index = read_index(output_dir)
+    assert len(index) == maker.schedule.num_runs
+    assert sum(duration for _, duration in index) == pytest.approx(maker.total_frames / SEQUENCE_FPS, abs=1e-5)
+
+    frame_names = sorted(name for name in os.listdir(output_dir) if name != INDEX_NAME)
+    assert len(frame_names) == maker.total_frames
+    assert maker.repeated_frames > 0
+    first_frame = 0
+    for name, duration in index:
+        run_length = round(duration * SEQUENCE_FPS)
+        encoded = os.path.join(output_dir, name)
+        assert name == frame_names[first_frame]
+        for repeat in frame_names[first_frame + 1:first_frame + run_length]:
+            assert os.path.samefile(os.path.join(output_dir, repeat), encoded)
+        first_frame += run_length
+    assert first_frame == maker.total_frames
+
+
+def test_cancelled_sequence_has_no_index(tmp_path, make_maker):
+    maker = make_maker(fps=SEQUENCE_FPS, image_format="png")
+    output_dir = str(tmp_path / "sequence")
+    cancel_event = threading.Event()
+
+    with pytest.raises(RenderCancelled):
+        maker.create_video(output_dir, progress_callback=lambda percentage, frame_num: cancel_event.set(),
+                           cancel_event=cancel_event)
+    assert os.listdir(output_dir)
+    assert not os.path.exists(os.path.join(output_dir, INDEX_NAME))
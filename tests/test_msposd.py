@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from OsdFileReader import OsdFileReader
+from synthetic_osd import write_msposd_sized_frames
+
+NUM_COLS, NUM_ROWS = 8, 4
+FRAMESIZE = NUM_COLS * NUM_ROWS
+
+
+def test_size_change_in_the_middle_is_not_mapped(tmp_path):
+    # The short and long frame cancel out, so the last frame lands back on
+    # the fixed stride and has the full size again
+    sizes = [FRAMESIZE, FRAMESIZE - 2, FRAMESIZE + 2, FRAMESIZE]
+    path = str(tmp_path / "flight.osd")
+    write_msposd_sized_frames(path, 3, sizes, num_cols=NUM_COLS, num_rows=NUM_ROWS)
+
+    reader = OsdFileReader(path)
+    assert not isinstance(reader.frames.frames, np.memmap)
+    assert reader.get_frame_count() == len(sizes)
+    assert reader.frames.timestamps_between(0, len(sizes)).tolist() == [0.0, 0.1, 0.2, 0.3]
+
+    grids = reader.frames.block(0, len(sizes))[1].reshape(len(sizes), -1)
+    for i, size in enumerate(sizes):
+        shown = min(size, FRAMESIZE)
+        assert grids[i, :shown].tolist() == (((i + 1) * 100 + np.arange(shown)) % 256).tolist()
+        assert np.all(grids[i, shown:] == 0)
+
+
+@pytest.mark.parametrize("version, sizes", [
+    (3, [FRAMESIZE, FRAMESIZE - 5, FRAMESIZE, FRAMESIZE - 1]),
+    (2, [FRAMESIZE, FRAMESIZE - NUM_ROWS, FRAMESIZE - 2 * NUM_ROWS, FRAMESIZE]),
+])
+def test_compact_store_keeps_frame_content(tmp_path, version, sizes):
+    path = str(tmp_path / "flight.osd")
+    write_msposd_sized_frames(path, version, sizes, num_cols=NUM_COLS, num_rows=NUM_ROWS)
+    expected = OsdFileReader(path).get_data()["frameContent"].tolist()
+    assert [len(content) for content in expected] == sizes
+
+    compacted = OsdFileReader(path, compact=True)
+    assert compacted.get_data()["frameContent"].tolist() == expected
+
+    OsdFileReader(path, sidecar=True)  # parses the file and writes the sidecar
+    from_sidecar = OsdFileReader(path, sidecar=True)
+    assert from_sidecar.load_sidecar()
+    assert from_sidecar.get_data()["frameContent"].tolist() == expected
+    assert from_sidecar.get_data()["frameSize"].tolist() == sizes
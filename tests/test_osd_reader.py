@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from OsdFileReader import OsdFileReader
+from synthetic_osd import synthetic_frames, write_djo3, write_msposd_v2, write_msposd_v3
+
+NUM_FRAMES = 12
+OSD_RATE = 10
+READER_FPS = 60
+
+
+def expected_grids(num_cols, num_rows, max_glyph):
+    """The (rows, cols) grids the synthetic_osd writers store, row by row."""
+    return [frame.copy() for frame in synthetic_frames(NUM_FRAMES, num_cols, num_rows, max_glyph=max_glyph)]
+
+
+@pytest.mark.parametrize("writer, num_cols, num_rows, max_glyph", [
+    (write_djo3, 53, 20, 512),
+    (write_djo3, 30, 16, 512),  # grid size read from the header instead of the DJO3 signature
+    (write_msposd_v2, 53, 20, 512),  # stored column by column
+    (write_msposd_v3, 53, 20, 256),
+], ids=["djo3", "djo3-30x16", "msposd_v2", "msposd_v3"])
+def test_get_data_matches_written_frames(tmp_path, writer, num_cols, num_rows, max_glyph):
+    path = str(tmp_path / "flight.osd")
+    writer(path, NUM_FRAMES, num_cols=num_cols, num_rows=num_rows, osd_rate=OSD_RATE)
+    reader = OsdFileReader(path, framerate=READER_FPS)
+    data = reader.get_data()
+    grids = expected_grids(num_cols, num_rows, max_glyph)
+
+    assert reader.header["config"]["charWidth"] == num_cols
+    assert reader.header["config"]["charHeight"] == num_rows
+    assert data["frameContent"].tolist() == [grid.reshape(-1).tolist() for grid in grids]
+    assert data["frameSize"].tolist() == [num_cols * num_rows] * NUM_FRAMES
+    assert np.array_equal(reader.frames.block(0, NUM_FRAMES)[1], np.stack(grids))
+
+    seconds = [i / OSD_RATE for i in range(NUM_FRAMES)]
+    frame_numbers = [round(i * READER_FPS / OSD_RATE) for i in range(NUM_FRAMES)]
+    if writer is write_msposd_v2:
+        # v2 records frame numbers only
+        assert data["timestamp"].isnull().all()
+        assert data["frameNumber"].tolist() == frame_numbers
+    elif writer is write_msposd_v3:
+        assert data["timestamp"].tolist() == pytest.approx(seconds)
+        assert data["frameNumber"].isnull().all()
+    else:
+        # DJO3 frame numbers are derived from the millisecond timestamps at the reader's rate
+        assert data["timestamp"].tolist() == pytest.approx(seconds)
+        assert data["frameNumber"].tolist() == frame_numbers
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from VideoMaker import VideoMaker
+from ParallelRender import render_parallel
+from RenderCheckpoint import RenderCancelled
+
+from conftest import FPS
+
+# How long the segments that don't fail take unless they are cancelled
+SLOW_SEGMENT_SECONDS = 5
+
+
+class FailingMaker(VideoMaker):
+    """Fails the first segment; the others render slowly, checking for a cancel like a real render."""
+
+    def render_frames(self, output_path, start_frame, end_frame, progress_callback=None, cancel_event=None):
+        if start_frame == 0:
+            raise ValueError("segment failed")
+        deadline = time.perf_counter() + SLOW_SEGMENT_SECONDS
+        while time.perf_counter() < deadline:
+            if cancel_event is not None and cancel_event.is_set():
+                raise RenderCancelled("Rendering cancelled")
+            time.sleep(0.05)
+        super().render_frames(output_path, start_frame, end_frame, progress_callback, cancel_event)
+
+
+def test_failed_segment_stops_the_pool(tmp_path, make_maker):
+    maker = make_maker(FailingMaker)
+    schedule = maker.osd_reader.get_render_schedule(FPS, 0, maker.osd_reader.get_output_frame_count(FPS))
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="segment failed"):
+        render_parallel(maker, str(tmp_path / "flight.mp4"), schedule, "ffmpeg", workers=2)
+    # Uncancelled, the seven other segments would keep both workers busy for 4 * SLOW_SEGMENT_SECONDS
+    assert time.perf_counter() - start < SLOW_SEGMENT_SECONDS
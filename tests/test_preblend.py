@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from VideoMaker import VideoMaker
+
+from conftest import float_blend_tile
+
+
+@pytest.mark.parametrize("chroma_key_hex", ["FF00FF", "00FF00", "808080"])
+def test_one_pass_blend_matches_float_blend(make_maker, chroma_key_hex):
+    maker = make_maker(VideoMaker, chroma_key_hex=chroma_key_hex, target_height=None, atlas_cache=False)
+    tiles = maker.build_tiles()
+
+    num_glyphs = maker.num_columns * 256
+    assert len(tiles) == num_glyphs + 1
+    for tile_index in range(num_glyphs):
+        expected = float_blend_tile(maker, tile_index).astype(np.int16)
+        assert np.abs(tiles[tile_index].astype(np.int16) - expected).max() <= 1, f"glyph {tile_index}"
+    assert np.all(tiles[-1] == maker.chroma_key_rgb[::-1])
+
+
+def test_preblend_covers_every_alpha(make_maker):
+    maker = make_maker(VideoMaker, chroma_key_hex="FF00FF", target_height=None, atlas_cache=False)
+    rng = np.random.default_rng(0)
+    rgba = rng.integers(0, 256, (256, 300, 4), dtype=np.uint8)
+    rgba[:, :256, 3] = np.arange(256, dtype=np.uint8)  # every alpha level on each row
+
+    alpha = rgba[..., 3:] / 255.0
+    key = np.array(maker.chroma_key_rgb, dtype=np.float64)
+    expected = (alpha * rgba[..., :3] + (1 - alpha) * key).astype(np.uint8)[..., ::-1]
+
+    blended = maker.preblend(rgba)
+    assert np.abs(blended.astype(np.int16) - expected).max() <= 1
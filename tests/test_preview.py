@@ -0,0 +1,27 @@
+import numpy as np
+
+from PreviewRenderer import PreviewRenderer, FrameCache
+from synthetic_osd import write_djo3
+
+
+def open_preview(make_maker, osd_path, cache):
+    maker = make_maker(path=osd_path)
+    return PreviewRenderer(maker.osd_reader, maker, cache=cache, prefetch=0), maker
+
+
+def test_shared_cache_keeps_recordings_apart(tmp_path, make_maker):
+    cache = FrameCache()
+    first_path, second_path = str(tmp_path / "first.osd"), str(tmp_path / "second.osd")
+    write_djo3(first_path, 10, seed=1)
+    write_djo3(second_path, 10, seed=2)
+
+    first, _ = open_preview(make_maker, first_path, cache)
+    first.frame_at(0.0)
+    first.close()
+    second, maker = open_preview(make_maker, second_path, cache)
+    block, frame = second.frame_at(0.0)
+    second.close()
+
+    expected = maker.render_frame_with_alpha(second.osd_reader.frames.frame(block))
+    assert np.array_equal(frame, expected)
+    assert cache.hits == 0
@@ -0,0 +1,22 @@
+import os
+
+from ParallelRender import render_checkpointed
+from RenderCheckpoint import PARTIAL_SUFFIX
+
+from conftest import FPS, frame_hashes
+
+
+def test_checkpointed_render_to_relative_path(tmp_path, monkeypatch, make_maker, ffmpeg_path):
+    reference = str(tmp_path / "reference.mov")
+    make_maker().create_video(reference)
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("out")
+    output_path = os.path.join("out", "flight.mov")
+    maker = make_maker(resumable=True)
+    schedule = maker.osd_reader.get_render_schedule(FPS, 0, len(frame_hashes(ffmpeg_path, reference)))
+    # One-second segments, so several are joined
+    render_checkpointed(maker, output_path, schedule, ffmpeg_path, segment_seconds=1)
+
+    assert not os.path.exists(output_path + PARTIAL_SUFFIX)
+    assert frame_hashes(ffmpeg_path, output_path) == frame_hashes(ffmpeg_path, reference)
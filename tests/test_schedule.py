@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from OsdFrameStore import OsdFrameStore
+from RenderSchedule import RenderSchedule
+
+FPS = 10
+# Seconds of each OSD frame after the first; none falls on an output frame
+# time except 1.0, which is shown from that frame on
+TIMESTAMPS = [0.0, 0.12, 0.25, 0.31, 1.0, 1.05]
+FRAME_BLOCKS = [0, 0, 1, 2, 3, 3, 3, 3, 3, 3, 4, 5, 5]
+
+
+def make_store(timestamps, offset=7.0):
+    """A store of one-cell frames whose raw timestamps start at 'offset' seconds."""
+    return OsdFrameStore.from_frame_lists([[i] for i in range(len(timestamps))], 1, 1,
+                                          raw_timestamps=np.array(timestamps) + offset)
+
+
+def check_split(schedule, segments, num_segments):
+    """Segments cover the range in order, start on run starts and are at most num_segments."""
+    assert 1 <= len(segments) <= num_segments
+    assert segments[0][0] == schedule.start_frame and segments[-1][1] == schedule.end_frame
+    for (_, end), (start, _) in zip(segments[:-1], segments[1:]):
+        assert end == start
+    assert all(start < end for start, end in segments)
+    assert {start for start, _ in segments} <= set(schedule.run_starts.tolist())
+
+
+def test_from_store_maps_frames_to_blocks():
+    schedule = RenderSchedule.from_store(make_store(TIMESTAMPS), FPS, 0, len(FRAME_BLOCKS))
+    assert schedule.frame_blocks.tolist() == FRAME_BLOCKS
+    assert list(schedule.iter_runs()) == [(0, 0, 2), (1, 2, 1), (2, 3, 1), (3, 4, 6), (4, 10, 1), (5, 11, 2)]
+    assert schedule.run_times.tolist() == pytest.approx(TIMESTAMPS)
+    assert schedule.repeated_frames == len(FRAME_BLOCKS) - 6
+
+
+def test_from_store_range_starting_inside_a_run():
+    # The first run's block appeared before the range; it starts at the range
+    schedule = RenderSchedule.from_store(make_store(TIMESTAMPS), FPS, 5, len(FRAME_BLOCKS))
+    assert schedule.frame_blocks.tolist() == FRAME_BLOCKS[5:]
+    assert schedule.run_starts.tolist() == [5, 10, 11]
+    assert schedule.run_times.tolist() == pytest.approx([0.5, 1.0, 1.05])
+
+
+def test_from_store_past_the_last_block():
+    schedule = RenderSchedule.from_store(make_store(TIMESTAMPS), FPS, 12, 20)
+    assert schedule.frame_blocks.tolist() == [5] * 8
+    assert schedule.run_times.tolist() == pytest.approx([1.2])
+
+
+def test_empty_range():
+    schedule = RenderSchedule.from_store(make_store(TIMESTAMPS), FPS, 4, 4)
+    assert len(schedule) == 0 and schedule.num_runs == 0
+    assert schedule.split(4) == []
+    assert schedule.segments(3) == []
+    assert list(schedule.iter_runs()) == []
+
+
+@pytest.mark.parametrize("num_segments", [1, 2, 3, 6, 50])
+def test_split_on_run_starts(num_segments):
+    schedule = RenderSchedule.from_store(make_store(TIMESTAMPS), FPS, 0, len(FRAME_BLOCKS))
+    check_split(schedule, schedule.split(num_segments), min(num_segments, schedule.num_runs))
+
+
+def test_split_with_more_segments_than_runs():
+    schedule = RenderSchedule(np.zeros(30, dtype=np.intp), 100, FPS)
+    assert schedule.split(8) == [(100, 130)]
+
+
+def test_split_evenly_on_many_runs():
+    schedule = RenderSchedule(np.repeat(np.arange(100), 3), 0, FPS)
+    segments = schedule.split(4)
+    check_split(schedule, segments, 4)
+    assert [end - start for start, end in segments] == [75, 75, 75, 75]
+
+
+def test_segments_have_fixed_boundaries():
+    schedule = RenderSchedule(np.repeat(np.arange(10), 7), 20, FPS)
+    assert schedule.segments(25) == [(20, 45), (45, 70), (70, 90)]
+    assert schedule.segments(70) == [(20, 90)]
+    assert schedule.segments(100) == [(20, 90)]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from TelemetryExtractor import _parse_numbers, _decode_clock
+
+# Glyph i shows code point i
+IDENTITY_CHARMAP = np.arange(256)
+
+
+def code_points(texts):
+    """(n, k) code point array of the texts, padded with spaces."""
+    width = max(len(text) for text in texts)
+    return np.array([[ord(c) for c in text.ljust(width)] for text in texts])
+
+
+@pytest.mark.parametrize("text, value", [
+    ("12.6V", 12.6),
+    (" -3M", -3.0),
+    (".5", 0.5),
+    ("-.5", -0.5),
+    ("V.5A", 0.5),
+    ("1.2.3", 1.2),
+    ("12.", 12.0),
+    ("007", 7.0),
+    ("x-12.50y", -12.5),
+    ("1-2", 1.0),
+])
+def test_parse_numbers(text, value):
+    assert _parse_numbers(code_points([text]))[0] == pytest.approx(value)
+
+
+def test_parse_numbers_without_digits():
+    assert np.isnan(_parse_numbers(code_points(["V", ".", "-", "  "]))).all()
+    assert _parse_numbers(np.zeros((3, 0), dtype=np.int64)).shape == (3,)
+
+
+def test_parse_numbers_of_several_rows():
+    values = _parse_numbers(code_points(["12.6V", "AB", ".5", " -3M"]))
+    assert values[[0, 2, 3]].tolist() == pytest.approx([12.6, 0.5, -3.0])
+    assert np.isnan(values[1])
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("01:30", 90.0),
+    ("1:02:03", 3723.0),
+    ("\x9c05:09", 309.0),  # timer symbol in front
+    ("0:00", 0.0),
+])
+def test_decode_clock(text, seconds):
+    windows = code_points([text])
+    assert _decode_clock(windows, np.array([True]), IDENTITY_CHARMAP)[0] == pytest.approx(seconds)
+
+
+def test_decode_clock_needs_a_colon_and_a_digit():
+    windows = code_points(["0130", "  :  ", "01:30"])
+    values = _decode_clock(windows, np.array([True, True, False]), IDENTITY_CHARMAP)
+    assert np.isnan(values).all()
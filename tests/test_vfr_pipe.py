@@ -0,0 +1,43 @@
+import subprocess
+
+import numpy as np
+
+from EncoderBackend import MatroskaFramePipe
+
+CLUSTER_ID = (0x1F43B675).to_bytes(4, "big")
+
+
+def packet_timestamps(ffmpeg_path, path):
+    """Timestamps in milliseconds of the packets ffmpeg demuxes from a Matroska file."""
+    output = subprocess.run(
+        [ffmpeg_path, "-v", "error", "-i", path, "-c", "copy", "-f", "framecrc", "-"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    lines = output.splitlines()
+    assert "#tb 0: 1/1000" in lines
+    return [int(line.split(",")[2]) for line in lines if not line.startswith("#")]
+
+
+def test_timestamps_across_cluster_boundaries(tmp_path, ffmpeg_path):
+    # 32.767 s is the last offset of the first cluster; the gaps after it
+    # each overflow the 16-bit offset and start a new one
+    timestamps = [0.0, 1.5, 32.767, 32.768, 40.0, 65.6, 100.0]
+    path = str(tmp_path / "frames.mkv")
+    with open(path, "wb") as pipe_file:
+        pipe = MatroskaFramePipe(pipe_file, 4, 2, 10)
+        for index, timestamp in enumerate(timestamps):
+            pipe.write(np.full((2, 4, 4), index, dtype=np.uint8), timestamp)
+
+    with open(path, "rb") as pipe_file:
+        assert pipe_file.read().count(CLUSTER_ID) == 4
+    assert packet_timestamps(ffmpeg_path, path) == [round(timestamp * 1000) for timestamp in timestamps]
+
+
+def test_timestamps_stay_strictly_increasing(tmp_path, ffmpeg_path):
+    path = str(tmp_path / "frames.mkv")
+    with open(path, "wb") as pipe_file:
+        pipe = MatroskaFramePipe(pipe_file, 4, 2, 10)
+        for timestamp in [0.0, 1.0001, 1.0002, 0.5]:
+            pipe.write(np.zeros((2, 4, 4), dtype=np.uint8), timestamp)
+
+    assert packet_timestamps(ffmpeg_path, path) == [0, 1000, 1001, 1002]